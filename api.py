@@ -0,0 +1,502 @@
+"""
+API JSON dos rankings, sem Streamlit
+Serve top-K, listas filtradas e o registo de cada jogador a partir dos mesmos
+snapshots e índices do dashboard. Cada resposta leva um ETag com a versão dos
+dados (If-None-Match → 304 sem reenviar o corpo) e vem em gzip quando o
+cliente o aceita; os corpos já serializados ficam numa cache LRU, por isso um
+pedido repetido não volta a filtrar, ordenar nem serializar.
+
+Execute: python api.py [--host 127.0.0.1] [--port 8000]
+
+GET /api/health
+GET /api/meta
+GET /api/top?metric=assists_minus_xag&k=100&order=desc
+GET /api/players?sort=assists&order=desc&offset=0&limit=50
+GET /api/players/<player_id>
+
+Filtros (top e players): view=club|career, first=1718, last=2425, league=...,
+team=..., position=DF,MF, q=nome, min_matches, min_xag, min_percentile,
+percentile_scope=league|position|all, significant=1. Valores repetidos ou
+separados por vírgulas são combinados com OU (como os multiselects). Sem dados
+por temporada (só a tabela agregada) first/last são ignorados.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from store import load_dataset, dataset_version
+from pipeline import PERCENTILE_COLUMNS, PERCENTILE_SCOPES, POSITION_BITS, percentile_column
+from season_window import SeasonPrefix, totals_frame
+from player_identity import PlayerIdentityIndex
+from intervals import CI_COLUMNS, add_intervals
+from bitmap_index import BitmapIndex
+from filter_plan import FilterPlan
+from ranking import RANKING_METRICS, RankingEngine
+from search_index import PlayerSearchIndex
+
+API_HOST = '127.0.0.1'
+API_PORT = 8000
+VIEWS = ['club', 'career']
+DEFAULT_K = 100
+MAX_LIMIT = 1000
+VERSION_CHECK_SECONDS = 30  # intervalo mínimo entre verificações da versão dos dados
+TABLE_CACHE_SIZE = 8  # tabelas (vista × janela de temporadas) em memória
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+GZIP_MIN_BYTES = 1024  # corpos mais pequenos vão sem compressão
+
+# Colunas de cada jogador nas respostas (as que a vista tiver)
+API_COLUMNS = [
+    'player_id', 'player', 'born', 'team', 'clubs', 'teams', 'league', 'position',
+    'matches', 'minutes', 'assists', 'xAG', 'assists_minus_xag', *CI_COLUMNS,
+    'assists_minus_xag_90', *PERCENTILE_COLUMNS
+]
+
+
+class BadRequest(ValueError):
+    """Parâmetro inválido no pedido (resposta 400)"""
+
+
+# ============================================================================
+# DADOS E ÍNDICES
+# ============================================================================
+
+class Table:
+    """Tabela base de uma vista/janela, máscara dos qualificados e índices partilhados"""
+
+    def __init__(self, df, mask, bitmap_index, search_index):
+        self.df = df
+        self.mask = mask
+        self.bitmap_index = bitmap_index
+        self.search_index = search_index
+        self.ranking = RankingEngine(df)
+        self.columns = [column for column in API_COLUMNS if column in df.columns]
+
+
+class Dataset:
+    """
+    Snapshot dos dados numa versão: vistas por clube e carreira, por janela de temporadas
+
+    Com dados por temporada usa SeasonPrefix (como o dashboard); só com a tabela
+    agregada (p.ex. o CSV antigo) não há janelas e a carreira soma as linhas dela.
+    """
+
+    def __init__(self, stats, rows, version):
+        """`stats`, `rows` e `version` lidos juntos por store.load_dataset()"""
+        self.version = version
+        self.etag = 'W/"%s"' % hashlib.sha1(repr(version).encode()).hexdigest()[:16]
+        if rows is not None and len(rows) > 0:
+            self.prefix = SeasonPrefix(rows)
+            self.seasons = self.prefix.seasons
+            self.identity = self.prefix.identity_index()
+            stints = self.prefix.players
+        else:
+            self.prefix = None
+            self.seasons = []
+            self.stats = add_intervals(stats)
+            self.identity = PlayerIdentityIndex(self.stats, weight=self.stats['minutes'].to_numpy())
+            stints = self.stats
+        # player_id de cada linha da vista por clube
+        self.player_ids = self.identity.ids[self.identity.keys]
+        self.indexes = {
+            view: (BitmapIndex(base), PlayerSearchIndex(base['player'].to_numpy()))
+            for view, base in (('club', stints), ('career', self.identity.players))
+        }
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def season_range(self, first=None, last=None):
+        """Janela (primeira, última) validada; (None, None) sem dados por temporada"""
+        if not self.seasons:
+            return None, None
+        first = first or self.seasons[0]
+        last = last or self.seasons[-1]
+        if first not in self.seasons or last not in self.seasons:
+            raise BadRequest(f"temporada desconhecida; disponíveis: {', '.join(self.seasons)}")
+        if self.seasons.index(first) > self.seasons.index(last):
+            raise BadRequest("'first' depois de 'last'")
+        return first, last
+
+    def _build(self, view, first, last):
+        identity = self.identity if view == 'career' else None
+        if self.prefix is not None:
+            df, qualified = self.prefix.window_frame(first, last, identity)
+        elif identity is not None:
+            df, qualified = totals_frame(identity.players, identity.career_totals(self.stats))
+        else:
+            df, qualified = self.stats, np.ones(len(self.stats), dtype=bool)
+        if 'player_id' not in df.columns:
+            df = df.assign(player_id=self.player_ids)
+        return Table(df, qualified, *self.indexes[view])
+
+    def table(self, view, first, last):
+        """Table da vista e janela, construída na primeira vez (LRU de TABLE_CACHE_SIZE)"""
+        key = (view, first, last)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                return table
+        table = self._build(view, first, last)
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > TABLE_CACHE_SIZE:
+                self._tables.popitem(last=False)
+        return table
+
+
+# ============================================================================
+# PEDIDOS
+# ============================================================================
+
+def _values(params, name):
+    """Valores de um parâmetro repetido e/ou separado por vírgulas"""
+    return [value.strip() for raw in params.get(name, []) for value in raw.split(',') if value.strip()]
+
+
+def _one(params, name, default=None):
+    values = params.get(name)
+    return values[-1] if values else default
+
+
+def _number(params, name, cast=float, default=None, minimum=None, maximum=None):
+    raw = _one(params, name)
+    if raw is None:
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        raise BadRequest(f"'{name}' tem de ser numérico") from None
+    if not np.isfinite(value):
+        raise BadRequest(f"'{name}' tem de ser um número finito")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise BadRequest(f"'{name}' fora do intervalo [{minimum}, {maximum}]")
+    return value
+
+
+def _ascending(params):
+    order = _one(params, 'order', 'desc')
+    if order not in ('asc', 'desc'):
+        raise BadRequest("'order' tem de ser 'asc' ou 'desc'")
+    return order == 'asc'
+
+
+def accepts_gzip(accept_encoding):
+    """Se o cabeçalho Accept-Encoding aceita gzip: q > 0 em 'gzip' ou, sem ele, em '*'"""
+    quality = {}
+    for item in accept_encoding.split(','):
+        coding, *parameters = [part.strip() for part in item.split(';')]
+        q = 1.0
+        for parameter in parameters:
+            key, _, value = parameter.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            quality[coding.lower()] = q
+    return quality.get('gzip', quality.get('*', 0.0)) > 0
+
+
+def build_plan(dataset, params):
+    """Tabela e FilterPlan dos parâmetros do pedido (os mesmos filtros da barra lateral)"""
+    view = _one(params, 'view', 'club')
+    if view not in VIEWS:
+        raise BadRequest(f"'view' tem de ser um de {VIEWS}")
+    first, last = dataset.season_range(_one(params, 'first'), _one(params, 'last'))
+    table = dataset.table(view, first, last)
+    df = table.df
+    plan = FilterPlan(df, table.mask, key=(view, first, last))
+
+    leagues = _values(params, 'league')
+    if leagues:
+        plan.where(('league', tuple(leagues)), table.bitmap_index.mask({'league': leagues}))
+    teams = _values(params, 'team')
+    if teams:
+        plan.where(('team', tuple(teams)), table.bitmap_index.mask({'team': teams}))
+
+    positions = _values(params, 'position')
+    if positions:
+        unknown = set(positions) - set(POSITION_BITS)
+        if unknown:
+            raise BadRequest(f"posição desconhecida: {', '.join(sorted(unknown))}")
+        wanted_bits = sum(POSITION_BITS[code] for code in set(positions))
+        plan.where(('position', wanted_bits), (df['position_bits'].to_numpy() & wanted_bits) != 0)
+
+    query = _one(params, 'q')
+    if query:
+        plan.where(('search', query), table.search_index.mask(table.search_index.matches(query)))
+
+    min_matches = _number(params, 'min_matches', int, minimum=0)
+    if min_matches:
+        plan.where(('matches', min_matches), df['matches'].to_numpy() >= min_matches)
+    min_xag = _number(params, 'min_xag', minimum=0)
+    if min_xag:
+        plan.where(('xAG', min_xag), df['xAG'].to_numpy() >= min_xag)
+
+    min_percentile = _number(params, 'min_percentile', minimum=0, maximum=100)
+    if min_percentile:
+        scope = _one(params, 'percentile_scope', 'all')
+        if scope not in PERCENTILE_SCOPES:
+            raise BadRequest(f"'percentile_scope' tem de ser um de {list(PERCENTILE_SCOPES)}")
+        column = percentile_column('assists_minus_xag', scope)
+        plan.where(('percentile', column, min_percentile), df[column].to_numpy() >= min_percentile)
+
+    if _one(params, 'significant') in ('1', 'true'):
+        plan.where(('significant',), df[CI_COLUMNS[0]].to_numpy() > 0)
+    return table, plan, {'view': view, 'first': first, 'last': last}
+
+
+def _records(table, plan, rows):
+    """Linhas `rows` em JSON (lista de objetos; NaN → null)"""
+    return plan.frame(table.columns, rows).to_json(orient='records', double_precision=4)
+
+
+def _envelope(meta, players_json):
+    """Corpo JSON com os metadados e a lista de jogadores já serializada (sem a voltar a ler)"""
+    return ('{"meta":%s,"players":%s}' % (json.dumps(meta), players_json)).encode()
+
+
+def top(dataset, params):
+    table, plan, meta = build_plan(dataset, params)
+    metric = _one(params, 'metric', 'assists_minus_xag')
+    if metric not in RANKING_METRICS:
+        raise BadRequest(f"'metric' tem de ser um de {RANKING_METRICS}")
+    k = _number(params, 'k', int, DEFAULT_K, minimum=1, maximum=MAX_LIMIT)
+    ascending = _ascending(params)
+    rows = table.ranking.top(plan, metric, k, ascending=ascending)
+    meta.update(metric=metric, order='asc' if ascending else 'desc', k=k, total=len(plan))
+    return _envelope(meta, _records(table, plan, rows))
+
+
+def players(dataset, params):
+    table, plan, meta = build_plan(dataset, params)
+    sort = _one(params, 'sort', 'assists_minus_xag')
+    if sort not in table.columns:
+        raise BadRequest(f"'sort' tem de ser uma de {table.columns}")
+    ascending = _ascending(params)
+    offset = _number(params, 'offset', int, 0, minimum=0)
+    limit = _number(params, 'limit', int, 50, minimum=1, maximum=MAX_LIMIT)
+    rows, total = table.ranking.page(plan, sort, ascending, offset, offset + limit)
+    meta.update(sort=sort, order='asc' if ascending else 'desc', offset=offset, limit=limit, total=total)
+    return _envelope(meta, _records(table, plan, rows))
+
+
+def player(dataset, params, player_id):
+    """Carreira e passagens por clube de um jogador (na janela pedida, qualificado ou não)"""
+    try:
+        player_id = int(player_id)
+    except ValueError:
+        raise BadRequest("player_id tem de ser inteiro") from None
+    key = np.searchsorted(dataset.identity.ids, player_id)
+    if key >= len(dataset.identity.ids) or dataset.identity.ids[key] != player_id:
+        return None
+
+    first, last = dataset.season_range(_one(params, 'first'), _one(params, 'last'))
+    career = dataset.table('career', first, last)
+    clubs = dataset.table('club', first, last)
+    club_rows = np.flatnonzero(dataset.identity.keys == key)
+    meta = {'player_id': player_id, 'first': first, 'last': last,
+            'qualified': bool(career.mask[key])}
+    return ('{"meta":%s,"career":%s,"clubs":%s}' % (
+        json.dumps(meta),
+        career.df[career.columns].iloc[[key]].to_json(orient='records', double_precision=4)[1:-1],
+        clubs.df[clubs.columns].iloc[club_rows].to_json(orient='records', double_precision=4),
+    )).encode()
+
+
+def meta(dataset, params):
+    table = dataset.table('club', *dataset.season_range())
+    body = {
+        'version': dataset.version,
+        'seasons': dataset.seasons,
+        'views': VIEWS,
+        'leagues': table.bitmap_index['league'].present(),
+        'positions': list(POSITION_BITS),
+        'metrics': RANKING_METRICS,
+        'columns': table.columns,
+        'players': {'club': len(dataset.player_ids), 'career': len(dataset.identity)},
+    }
+    return json.dumps(body).encode()
+
+
+ROUTES = {'/api/top': top, '/api/players': players, '/api/meta': meta}
+
+
+# ============================================================================
+# CACHE DE RESPOSTAS E SERVIDOR
+# ============================================================================
+
+class RankingsApi:
+    """
+    Dataset atual (recarregado quando a versão dos dados muda) e respostas serializadas
+
+    Cada resposta é guardada em bruto e, se valer a pena, em gzip, numa LRU
+    por bytes indexada por (versão, caminho, parâmetros ordenados).
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.dataset = None
+        self._checked_at = 0.0
+        self._responses = OrderedDict()  # chave → (corpo, corpo gzip ou None)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def current(self):
+        """Dataset da versão atual; a versão no disco é vista no máximo a cada VERSION_CHECK_SECONDS"""
+        now = time.monotonic()
+        if self.dataset is not None and now - self._checked_at < VERSION_CHECK_SECONDS:
+            return self.dataset
+        with self._reload_lock:
+            if self.dataset is None or now - self._checked_at >= VERSION_CHECK_SECONDS:
+                version = dataset_version()
+                if self.dataset is None or version != self.dataset.version:
+                    stats, rows, version = load_dataset()
+                    self.dataset = Dataset(stats, rows, version) if stats is not None else None
+                    with self._lock:
+                        self._responses.clear()
+                        self._bytes = 0
+                self._checked_at = time.monotonic()
+        return self.dataset
+
+    def response(self, dataset, path, params, handler):
+        """(corpo, corpo gzip ou None) do pedido, da cache ou de handler(); None se não existir"""
+        key = (dataset.version, path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        body = handler()
+        if body is None:
+            return None
+        compressed = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+        entry = (body, compressed)
+        size = len(body) + (len(compressed) if compressed else 0)
+        with self._lock:
+            if key not in self._responses:
+                self._responses[key] = entry
+                self._bytes += size
+                while self._bytes > self.max_bytes and len(self._responses) > 1:
+                    _, (old, old_compressed) = self._responses.popitem(last=False)
+                    self._bytes -= len(old) + (len(old_compressed) if old_compressed else 0)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {'responses': len(self._responses), 'bytes': self._bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive: vários pedidos por ligação
+    # Cabeçalhos e corpo são escritos em separado: sem TCP_NODELAY, o Nagle e o ACK
+    # atrasado do cliente juntam ~40 ms a cada resposta numa ligação keep-alive
+    disable_nagle_algorithm = True
+    api = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/') or '/'
+        params = parse_qs(url.query)
+
+        if path == '/api/health':
+            dataset = self.api.current()
+            body = {'status': 'ok' if dataset is not None else 'no data',
+                    'version': None if dataset is None else dataset.version, **self.api.stats()}
+            return self._send(200 if dataset is not None else 503, json.dumps(body).encode())
+
+        if path in ROUTES:
+            route = ROUTES[path]
+            handler = lambda dataset: route(dataset, params)
+        elif path.startswith('/api/players/'):
+            player_id = path.rsplit('/', 1)[1]
+            handler = lambda dataset: player(dataset, params, player_id)
+        else:
+            return self._error(404, 'caminho desconhecido')
+
+        dataset = self.api.current()
+        if dataset is None:
+            return self._error(503, 'sem dados')
+        try:
+            entry = self.api.response(dataset, path, params, lambda: handler(dataset))
+        except BadRequest as e:
+            return self._error(400, str(e))
+        if entry is None:
+            return self._error(404, 'jogador desconhecido')
+
+        # A versão dos dados é o ETag: a mesma versão → o mesmo conteúdo. Só depois
+        # de validar o pedido, para que um 400/404 nunca vire 304 (a resposta vem
+        # normalmente da cache, por isso o 304 continua sem filtrar nem serializar)
+        if dataset.etag in (tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')):
+            return self._send(304, b'', etag=dataset.etag)
+        body, compressed = entry
+        if compressed is not None and accepts_gzip(self.headers.get('Accept-Encoding', '')):
+            return self._send(200, compressed, etag=dataset.etag, encoding='gzip')
+        return self._send(200, body, etag=dataset.etag)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({'error': message}).encode())
+
+    def _send(self, status, body, etag=None, encoding=None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')  # revalidar sempre com If-None-Match
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=API_HOST, port=API_PORT, api=None):
+    """ThreadingHTTPServer da API (port=0 escolhe uma porta livre)"""
+    handler = type('ApiHandler', (_ApiHandler,), {'api': api or RankingsApi()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port)
+    print("🔄 A carregar dados...")
+    if server.RequestHandlerClass.api.current() is None:
+        print("⚠️  Sem dados: gere o store com generate_data.py (ou use o fbref_data.csv)")
+    host, port = server.server_address[:2]
+    print(f"✅ API em http://{host}:{port}/api/meta")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,13 @@ import os
 import warnings
 from pathlib import Path
 
+from fetch import BIG5_COMBINED, build_units, fetch_player_season_stats, league_fallback
+from page_cache import PageCache, cached_reader_factory
+from pipeline import (
+    LEAGUES, SEASONS, MAPPED_COLUMNS, FALLBACK_INDICES,
+    map_columns, select_columns, from_pandas, aggregate, percentile_ranks, collect
+)
+
 # Suprimir warnings do pandas e soccerdata
 warnings.filterwarnings('ignore', category=FutureWarning)
 warnings.filterwarnings('ignore', category=UserWarning)
@@ -41,117 +48,51 @@ except Exception as e:
 
 # Configuração de ligas e temporadas
 # Formato de temporadas aceite: '1718', '2017-18', '2017-2018', 2017, etc.
-LEAGUES_PRIMARY = ['Big 5 European Leagues Combined']
-LEAGUES_FALLBACK = [
-    'ENG-Premier League',
-    'ESP-La Liga',
-    'FRA-Ligue 1',
-    'GER-Bundesliga',
-    'ITA-Serie A'
-]
-SEASONS = ['1718', '1819', '1920', '2021', '2122', '2223', '2324', '2425']
+LEAGUES_PRIMARY = [BIG5_COMBINED]
+LEAGUES_FALLBACK = LEAGUES
 
 print(f"\n⚙️  Configuração:")
 print(f"   Liga principal: {LEAGUES_PRIMARY}")
 print(f"   Liga fallback: {LEAGUES_FALLBACK}")
 print(f"   Temporadas: {SEASONS}")
 
-# Tentativa 1: Big 5 Combined
-player_season_stats = None
+# Uma unidade Big 5 combinada por temporada; se uma falhar ou vier vazia,
+# só essa temporada é recolhida liga a liga, em vez de repetir tudo
 leagues_used = None
+units = build_units(LEAGUES_PRIMARY, SEASONS)
 
-try:
-    print("\n📡 Tentativa 1: Carregar 'Big 5 European Leagues Combined'...")
-    fbref = sd.FBref(
-        leagues=LEAGUES_PRIMARY,
-        seasons=SEASONS
-    )
-    
-    print("✅ Objeto FBref criado")
-    
-    # Tentar ler ligas e temporadas (pode falhar)
-    try:
-        leagues_df = fbref.read_leagues()
-        print(f"   Ligas: {leagues_df['league'].unique().tolist() if 'league' in leagues_df.columns else 'N/A'}")
-    except Exception as e:
-        print(f"   ⚠️  Não foi possível ler ligas: {e}")
-    
-    try:
-        seasons_df = fbref.read_seasons()
-        print(f"   Temporadas: {seasons_df['season'].unique().tolist() if 'season' in seasons_df.columns else 'N/A'}")
-    except Exception as e:
-        print(f"   ⚠️  Não foi possível ler temporadas: {e}")
-    
-    print("📥 A ler dados de jogadores...")
-    player_season_stats = fbref.read_player_season_stats(stat_type="standard")
-    
-    print(f"✅ Dados carregados: {len(player_season_stats)} registos")
-    
-    # Validar se não está vazio
-    if len(player_season_stats) == 0:
-        print("⚠️  DataFrame vazio! Tentando fallback...")
-        player_season_stats = None
+
+def report_unit(unit, error):
+    if error is None:
+        print(f"   ✅ {unit.league} {unit.season}")
+    elif unit.league == BIG5_COMBINED:
+        print(f"   ⚠️  {unit.league} {unit.season} falhou ({type(error).__name__}: {error}); a usar ligas individuais")
     else:
-        leagues_used = LEAGUES_PRIMARY
-        print(f"✅ Sucesso com {LEAGUES_PRIMARY[0]}")
-        
-except Exception as e:
-    print(f"❌ Erro na tentativa 1: {e}")
-    print(f"   Tipo: {type(e).__name__}")
-    import traceback
-    print("   Stack trace:")
-    traceback.print_exc()
-    player_season_stats = None
+        print(f"   ❌ {unit.league} {unit.season}: {type(error).__name__}: {error}")
+
+
+print(f"\n📡 A carregar {len(units)} unidades (Big 5 combinada por temporada, fallback por liga)...")
+tables, errors = fetch_player_season_stats(
+    units,
+    reader_factory=cached_reader_factory(PageCache()),
+    fallback=league_fallback(LEAGUES_FALLBACK),
+    on_done=report_unit
+)
+player_season_stats = tables.get('standard')
 
-# Tentativa 2: Ligas individuais (fallback)
 if player_season_stats is None or len(player_season_stats) == 0:
-    try:
-        print("\n📡 Tentativa 2: Carregar ligas individualmente (fallback)...")
-        fbref = sd.FBref(
-            leagues=LEAGUES_FALLBACK,
-            seasons=SEASONS
-        )
-        
-        print("✅ Objeto FBref criado com ligas individuais")
-        
-        # Tentar ler ligas e temporadas (pode falhar)
-        try:
-            leagues_df = fbref.read_leagues()
-            print(f"   Ligas: {leagues_df['league'].unique().tolist() if 'league' in leagues_df.columns else leagues_df.columns.tolist()}")
-        except Exception as e:
-            print(f"   ⚠️  Não foi possível ler ligas: {e}")
-        
-        try:
-            seasons_df = fbref.read_seasons()
-            print(f"   Temporadas: {seasons_df['season'].unique().tolist() if 'season' in seasons_df.columns else seasons_df.columns.tolist()}")
-        except Exception as e:
-            print(f"   ⚠️  Não foi possível ler temporadas: {e}")
-        
-        print("📥 A ler dados de jogadores...")
-        player_season_stats = fbref.read_player_season_stats(stat_type="standard")
-        
-        print(f"✅ Dados carregados: {len(player_season_stats)} registos")
-        
-        if len(player_season_stats) == 0:
-            print("❌ DataFrame ainda está vazio!")
-            raise ValueError("Nenhum jogador foi carregado mesmo após fallback")
-        else:
-            leagues_used = LEAGUES_FALLBACK
-            print(f"✅ Sucesso com ligas individuais")
-            
-    except Exception as e:
-        print(f"❌ Erro na tentativa 2 (fallback): {e}")
-        print(f"   Tipo: {type(e).__name__}")
-        import traceback
-        print("   Stack trace completo:")
-        traceback.print_exc()
-        print("\n❌ ERRO CRÍTICO: Não foi possível carregar dados do FBref")
-        print("   Possíveis causas:")
-        print("   • Mudança na estrutura do FBref")
-        print("   • Problema de conexão")
-        print("   • Ligas ou temporadas não disponíveis")
-        print(f"   • Versão do soccerdata: {sd.__version__ if hasattr(sd, '__version__') else 'desconhecida'}")
-        exit(1)
+    print("\n❌ ERRO CRÍTICO: Não foi possível carregar dados do FBref")
+    print("   Possíveis causas:")
+    print("   • Mudança na estrutura do FBref")
+    print("   • Problema de conexão")
+    print("   • Ligas ou temporadas não disponíveis")
+    print(f"   • Versão do soccerdata: {sd.__version__ if hasattr(sd, '__version__') else 'desconhecida'}")
+    exit(1)
+
+leagues_used = sorted(player_season_stats.index.get_level_values('league').unique())
+if errors:
+    print(f"\n⚠️  {len(errors)} unidades sem dados: {sorted(f'{u.league} {u.season}' for u in errors)}")
+print(f"✅ Dados carregados: {len(player_season_stats)} registos")
 
 # Diagnóstico final
 print("\n" + "=" * 60)
@@ -188,71 +129,24 @@ try:
     print(f"   Primeiras 30 colunas: {all_columns[:30]}")
     
     # Mapeamento robusto de colunas (aceita variações de nomes)
-    column_mapping = {}
-    
-    # Procurar colunas por padrões
     print("\n🔍 A procurar colunas necessárias...")
-    for idx, col in enumerate(all_columns):
-        col_str = str(col)
-        col_lower = col_str.lower() if isinstance(col, str) else str(col).lower()
-        
-        # Posição
-        if ('pos' in col_lower and 'position' not in column_mapping and 
-            'composed' not in col_lower and 'deposit' not in col_lower):
-            column_mapping['position'] = idx
-            print(f"   ✓ Posição encontrada: coluna {idx} = '{col_str}'")
-        
-        # Matches/Jogos (MP = Matches Played)
-        elif (('mp' == col_lower or 'matches' in col_lower) and 'matches' not in column_mapping):
-            column_mapping['matches'] = idx
-            print(f"   ✓ Jogos encontrados: coluna {idx} = '{col_str}'")
-        
-        # Minutos (Min)
-        elif ('min' in col_lower and 'minute' not in column_mapping and 
-              'per' not in col_lower and '90' not in col_lower):
-            column_mapping['minutes'] = idx
-            print(f"   ✓ Minutos encontrados: coluna {idx} = '{col_str}'")
-        
-        # Assists (Ast)
-        elif ((col_lower == 'ast' or 'assist' in col_lower) and 
-              'assists' not in column_mapping and 'xag' not in col_lower):
-            column_mapping['assists'] = idx
-            print(f"   ✓ Assists encontrados: coluna {idx} = '{col_str}'")
-        
-        # xAG (Expected Assisted Goals)
-        elif ('xag' in col_lower and 'xAG' not in column_mapping):
-            column_mapping['xAG'] = idx
-            print(f"   ✓ xAG encontrado: coluna {idx} = '{col_str}'")
+    column_mapping = map_columns(all_columns)
+    for name, idx in column_mapping.items():
+        print(f"   ✓ {name} encontrado: coluna {idx} = '{all_columns[idx]}'")
     
-    print(f"\n📊 Colunas mapeadas: {len(column_mapping)}/5")
+    print(f"\n📊 Colunas mapeadas: {len(set(MAPPED_COLUMNS) & set(column_mapping))}/{len(MAPPED_COLUMNS)}")
     
-    # Se não encontrou todas, usar índices fixos como fallback
-    if len(column_mapping) < 5:
+    # Se não encontrou todas, select_columns usa índices fixos como fallback
+    if not set(MAPPED_COLUMNS) <= set(column_mapping):
         print("⚠️  Mapeamento incompleto! A usar índices fixos (fallback)...")
         print(f"   Colunas encontradas: {list(column_mapping.keys())}")
-        print(f"   Colunas faltando: {set(['position', 'matches', 'minutes', 'assists', 'xAG']) - set(column_mapping.keys())}")
-        
-        # Tentar índices conhecidos
-        selected_indices = [1, 4, 6, 9, 18]  # posição, matches, minutos, assists, xAG
-        print(f"   Tentando índices: {selected_indices}")
-        
-        df = player_season_stats.iloc[:, selected_indices].copy()
-        df.columns = ['position', 'matches', 'minutes', 'assists', 'xAG']
-        
-        print(f"   Colunas extraídas por índice: {df.columns.tolist()}")
+        print(f"   Colunas faltando: {set(MAPPED_COLUMNS) - set(column_mapping.keys())}")
+        print(f"   Tentando índices: {FALLBACK_INDICES}")
     else:
         print("✅ Todas as colunas identificadas automaticamente!")
-        selected_indices = [
-            column_mapping['position'],
-            column_mapping['matches'],
-            column_mapping['minutes'],
-            column_mapping['assists'],
-            column_mapping['xAG']
-        ]
-        print(f"   Índices selecionados: {selected_indices}")
-        
-        df = player_season_stats.iloc[:, selected_indices].copy()
-        df.columns = ['position', 'matches', 'minutes', 'assists', 'xAG']
+        print(f"   Índices selecionados: {[column_mapping[name] for name in MAPPED_COLUMNS]}")
+    
+    df = select_columns(player_season_stats)
     
     # Validar dados antes de converter
     print(f"\n📊 DataFrame processado:")
@@ -268,12 +162,12 @@ try:
     for col, count in null_counts.items():
         print(f"      {col}: {count}")
     
-    # Converter para Polars mantendo o index (league, season, team, player)
+    # Converter para Polars (lazy) mantendo o index (league, season, team, player)
     print("\n🔄 Convertendo para Polars...")
-    df_polars = pl.from_pandas(df, include_index=True)
+    df_polars = from_pandas(df)
     
-    print(f"✅ DataFrame Polars criado com {len(df_polars)} linhas")
-    print(f"   Colunas: {df_polars.columns}")
+    print(f"✅ LazyFrame Polars criado")
+    print(f"   Colunas: {df_polars.collect_schema().names()}")
     
 except Exception as e:
     print(f"\n❌ ERRO no processamento: {e}")
@@ -297,25 +191,7 @@ except Exception as e:
 print("\n📊 A calcular estatísticas agregadas...")
 
 try:
-    stats = (
-        df_polars
-        .group_by("league", "team", "player")
-        .agg([
-            pl.col("matches").sum().alias("matches"),
-            pl.col("assists").sum().alias("assists"),
-            pl.col("xAG").sum().alias("xAG"),
-            pl.col("minutes").sum().alias("minutes"),
-            pl.col("position").first().alias("position")
-        ])
-        .with_columns([
-            (pl.col("assists") - pl.col("xAG")).alias("assists_minus_xag"),
-            ((pl.col("assists") - pl.col("xAG")) / pl.col("minutes") * 90).alias("assists_minus_xag_90")
-        ])
-        .filter(
-            (pl.col("minutes") > 450) &  # Pelo menos 5 jogos de 90 min
-            (pl.col("xAG") > 0)  # Garantir que tem dados de xAG
-        )
-    )
+    stats = collect(percentile_ranks(aggregate(df_polars)))
     
     print(f"✅ {len(stats)} jogadores qualificados para análise")
     
@@ -0,0 +1,188 @@
+"""
+Benchmark do pipeline completo contra o servidor de replay (sem rede)
+fetch → map → aggregate → export, com tempo, pico de RSS e linhas/s por etapa
+
+Execute: python benchmark.py [--recordings DIR] [--workers 4] [--json resultados.json]
+Sem --recordings, gera páginas sintéticas no formato do FBref numa pasta temporária.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from pathlib import Path
+
+from fetch import build_units, fetch_player_season_stats, HostRateLimiter
+from pipeline import (LEAGUES, SEASONS, EXTRA_STAT_TYPES, wide_table, from_pandas, aggregate,
+                      percentile_ranks, collect)
+from replay import ReplayServer, replay_reader_factory, write_synthetic_recordings
+from store import save_season_partitions, save_stats
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # dependência opcional
+    psutil = None
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.CRITICAL)
+
+
+def _current_rss():
+    """RSS atual em bytes (/proc no Linux, psutil noutros sistemas se existir); None sem nenhum"""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+def _max_rss():
+    """Pico de RSS do processo em bytes (ru_maxrss é KB no Linux, bytes no macOS); None sem resource"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Stage:
+    """Medir uma etapa: tempo de parede, pico de RSS durante a etapa e linhas/s"""
+
+    def __init__(self, name, interval=0.005):
+        self.name = name
+        self.interval = interval
+        self.rows = 0
+        self.seconds = 0.0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            rss = _current_rss()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+
+    def __enter__(self):
+        self.peak_rss = _current_rss() or 0
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self._stop.set()
+        self._sampler.join()
+        rss = _current_rss()
+        if rss is None:
+            # Sem /proc nem psutil: só há o pico do processo inteiro (None no Windows)
+            self.peak_rss = _max_rss()
+        else:
+            self.peak_rss = max(self.peak_rss, rss)
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'seconds': round(self.seconds, 4),
+            'peak_rss_mb': None if self.peak_rss is None else round(self.peak_rss / 2**20, 1),
+            'rows': self.rows,
+            'rows_per_sec': round(self.rows / self.seconds) if self.seconds > 0 else None,
+        }
+
+
+def run_pipeline(base_url, leagues, seasons, stat_types, workers, out_dir):
+    """Correr as quatro etapas e devolver a lista de Stage medidas"""
+    stages = []
+
+    with Stage('fetch') as stage:
+        units = build_units(leagues, seasons, stat_types)
+        tables, errors = fetch_player_season_stats(
+            units,
+            max_workers=workers,
+            limiter=HostRateLimiter(0),
+            reader_factory=replay_reader_factory(base_url)
+        )
+        if errors:
+            raise RuntimeError(f"{len(errors)} unidades falharam: {next(iter(errors.values()))}")
+        stage.rows = sum(len(df) for df in tables.values())
+    stages.append(stage)
+
+    with Stage('map') as stage:
+        wide = wide_table(tables)
+        stage.rows = len(wide)
+    stages.append(stage)
+
+    with Stage('aggregate') as stage:
+        stats = collect(percentile_ranks(aggregate(from_pandas(wide)))).to_pandas()
+        stage.rows = len(wide)
+    stages.append(stage)
+
+    with Stage('export') as stage:
+        save_season_partitions(wide, seasons, Path(out_dir) / 'raw', stat_types=stat_types)
+        save_stats(stats, Path(out_dir) / 'stats')
+        stage.rows = len(wide) + len(stats)
+    stages.append(stage)
+
+    return stages
+
+
+def print_report(stages):
+    print(f"\n{'Etapa':<10} {'Tempo (s)':>10} {'Pico RSS (MB)':>14} {'Linhas':>9} {'Linhas/s':>12}")
+    print("-" * 59)
+    for stage in stages:
+        d = stage.as_dict()
+        peak = 'n/d' if d['peak_rss_mb'] is None else f"{d['peak_rss_mb']:.1f}"
+        print(f"{d['stage']:<10} {d['seconds']:>10.3f} {peak:>14} "
+              f"{d['rows']:>9,} {d['rows_per_sec'] or 0:>12,}")
+    total = sum(stage.seconds for stage in stages)
+    print("-" * 59)
+    print(f"{'total':<10} {total:>10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recordings', help="Diretório com páginas gravadas (replay.py)")
+    parser.add_argument('--leagues', nargs='+', default=LEAGUES)
+    parser.add_argument('--seasons', nargs='+', default=SEASONS)
+    parser.add_argument('--stat-types', nargs='+', default=['standard'] + EXTRA_STAT_TYPES)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--teams', type=int, default=20, help="Equipas por liga (páginas sintéticas)")
+    parser.add_argument('--players', type=int, default=25, help="Jogadores por equipa (páginas sintéticas)")
+    parser.add_argument('--json', help="Gravar os resultados em JSON (para CI)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recordings = args.recordings
+        if recordings is None:
+            recordings = Path(tmp) / 'recordings'
+            print("🧪 A gerar páginas sintéticas do FBref...")
+            write_synthetic_recordings(recordings, args.leagues, args.seasons, args.stat_types,
+                                       teams=args.teams, players_per_team=args.players)
+
+        print(f"▶️  {len(args.leagues)} ligas × {len(args.seasons)} temporadas × "
+              f"{len(args.stat_types)} stat types, {args.workers} workers")
+        with ReplayServer(recordings) as server:
+            stages = run_pipeline(server.base_url, args.leagues, args.seasons, args.stat_types,
+                                  args.workers, Path(tmp) / 'store')
+
+    print_report(stages)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump([stage.as_dict() for stage in stages], fh, indent=2)
+        print(f"\n💾 Resultados gravados em {args.json}")
+
+
+if __name__ == '__main__':
+    main()
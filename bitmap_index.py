@@ -0,0 +1,69 @@
+"""
+Índices bitmap para os filtros categóricos do dashboard (liga, equipa)
+Cada coluna é convertida uma vez em códigos categóricos e num bitmap por
+categoria; um multiselect passa a ser um OR de bitmaps e vários filtros um AND,
+sem copiar a tabela.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class CategoryBitmaps:
+    """Códigos de uma coluna e um bitmap (bits empacotados, np.packbits) por categoria"""
+
+    def __init__(self, values):
+        codes, categories = pd.factorize(pd.Series(values), sort=True)
+        self.size = len(codes)
+        self.codes = codes.astype(np.int32)
+        self.categories = pd.Index(categories)
+
+        # Linhas de cada categoria a partir de uma única ordenação dos códigos
+        order = np.argsort(self.codes, kind='stable')
+        bounds = np.searchsorted(self.codes[order], np.arange(len(self.categories) + 1))
+        self.bitmaps = []
+        for c in range(len(self.categories)):
+            bits = np.zeros(self.size, dtype=bool)
+            bits[order[bounds[c]:bounds[c + 1]]] = True
+            self.bitmaps.append(np.packbits(bits))
+
+    def bitmap(self, selected):
+        """OR dos bitmaps das categorias em `selected` (categorias desconhecidas são ignoradas)"""
+        result = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for c in self.categories.get_indexer(list(selected)):
+            if c >= 0:
+                np.bitwise_or(result, self.bitmaps[c], out=result)
+        return result
+
+    def present(self, mask=None):
+        """Categorias com pelo menos uma linha em `mask` (todas se mask for None)"""
+        codes = self.codes if mask is None else self.codes[mask]
+        used = np.bincount(codes[codes >= 0], minlength=len(self.categories)) > 0
+        return self.categories[used].tolist()
+
+
+class BitmapIndex:
+    """Bitmaps de várias colunas de uma tabela, para combinar filtros em máscaras"""
+
+    def __init__(self, df, columns=('league', 'team')):
+        self.size = len(df)
+        self.columns = {column: CategoryBitmaps(df[column].to_numpy()) for column in columns}
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def bitmap(self, selections):
+        """
+        AND, por coluna, do OR das categorias escolhidas
+
+        `selections` é {coluna: categorias}; colunas com seleção vazia não filtram.
+        """
+        result = np.full((self.size + 7) // 8, 0xFF, dtype=np.uint8)
+        for column, selected in selections.items():
+            if selected:
+                np.bitwise_and(result, self.columns[column].bitmap(selected), out=result)
+        return result
+
+    def mask(self, selections):
+        """Máscara booleana (uma posição por linha) equivalente a bitmap(selections)"""
+        return np.unpackbits(self.bitmap(selections), count=self.size).view(bool)
@@ -0,0 +1,410 @@
+"""
+Figuras Plotly do dashboard
+O scatter xAG vs Assists escolhe o nível de detalhe pelo número de linhas:
+SVG com hover completo, WebGL, ou bins 2D calculados no servidor mais os
+outliers (mais longe da linha assists = xAG) em resolução total.
+As figuras já construídas ficam numa cache LRU de JSON, partilhada entre sessões.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from intervals import CI_COLUMNS
+from pipeline import POSITION_BITS, POSITION_LABELS
+
+WEBGL_THRESHOLD = 1_000  # acima disto os pontos são desenhados em WebGL
+BINNING_THRESHOLD = 10_000  # acima disto os pontos são agrupados em bins 2D
+MAX_BINS = 80  # bins por eixo (o payload fica limitado a MAX_BINS² + MAX_OUTLIERS pontos)
+MAX_OUTLIERS = 500
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+SCATTER_COLUMNS = ['player', 'team', 'league', 'xAG', 'assists', 'assists_minus_xag']
+SCATTER_TITLE = 'Assists vs Expected Assists (xAG)'
+SCATTER_LABELS = {
+    'xAG': 'Expected Assisted Goals (xAG)',
+    'assists': 'Assists',
+    'assists_minus_xag': 'Diferença'
+}
+
+
+def _reference_line(max_val):
+    """Linha de referência assists = xAG"""
+    return go.Scatter(
+        x=[0, max_val],
+        y=[0, max_val],
+        mode='lines',
+        name='Assists = xAG',
+        line=dict(color='red', width=2, dash='dash'),
+        showlegend=True
+    )
+
+
+def _points_figure(df, webgl):
+    fig = px.scatter(
+        df,
+        x='xAG',
+        y='assists',
+        hover_data={
+            'player': True,
+            'team': True,
+            'league': True,
+            'xAG': ':.2f',
+            'assists': ':.0f',
+            'assists_minus_xag': ':.2f'
+        },
+        labels=SCATTER_LABELS,
+        title=SCATTER_TITLE,
+        color='assists_minus_xag',
+        color_continuous_scale='RdYlGn',
+        color_continuous_midpoint=0,
+        render_mode='webgl' if webgl else 'svg'
+    )
+    return fig
+
+
+def _binned_figure(plan, max_bins=MAX_BINS, max_outliers=MAX_OUTLIERS):
+    """Bins 2D (contagem e diferença média) + os outliers com hover completo"""
+    rows = plan.rows()
+    x = plan.values('xAG').astype(float)
+    y = plan.values('assists').astype(float)
+    diff = y - x
+
+    # Outliers: as linhas mais longe da diagonal ficam como pontos individuais
+    n_outliers = min(max_outliers, len(rows))
+    outliers = np.argpartition(-np.abs(diff), n_outliers - 1)[:n_outliers]
+    binned = np.ones(len(rows), dtype=bool)
+    binned[outliers] = False
+
+    # Eixo das assists (inteiras): um bin por valor enquanto couberem em max_bins
+    y_max = float(np.nanmax(y))
+    y_edges = np.linspace(-0.5, y_max + 0.5, min(max_bins, int(y_max) + 1) + 1)
+    x_edges = np.linspace(0.0, max(float(np.nanmax(x)), 1.0), max_bins + 1)
+    counts, _, _ = np.histogram2d(x[binned], y[binned], bins=[x_edges, y_edges])
+    sums, _, _ = np.histogram2d(x[binned], y[binned], bins=[x_edges, y_edges], weights=diff[binned])
+    ix, iy = np.nonzero(counts)
+    cx = (x_edges[ix] + x_edges[ix + 1]) / 2
+    cy = (y_edges[iy] + y_edges[iy + 1]) / 2
+    n = counts[ix, iy]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=cx,
+        y=cy,
+        mode='markers',
+        name='Jogadores agrupados',
+        marker=dict(
+            size=4 + 3 * np.log2(n),
+            color=sums[ix, iy] / n,
+            coloraxis='coloraxis',
+            opacity=0.7
+        ),
+        customdata=n[:, None],
+        hovertemplate='xAG ≈ %{x:.1f}<br>Assists ≈ %{y:.0f}<br>'
+                      'Jogadores: %{customdata[0]:.0f}<br>Diferença média: %{marker.color:.2f}'
+                      '<extra></extra>'
+    ))
+
+    detail = plan.frame(SCATTER_COLUMNS, rows[outliers])
+    fig.add_trace(go.Scattergl(
+        x=detail['xAG'],
+        y=detail['assists'],
+        mode='markers',
+        name=f'Outliers ({n_outliers})',
+        marker=dict(size=6, color=detail['assists_minus_xag'], coloraxis='coloraxis'),
+        customdata=detail[['player', 'team', 'league', 'assists_minus_xag']].to_numpy(),
+        hovertemplate='<b>%{customdata[0]}</b><br>%{customdata[1]} (%{customdata[2]})<br>'
+                      'xAG: %{x:.2f}<br>Assists: %{y:.0f}<br>Diferença: %{customdata[3]:.2f}'
+                      '<extra></extra>'
+    ))
+    fig.update_layout(
+        title=f'{SCATTER_TITLE} — {len(rows):,} jogadores agrupados',
+        xaxis_title=SCATTER_LABELS['xAG'],
+        yaxis_title=SCATTER_LABELS['assists'],
+        coloraxis=dict(colorscale='RdYlGn', cmid=0, colorbar=dict(title='Diferença'))
+    )
+    return fig
+
+
+def xag_assists_scatter(plan):
+    """Scatter xAG vs Assists das linhas do plano de filtros, com o nível de detalhe adequado"""
+    n_rows = len(plan)
+    if n_rows > BINNING_THRESHOLD:
+        fig = _binned_figure(plan)
+        max_val = max(np.nanmax(plan.values('xAG')), np.nanmax(plan.values('assists')))
+    else:
+        df = plan.frame(SCATTER_COLUMNS)
+        fig = _points_figure(df, webgl=n_rows > WEBGL_THRESHOLD)
+        max_val = max(df['xAG'].max(), df['assists'].max())
+
+    fig.add_trace(_reference_line(max_val))
+    fig.update_layout(
+        height=600,
+        hovermode='closest',
+        template='plotly_white'
+    )
+    return fig
+
+
+# ============================================================================
+# GRÁFICOS DE BARRAS E BOXPLOT
+# ============================================================================
+
+def _interval_error(df):
+    """Barras de erro do intervalo de confiança (CI_COLUMNS), se a tabela o tiver"""
+    if not set(CI_COLUMNS) <= set(df.columns):
+        return None
+    low, high = CI_COLUMNS
+    diff = df['assists_minus_xag']
+    return dict(
+        type='data',
+        array=df[high] - diff,
+        arrayminus=diff - df[low],
+        color='rgba(0, 0, 0, 0.35)',
+        thickness=1
+    )
+
+
+def overperformers_bar(top30_over):
+    """
+    Barras horizontais do TOP 30 Overperformers (player, team, league, assists_minus_xag)
+
+    Com as colunas CI_COLUMNS, cada barra leva o intervalo de confiança.
+    """
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        y=top30_over['player'],
+        x=top30_over['assists_minus_xag'],
+        orientation='h',
+        marker=dict(
+            color=top30_over['assists_minus_xag'],
+            colorscale='Greens',
+            showscale=True,
+            colorbar=dict(title="Diff")
+        ),
+        error_x=_interval_error(top30_over),
+        text=top30_over['assists_minus_xag'].round(2),
+        textposition='outside',
+        hovertemplate='<b>%{y}</b><br>' +
+                     'Assists - xAG: %{x:.2f}<br>' +
+                     'Team: %{customdata[0]}<br>' +
+                     'League: %{customdata[1]}<br>' +
+                     '<extra></extra>',
+        customdata=top30_over[['team', 'league']].values
+    ))
+
+    fig.update_layout(
+        title='TOP 30 Overperformers: Assists acima do Esperado',
+        xaxis_title='Assists - xAG',
+        yaxis_title='',
+        height=900,
+        template='plotly_white',
+        yaxis={'categoryorder': 'total ascending'}
+    )
+    return fig
+
+
+def underperformers_bar(top30_sub):
+    """Barras horizontais do TOP 30 Subperformers (mesmas colunas de overperformers_bar)"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        y=top30_sub['player'],
+        x=top30_sub['assists_minus_xag'],
+        orientation='h',
+        marker=dict(
+            color=top30_sub['assists_minus_xag'],
+            colorscale='Reds',
+            showscale=True,
+            colorbar=dict(title="Diff"),
+            reversescale=True
+        ),
+        error_x=_interval_error(top30_sub),
+        text=top30_sub['assists_minus_xag'].round(2),
+        textposition='outside',
+        hovertemplate='<b>%{y}</b><br>' +
+                     'Assists - xAG: %{x:.2f}<br>' +
+                     'Team: %{customdata[0]}<br>' +
+                     'League: %{customdata[1]}<br>' +
+                     '<extra></extra>',
+        customdata=top30_sub[['team', 'league']].values
+    ))
+
+    fig.update_layout(
+        title='TOP 30 Subperformers: Assists abaixo do Esperado',
+        xaxis_title='Assists - xAG',
+        yaxis_title='',
+        height=900,
+        template='plotly_white',
+        yaxis={'categoryorder': 'total descending'}
+    )
+    return fig
+
+
+def league_box(df):
+    """Boxplot de assists_minus_xag por liga (league, assists_minus_xag, player, team)"""
+    fig = px.box(
+        df,
+        x='league',
+        y='assists_minus_xag',
+        color='league',
+        title='Distribuição de Assists - xAG por Liga',
+        labels={
+            'league': 'Liga',
+            'assists_minus_xag': 'Assists - xAG'
+        },
+        hover_data=['player', 'team']
+    )
+
+    fig.update_layout(
+        height=600,
+        template='plotly_white',
+        showlegend=False
+    )
+    return fig
+
+
+def role_box(df):
+    """
+    Boxplot de assists_minus_xag por posição (position_bits, assists_minus_xag, player, team)
+
+    Os grupos saem dos bits de posição; um jogador 'DF,MF' entra nas duas caixas.
+    """
+    bits = df['position_bits'].to_numpy(dtype=np.uint8)
+    values = df['assists_minus_xag'].to_numpy()
+    hover = df[['player', 'team']].to_numpy()
+    fig = go.Figure()
+
+    for code, bit in POSITION_BITS.items():
+        rows = (bits & bit) != 0
+        fig.add_trace(go.Box(
+            y=values[rows],
+            name=POSITION_LABELS[code],
+            customdata=hover[rows],
+            hovertemplate='%{customdata[0]} (%{customdata[1]})<br>'
+                          'Assists - xAG: %{y:.2f}<extra></extra>'
+        ))
+
+    fig.update_layout(
+        title='Distribuição de Assists - xAG por Posição',
+        xaxis_title='Posição',
+        yaxis_title='Assists - xAG',
+        height=600,
+        template='plotly_white',
+        showlegend=False
+    )
+    return fig
+
+
+def per90_bar(top20_p90):
+    """Barras horizontais do TOP 20 por 90 minutos (player, team, minutes, assists_minus_xag_90)"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        y=top20_p90['player'],
+        x=top20_p90['assists_minus_xag_90'],
+        orientation='h',
+        marker=dict(
+            color=top20_p90['assists_minus_xag_90'],
+            colorscale='Viridis',
+            showscale=True,
+            colorbar=dict(title="Diff/90")
+        ),
+        text=top20_p90['assists_minus_xag_90'].round(3),
+        textposition='outside',
+        hovertemplate='<b>%{y}</b><br>' +
+                     'Diff per 90: %{x:.3f}<br>' +
+                     'Team: %{customdata[0]}<br>' +
+                     'Minutes: %{customdata[1]:.0f}<br>' +
+                     '<extra></extra>',
+        customdata=top20_p90[['team', 'minutes']].values
+    ))
+
+    fig.update_layout(
+        title='TOP 20 Assists - xAG por 90 Minutos',
+        xaxis_title='(Assists - xAG) / 90 min',
+        yaxis_title='',
+        height=600,
+        template='plotly_white',
+        yaxis={'categoryorder': 'total ascending'}
+    )
+    return fig
+
+
+# ============================================================================
+# CACHE DE FIGURAS
+# ============================================================================
+
+class SerializedFigure(go.Figure):
+    """
+    Figura já serializada: to_dict()/to_plotly_json() devolvem o JSON guardado
+
+    O st.plotly_chart converte a figura com to_dict() antes de a serializar;
+    assim não se reconstroem nem validam outra vez os objetos Plotly.
+    """
+
+    def __init__(self, spec):
+        super().__init__()
+        self._spec = spec
+
+    def to_dict(self):
+        return json.loads(self._spec)
+
+    to_plotly_json = to_dict
+
+
+class FigureCache:
+    """
+    LRU de figuras serializadas (JSON do Plotly), limitado pelo tamanho total
+
+    As chaves são (versão dos dados, id da figura, assinatura do filtro). O JSON
+    é imutável, por isso a mesma entrada serve todas as sessões; vistas populares
+    (p.ex. a vista por omissão) não voltam a construir a figura.
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def figure(self, key, build):
+        """Figura guardada em `key`, ou build() serializada (e guardada para os pedidos seguintes)"""
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if spec is None:
+            spec = build().to_json()
+            self._put(key, spec)
+        return SerializedFigure(spec)
+
+    def _put(self, key, spec):
+        size = len(spec)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._specs.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._specs[key] = spec
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._specs.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def stats(self):
+        """Entradas, bytes de JSON guardados, hits e misses"""
+        with self._lock:
+            return {'entries': len(self._specs), 'bytes': self.bytes,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,151 @@
+"""
+Exportação dos resultados filtrados (CSV, Parquet, XLSX)
+Os ficheiros só são gerados quando um download é pedido, escritos bloco a bloco
+(sem montar a tabela inteira) para uma cache em disco indexada pela assinatura
+do filtro, não pelo conteúdo: o mesmo filtro no mesmo formato é gerado uma vez.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import openpyxl
+except ImportError:  # dependência opcional (XLSX)
+    openpyxl = None
+
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_CACHE_BYTES = 256 * 1024 * 1024
+
+# formato → (nome, extensão, MIME)
+EXPORT_FORMATS = {
+    'csv': ('CSV', '.csv', 'text/csv'),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('Excel', '.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def available_formats():
+    """Formatos suportados neste ambiente (XLSX precisa do openpyxl)"""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'xlsx' or openpyxl is not None]
+
+
+# ============================================================================
+# ESCRITA POR BLOCOS
+# ============================================================================
+
+def write_csv(frames, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for i, df in enumerate(frames):
+            df.to_csv(f, header=i == 0, index=False)
+
+
+def write_parquet(frames, path):
+    """Um row group por bloco; todos os blocos com o esquema do primeiro"""
+    writer = None
+    try:
+        for df in frames:
+            if writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+            else:
+                table = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_xlsx(frames, path):
+    """Workbook em modo write-only do openpyxl: as linhas vão para o ficheiro à medida que são escritas"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Jogadores')
+    for i, df in enumerate(frames):
+        if i == 0:
+            ws.append(list(df.columns))
+        # NaN/NA → célula vazia
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False):
+            ws.append(list(row))
+    wb.save(path)
+
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet, 'xlsx': write_xlsx}
+
+
+# ============================================================================
+# CACHE DE EXPORTAÇÕES
+# ============================================================================
+
+class ExportCache:
+    """
+    Ficheiros exportados num diretório temporário, com evição LRU por tamanho
+
+    `key` identifica o resultado (p.ex. versão dos dados + assinatura do filtro +
+    seleção); frames() só é chamado quando o ficheiro ainda não existe.
+    """
+
+    def __init__(self, max_bytes=EXPORT_CACHE_BYTES, root=None):
+        if root is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix='fbref_exports_')
+            root = self._tmp.name
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()  # caminho → bytes
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key, fmt):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return self.root / f'{digest}{EXPORT_FORMATS[fmt][1]}'
+
+    def export(self, key, fmt, frames):
+        """Caminho do ficheiro `fmt` com as tabelas de frames() (gerado só se ainda não existir)"""
+        path = self.path(key, fmt)
+        with self._lock:
+            if path in self._files and path.exists():
+                self._files.move_to_end(path)
+                self.hits += 1
+                return path
+            self.misses += 1
+
+        # Ficheiro temporário por thread: dois cliques simultâneos não se misturam
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            WRITERS[fmt](frames(), tmp)
+            tmp.replace(path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        size = path.stat().st_size
+        with self._lock:
+            self.bytes -= self._files.pop(path, 0)
+            self._files[path] = size
+            self.bytes += size
+            # O ficheiro acabado de gerar fica sempre, mesmo acima do limite
+            while self.bytes > self.max_bytes and len(self._files) > 1:
+                evicted, evicted_size = self._files.popitem(last=False)
+                evicted.unlink(missing_ok=True)
+                self.bytes -= evicted_size
+        return path
+
+    def payload(self, key, fmt, frames):
+        """Conteúdo do ficheiro exportado, para o st.download_button"""
+        try:
+            return self.export(key, fmt, frames).read_bytes()
+        except FileNotFoundError:  # removido pela evição noutra thread antes da leitura
+            return self.export(key, fmt, frames).read_bytes()
+
+    def stats(self):
+        """Ficheiros, bytes em disco, hits e misses"""
+        with self._lock:
+            return {'files': len(self._files), 'bytes': self.bytes,
+                    'hits': self.hits, 'misses': self.misses}
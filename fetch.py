@@ -0,0 +1,236 @@
+"""
+Motor de recolha paralela do FBref
+Divide ligas × temporadas × stat types em unidades independentes e executa-as num pool de workers,
+com token bucket por host (também nas tentativas repetidas pelo soccerdata) e fallback por unidade
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlparse
+
+import pandas as pd
+
+# Intervalo mínimo entre pedidos ao mesmo host (o FBref bloqueia acima de ~10 pedidos/min)
+FBREF_MIN_INTERVAL = 7.0
+DEFAULT_WORKERS = 4
+
+BIG5_COMBINED = 'Big 5 European Leagues Combined'
+
+# Stat types aceites por sd.FBref.read_player_season_stats
+PLAYER_STAT_TYPES = ['standard', 'keeper', 'shooting', 'playing_time', 'misc']
+
+
+class EmptyUnitError(ValueError):
+    """Unidade lida sem erros mas sem linhas (conta como falha, para o fallback)"""
+
+
+@dataclass(frozen=True)
+class FetchUnit:
+    """Unidade de trabalho: um stat type de uma liga numa temporada"""
+    league: str
+    season: str
+    stat_type: str = "standard"
+
+
+def build_units(leagues, seasons, stat_types=("standard",)):
+    """Gerar a lista de unidades (liga, temporada, stat type)"""
+    invalid = set(stat_types) - set(PLAYER_STAT_TYPES)
+    if invalid:
+        raise ValueError(f"Stat types inválidos: {sorted(invalid)} (aceites: {PLAYER_STAT_TYPES})")
+    return [
+        FetchUnit(league, season, stat_type)
+        for league in leagues for season in seasons for stat_type in stat_types
+    ]
+
+
+class TokenBucket:
+    """Token bucket: `rate` pedidos/s em média, com rajadas até `burst` pedidos"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Reservar um token; devolve os segundos a esperar antes de o usar"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # O saldo pode ficar negativo: os pedidos seguintes ficam em fila por ordem
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class HostRateLimiter:
+    """Um token bucket por host, partilhado entre todos os workers"""
+
+    def __init__(self, min_interval=FBREF_MIN_INTERVAL, burst=1):
+        self.min_interval = min_interval
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """Bloquear até haver token para um novo pedido a `host`"""
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(1 / self.min_interval, self.burst)
+        delay = bucket.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def league_fallback(leagues):
+    """
+    Fallback por unidade: se a unidade Big 5 combinada de uma temporada falhar,
+    recolher só essa temporada liga a liga
+    """
+    def fallback(unit):
+        if unit.league != BIG5_COMBINED:
+            return None
+        return [FetchUnit(league, unit.season, unit.stat_type) for league in leagues]
+
+    return fallback
+
+
+def _throttled(get, limiter):
+    """`get(url, ...)` que espera por um token do host de `url` antes de cada pedido"""
+    def throttled_get(url, *args, **kwargs):
+        limiter.wait(urlparse(url).netloc)
+        return get(url, *args, **kwargs)
+
+    return throttled_get
+
+
+def _throttle(reader, limiter):
+    """
+    Fazer passar todos os pedidos (não os hits de cache) pelo limitador partilhado
+
+    O soccerdata tenta cada download até 5 vezes e recria o browser (ou a sessão
+    HTTP) entre tentativas; o `get` de cada browser/sessão, incluindo os recriados,
+    é limitado, por isso também as tentativas repetidas gastam tokens. Leitores sem
+    browser nem sessão (p.ex. o de replay) são limitados em _download_and_save.
+    """
+    for transport_attr, init_attr in (('_driver', '_init_webdriver'), ('_session', '_init_session')):
+        transport = getattr(reader, transport_attr, None)
+        if transport is None:
+            continue
+        transport.get = _throttled(transport.get, limiter)
+        init = getattr(reader, init_attr)
+
+        def init_throttled(*args, _init=init, **kwargs):
+            new = _init(*args, **kwargs)
+            new.get = _throttled(new.get, limiter)
+            return new
+
+        setattr(reader, init_attr, init_throttled)
+        break
+    else:
+        reader._download_and_save = _throttled(reader._download_and_save, limiter)
+    # A espera fixa do soccerdata por instância é substituída pelo limitador
+    reader.rate_limit = 0
+    return reader
+
+
+def default_reader_factory(unit, no_cache=False, data_dir=None):
+    """Criar um leitor sd.FBref para uma única unidade"""
+    import soccerdata as sd
+
+    kwargs = {'leagues': unit.league, 'seasons': unit.season, 'no_cache': no_cache}
+    if data_dir is not None:
+        # Diretório com páginas gravadas: permite correr sem rede
+        kwargs['data_dir'] = Path(data_dir)
+    return sd.FBref(**kwargs)
+
+
+def close_reader(reader):
+    """Fechar o browser do leitor (o sd.FBref do soccerdata arranca um Chrome por instância)"""
+    driver = getattr(reader, '_driver', None)
+    if driver is not None:
+        try:
+            driver.quit()
+        except Exception:
+            pass  # browser já terminado
+
+
+def fetch_unit(unit, reader_factory=default_reader_factory, limiter=None, **reader_kwargs):
+    """
+    Ler as estatísticas de jogadores de uma unidade; o leitor é sempre fechado no fim
+
+    Uma unidade sem linhas lança EmptyUnitError, para que o fallback a substitua
+    em vez de a temporada desaparecer do resultado.
+    """
+    reader = reader_factory(unit, **reader_kwargs)
+    try:
+        if limiter is not None:
+            _throttle(reader, limiter)
+        frame = reader.read_player_season_stats(stat_type=unit.stat_type)
+    finally:
+        close_reader(reader)
+    if len(frame) == 0:
+        raise EmptyUnitError(f"{unit.league} {unit.season} ({unit.stat_type}) sem linhas")
+    return frame
+
+
+def fetch_player_season_stats(units, max_workers=DEFAULT_WORKERS, limiter=None,
+                              reader_factory=default_reader_factory, on_done=None, fallback=None,
+                              **reader_kwargs):
+    """
+    Executar as unidades num pool limitado e concatenar os resultados por stat type
+
+    Cada download já é repetido pelo soccerdata (até 5 tentativas, todas pelo
+    limitador). Se uma unidade falhar e `fallback(unit)` devolver outras unidades,
+    só essas entram na fila; o resto do trabalho não é repetido.
+
+    Devolve ({stat_type: DataFrame}, {unidade: exceção}) com as unidades que
+    falharam sem fallback, para que quem chama decida o que fazer com elas.
+    """
+    if limiter is None:
+        limiter = HostRateLimiter()
+
+    order = list(units)
+    frames = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        def submit(unit):
+            return pool.submit(fetch_unit, unit, reader_factory, limiter, **reader_kwargs)
+
+        pending = {submit(unit): unit for unit in units}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = pending.pop(future)
+                error = None
+                try:
+                    frames[unit] = future.result()
+                except Exception as e:
+                    error = e
+
+                replacements = fallback(unit) if error is not None and fallback is not None else None
+                if error is not None and not replacements:
+                    errors[unit] = error
+                if on_done is not None:
+                    on_done(unit, error)
+                for replacement in replacements or []:
+                    order.append(replacement)
+                    pending[submit(replacement)] = replacement
+
+    # Manter a ordem das unidades (fallbacks no fim) para um resultado determinístico
+    tables = {}
+    for stat_type in dict.fromkeys(unit.stat_type for unit in order):
+        ordered = [
+            frames[unit] for unit in order
+            if unit.stat_type == stat_type and unit in frames and len(frames[unit]) > 0
+        ]
+        if ordered:
+            tables[stat_type] = pd.concat(ordered).sort_index()
+    return tables, errors
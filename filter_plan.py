@@ -0,0 +1,60 @@
+"""
+Plano de filtros do dashboard
+Todos os predicados ativos são combinados numa só máscara sobre a tabela base,
+que nunca é copiada; quem consome o resultado recebe índices de linhas, colunas
+já selecionadas ou, só para exibição, uma tabela com as linhas e colunas pedidas.
+"""
+
+import numpy as np
+
+
+class FilterPlan:
+    """
+    Máscara acumulada sobre `base`, com uma assinatura dos predicados aplicados
+
+    A assinatura (tuplo das chaves passadas a where) identifica o
+    resultado do filtro e pode ser usada como chave de cache.
+    """
+
+    def __init__(self, base, mask=None, key=None):
+        self.base = base
+        if mask is None:
+            self.mask = np.ones(len(base), dtype=bool)
+        else:
+            self.mask = np.array(mask, dtype=bool)
+        self.signature = () if key is None else (key,)
+        self._rows = None
+
+    def where(self, key, mask):
+        """Juntar um predicado dado como máscara sobre todas as linhas da base"""
+        np.logical_and(self.mask, mask, out=self.mask)
+        self.signature += (key,)
+        self._rows = None
+        return self
+
+    def rows(self):
+        """Índices (posições) das linhas que passam em todos os predicados"""
+        if self._rows is None:
+            self._rows = np.flatnonzero(self.mask)
+        return self._rows
+
+    def __len__(self):
+        return len(self.rows())
+
+    def values(self, column, rows=None):
+        """Valores de uma coluna nas linhas ativas (ou nas posições `rows`)"""
+        return self.base[column].to_numpy()[self.rows() if rows is None else rows]
+
+    def series(self, column, rows=None):
+        """Como values(), mas mantendo o dtype do pandas (p.ex. strings Arrow para .str)"""
+        return self.base[column].take(self.rows() if rows is None else rows)
+
+    def frame(self, columns, rows=None):
+        """Tabela só com `columns` nas linhas ativas (ou `rows`), para exibição ou gráficos"""
+        return self.base[columns].take(self.rows() if rows is None else rows)
+
+    def frames(self, columns, rows=None, chunk_rows=50_000):
+        """Como frame(), em blocos de até `chunk_rows` linhas (pelo menos um, mesmo vazio)"""
+        rows = self.rows() if rows is None else rows
+        for start in range(0, max(len(rows), 1), chunk_rows):
+            yield self.frame(columns, rows[start:start + chunk_rows])
@@ -1,93 +1,117 @@
 """
-Script para gerar dados pré-carregados do FBref
+Script para gerar dados pré-carregados do FBref (store Parquet em fbref_store/)
 Execute localmente: python generate_data.py
+Por omissão só volta a recolher temporadas em falta ou em curso;
+use `python generate_data.py --full` para recolher todas as temporadas.
 """
 
-import soccerdata as sd
-import pandas as pd
+import os
+import sys
 import warnings
 
+from fetch import (
+    build_units, fetch_player_season_stats, default_reader_factory,
+    HostRateLimiter, FBREF_MIN_INTERVAL
+)
+from store import (
+    stale_seasons, fresh_page_seasons, save_season_partitions, scan_season_partitions,
+    raw_available, save_stats, save_player_seasons, STATS_DIR, PLAYER_SEASONS_DIR
+)
+from page_cache import PageCache, PAGE_CACHE_DIR, DEFAULT_MAX_BYTES, cached_reader_factory
+from pipeline import (LEAGUES, SEASONS, EXTRA_STAT_TYPES, wide_table, aggregate, percentile_ranks,
+                      season_rows, collect)
+
 warnings.filterwarnings('ignore')
 
 print("🔄 Carregando dados do FBref...")
 
-LEAGUES = [
-    'ENG-Premier League',
-    'ESP-La Liga',
-    'FRA-Ligue 1',
-    'GER-Bundesliga',
-    'ITA-Serie A'
+# Paralelismo e limite de pedidos configuráveis por variáveis de ambiente
+MAX_WORKERS = int(os.environ.get('FBREF_WORKERS', '4'))
+MIN_INTERVAL = float(os.environ.get('FBREF_MIN_INTERVAL', FBREF_MIN_INTERVAL))
+# Cache de páginas comprimida e partilhada (volume ./cache no docker-compose)
+CACHE_DIR = os.environ.get('FBREF_CACHE_DIR', str(PAGE_CACHE_DIR))
+CACHE_MAX_BYTES = int(float(os.environ.get('FBREF_CACHE_MAX_MB', DEFAULT_MAX_BYTES / 2**20)) * 2**20)
+# Diretório com páginas gravadas (opcional, para correr offline)
+DATA_DIR = os.environ.get('FBREF_DATA_DIR')
+FULL_REFRESH = '--full' in sys.argv[1:]
+# Stat types a juntar na tabela larga ("standard" é sempre incluído)
+STAT_TYPES = ['standard'] + [
+    stat_type.strip()
+    for stat_type in os.environ.get('FBREF_STAT_TYPES', ','.join(EXTRA_STAT_TYPES)).split(',')
+    if stat_type.strip() and stat_type.strip() != 'standard'
 ]
-SEASONS = ['1718', '1819', '1920', '2021', '2122', '2223', '2324', '2425']
+
+
+def report_unit(unit, error):
+    if error is None:
+        print(f"   ✓ {unit.league} {unit.season} {unit.stat_type}")
+    else:
+        print(f"   ✗ {unit.league} {unit.season} {unit.stat_type}: {error}")
+
 
 try:
-    fbref = sd.FBref(leagues=LEAGUES, seasons=SEASONS, no_cache=False)
-    player_season_stats = fbref.read_player_season_stats(stat_type="standard")
+    seasons_to_fetch = SEASONS if FULL_REFRESH else stale_seasons(SEASONS, stat_types=STAT_TYPES)
+    # Em curso ou recolhidas enquanto estavam em curso: as páginas em cache são de meio da temporada
+    fresh_seasons = set(fresh_page_seasons(seasons_to_fetch))
     
-    print(f"✅ Dados carregados: {len(player_season_stats)} registros")
+    page_cache = PageCache(CACHE_DIR, CACHE_MAX_BYTES)
     
-    # Processar colunas
-    all_columns = player_season_stats.columns.tolist()
-    column_mapping = {}
+    def season_reader_factory(unit, **kwargs):
+        # Essas temporadas ignoram a cache de páginas e a do soccerdata (exceto offline)
+        no_cache = unit.season in fresh_seasons and DATA_DIR is None
+        return default_reader_factory(unit, no_cache=no_cache, data_dir=DATA_DIR)
     
-    for idx, col in enumerate(all_columns):
-        col_str = str(col).lower()
-        
-        if 'pos' in col_str and 'position' not in column_mapping:
-            column_mapping['position'] = idx
-        elif ('mp' == col_str or 'matches' in col_str) and 'matches' not in column_mapping:
-            column_mapping['matches'] = idx
-        elif 'min' in col_str and 'minutes' not in column_mapping and 'per' not in col_str:
-            column_mapping['minutes'] = idx
-        elif (col_str == 'ast' or 'assist' in col_str) and 'assists' not in column_mapping and 'xag' not in col_str:
-            column_mapping['assists'] = idx
-        elif 'xag' in col_str and 'xAG' not in column_mapping:
-            column_mapping['xAG'] = idx
+    reader_factory = cached_reader_factory(page_cache, season_reader_factory)
     
-    if len(column_mapping) < 5:
-        selected_indices = [1, 4, 6, 9, 18]
-        df = player_season_stats.iloc[:, selected_indices].copy()
-        df.columns = ['position', 'matches', 'minutes', 'assists', 'xAG']
+    if seasons_to_fetch:
+        units = build_units(LEAGUES, seasons_to_fetch, STAT_TYPES)
+        print(f"📡 Temporadas a recolher: {seasons_to_fetch}")
+        print(f"📡 Stat types: {STAT_TYPES}")
+        print(f"📡 {len(units)} unidades (liga × temporada × stat type) com {MAX_WORKERS} workers...")
+        
+        fetched, errors = fetch_player_season_stats(
+            units,
+            max_workers=MAX_WORKERS,
+            limiter=HostRateLimiter(MIN_INTERVAL),
+            reader_factory=reader_factory,
+            on_done=report_unit
+        )
+        cache_stats = page_cache.stats()
+        print(f"🗄️  Cache de páginas: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['urls']} URLs em {cache_stats['objects']} objetos "
+              f"({cache_stats['bytes'] / 2**20:.1f} MB)")
+        
+        # Só gravar temporadas completas em todas as ligas e stat types;
+        # as outras mantêm a partição anterior
+        failed_seasons = {unit.season for unit in errors}
+        if errors:
+            print(f"⚠️  {len(errors)} unidades falharam (temporadas {sorted(failed_seasons)})")
+        if 'standard' in fetched:
+            save_season_partitions(
+                wide_table(fetched),
+                [s for s in seasons_to_fetch if s not in failed_seasons],
+                stat_types=STAT_TYPES
+            )
     else:
-        selected_indices = [
-            column_mapping['position'],
-            column_mapping['matches'],
-            column_mapping['minutes'],
-            column_mapping['assists'],
-            column_mapping['xAG']
-        ]
-        df = player_season_stats.iloc[:, selected_indices].copy()
-        df.columns = ['position', 'matches', 'minutes', 'assists', 'xAG']
-    
-    # Resetar index
-    df = df.reset_index()
-    
-    # Agregar dados
-    stats = df.groupby(['league', 'team', 'player']).agg({
-        'matches': 'sum',
-        'assists': 'sum',
-        'xAG': 'sum',
-        'minutes': 'sum',
-        'position': 'first'
-    }).reset_index()
+        print("✅ Todas as temporadas estão atualizadas, nada a recolher")
     
-    # Calcular métricas
-    stats['assists_minus_xag'] = stats['assists'] - stats['xAG']
-    stats['assists_minus_xag_90'] = (stats['assists'] - stats['xAG']) / stats['minutes'] * 90
+    # Reconstruir a partir de todas as partições (liga, temporada) com o pipeline partilhado
+    if not raw_available():
+        raise ValueError("Nenhum jogador foi carregado")
     
-    # Filtrar
-    stats = stats[
-        (stats['minutes'] > 450) &
-        (stats['xAG'] > 0)
-    ]
+    rows = scan_season_partitions(SEASONS, LEAGUES)
+    stats = collect(percentile_ranks(aggregate(rows))).to_pandas()
+    player_seasons = collect(season_rows(rows)).to_pandas()
     
-    # Salvar CSV
-    output_file = 'fbref_data.csv'
-    stats.to_csv(output_file, index=False)
+    # Gravar store Parquet
+    save_stats(stats)
+    save_player_seasons(player_seasons)
     
-    print(f"✅ Dados salvos em: {output_file}")
+    size_kb = sum(f.stat().st_size for d in (STATS_DIR, PLAYER_SEASONS_DIR)
+                  for f in d.rglob('*.parquet')) / 1024
+    print(f"✅ Dados salvos em: {STATS_DIR}")
     print(f"📊 Total jogadores processados: {len(stats)}")
-    print(f"📁 Tamanho do arquivo: {len(stats.to_csv(index=False)) / 1024:.2f} KB")
+    print(f"📁 Tamanho do store: {size_kb:.2f} KB")
     
 except Exception as e:
     print(f"❌ Erro: {e}")
@@ -0,0 +1,44 @@
+"""
+Intervalos de confiança para assists - xAG
+As assists de um jogador são tratadas como uma contagem de Poisson e o xAG como
+o valor esperado: o intervalo exato (Garwood) da média de Poisson, pela
+aproximação de Byar, é calculado para todos os jogadores numa só passagem NumPy.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+
+CI_LEVEL = 0.95
+CI_COLUMNS = ['assists_minus_xag_low', 'assists_minus_xag_high']
+
+
+def poisson_interval(counts, level=CI_LEVEL):
+    """
+    Intervalo (inferior, superior) da média de Poisson para cada contagem observada
+
+    Aproximação de Byar aos quantis do qui-quadrado do intervalo exato: erro
+    abaixo de 0.03 assists nas contagens pequenas e desprezável a partir de ~5;
+    0 assists → limite inferior 0.
+    """
+    counts = np.asarray(counts, dtype=float)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lower = counts * (1 - 1 / (9 * counts) - z / (3 * np.sqrt(counts))) ** 3
+    lower = np.where(counts > 0, lower, 0.0)
+    upper_n = counts + 1
+    upper = upper_n * (1 - 1 / (9 * upper_n) + z / (3 * np.sqrt(upper_n))) ** 3
+    return lower, upper
+
+
+def assists_minus_xag_interval(assists, xag, level=CI_LEVEL):
+    """Intervalo de (média de assists - xAG): um jogador é overperformer significativo se o inferior > 0"""
+    lower, upper = poisson_interval(assists, level)
+    xag = np.asarray(xag, dtype=float)
+    return lower - xag, upper - xag
+
+
+def add_intervals(df, level=CI_LEVEL):
+    """`df` com as colunas CI_COLUMNS (limites do intervalo de assists_minus_xag)"""
+    low, high = assists_minus_xag_interval(df['assists'].to_numpy(), df['xAG'].to_numpy(), level)
+    return df.assign(**dict(zip(CI_COLUMNS, (low, high))))
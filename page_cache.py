@@ -0,0 +1,341 @@
+"""
+Cache de páginas do FBref endereçada por conteúdo
+Páginas comprimidas com zstd (zlib só como recurso se o zstandard faltar), payloads repetidos
+gravados uma só vez, índice URL → digest e evição LRU limitada por tamanho.
+Pode ser partilhada por vários processos/containers no mesmo volume.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # está no requirements.txt; zlib só como rede de segurança
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+PAGE_CACHE_DIR = Path('cache') / 'pages'  # montado em /app/cache no docker-compose
+DEFAULT_MAX_BYTES = 512 * 2**20
+INDEX_FILE = 'index.json'
+JOURNAL_FILE = 'index.{}.log'
+LOCK_FILE = 'index.lock'
+COMPACT_EVERY = 1000  # linhas do journal antes de gravar um novo snapshot
+EVICT_TO = 0.9  # a evição desce até esta fração de max_bytes, para não correr em cada put
+ZSTD_LEVEL = 10
+
+
+# ============================================================================
+# COMPRESSÃO
+# ============================================================================
+
+def _compress(payload):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload), 'zst'
+    return zlib.compress(payload, 9), 'zlib'
+
+
+def _readable(codec):
+    """Sem o pacote zstandard, os objetos zstd de outro processo contam como miss"""
+    return codec != 'zst' or zstandard is not None
+
+
+def _decompress(data, codec):
+    if codec == 'zst':
+        if zstandard is None:
+            raise RuntimeError("Página gravada com zstd mas o pacote zstandard não está instalado")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class PageCache:
+    """
+    Cache URL → página, com os objetos guardados por sha256 do conteúdo
+
+    O índice ({'urls': {url: {digest, stored_at}}, 'objects': {digest: {size, codec}}})
+    é um snapshot (index.json) mais um journal (index.<geração>.log) de alterações
+    em linhas JSON: cada put acrescenta as suas linhas em vez de reescrever o índice,
+    e o journal só é compactado num novo snapshot a cada COMPACT_EVERY linhas.
+    As escritas são feitas com um lock de ficheiro exclusivo e as leituras com um
+    partilhado, e o snapshot é substituído atomicamente, por isso leitores nunca
+    veem um estado a meio nem um objeto evictado entre o índice e o ficheiro. O mtime de cada
+    objeto é o relógio do LRU: uma leitura só toca no ficheiro, sem escrever no índice.
+    """
+
+    def __init__(self, root=PAGE_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index = {'urls': {}, 'objects': {}}
+        self._index_mtime = None
+        self._generation = 0
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        (self.root / 'objects').mkdir(parents=True, exist_ok=True)
+
+    # ---------------------------------------------------------------- índice
+
+    @property
+    def _index_path(self):
+        return self.root / INDEX_FILE
+
+    def _journal_path(self, generation):
+        return self.root / JOURNAL_FILE.format(generation)
+
+    @contextmanager
+    def _file_lock(self, shared=False):
+        """
+        Lock entre processos (e threads) sobre o índice: exclusivo para alterar,
+        partilhado (`shared`) para ler. O msvcrt só tem locks exclusivos.
+        """
+        with self._lock, open(self.root / LOCK_FILE, 'a+b') as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _apply(self, record):
+        """Aplicar uma linha do journal ao índice em memória"""
+        urls, objects = self._index['urls'], self._index['objects']
+        if 'object' in record:
+            previous = objects.get(record['object'])
+            self._bytes += record['size'] - (previous['size'] if previous else 0)
+            objects[record['object']] = {'size': record['size'], 'codec': record['codec']}
+        elif 'url' in record:
+            urls[record['url']] = {'digest': record['digest'], 'stored_at': record['stored_at']}
+        else:
+            evicted = set(record['evict'])
+            for digest in evicted:
+                meta = objects.pop(digest, None)
+                if meta is not None:
+                    self._bytes -= meta['size']
+            for url in [url for url, entry in urls.items() if entry['digest'] in evicted]:
+                del urls[url]
+
+    def _read_index(self):
+        """
+        Índice atual (chamar com self._lock)
+
+        Só volta a ler o snapshot se outro processo o compactou; de resto lê apenas
+        as linhas do journal acrescentadas desde a última leitura.
+        """
+        try:
+            mtime = self._index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._index_mtime:
+            index = {'urls': {}, 'objects': {}}
+            if mtime is not None:
+                with open(self._index_path, encoding='utf-8') as fh:
+                    index = json.load(fh)
+            self._index = {'urls': index['urls'], 'objects': index['objects']}
+            self._generation = index.get('journal', 0)
+            self._journal_offset = self._journal_lines = 0
+            self._bytes = sum(meta['size'] for meta in self._index['objects'].values())
+            self._index_mtime = mtime
+        try:
+            with open(self._journal_path(self._generation), 'rb') as fh:
+                fh.seek(self._journal_offset)
+                data = fh.read()
+        except FileNotFoundError:
+            return self._index
+        # Só linhas completas: uma escrita a meio de outro processo é lida da próxima vez
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            self._apply(json.loads(line))
+            self._journal_lines += 1
+        self._journal_offset += len(complete)
+        return self._index
+
+    def _append(self, records):
+        """Acrescentar `records` ao journal e ao índice em memória (chamar com o lock de ficheiro)"""
+        data = ''.join(json.dumps(record, sort_keys=True) + '\n' for record in records).encode('utf-8')
+        with open(self._journal_path(self._generation), 'ab') as fh:
+            fh.write(data)
+        for record in records:
+            self._apply(record)
+        self._journal_offset += len(data)
+        self._journal_lines += len(records)
+        if self._journal_lines >= COMPACT_EVERY:
+            self._compact()
+
+    def _compact(self):
+        """Gravar o índice num novo snapshot com um journal vazio (chamar com o lock de ficheiro)"""
+        old_journal = self._journal_path(self._generation)
+        self._generation += 1
+        tmp = self._index_path.with_name(f'{INDEX_FILE}.{os.getpid()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({**self._index, 'journal': self._generation}, fh, sort_keys=True)
+        tmp.replace(self._index_path)
+        self._index_mtime = self._index_path.stat().st_mtime_ns
+        self._journal_offset = self._journal_lines = 0
+        old_journal.unlink(missing_ok=True)
+
+    def _object_path(self, digest, codec):
+        return self.root / 'objects' / digest[:2] / f'{digest}.{codec}'
+
+    # ---------------------------------------------------------------- API
+
+    def get(self, url, max_age=None):
+        """Conteúdo da página de `url`, ou None se não estiver na cache (ou tiver mais de `max_age` s)"""
+        # Lock partilhado: um compact/evict de outro processo não corre entre o índice e o objeto
+        with self._file_lock(shared=True):
+            index = self._read_index()
+            entry = index['urls'].get(url)
+            meta = index['objects'].get(entry['digest']) if entry is not None else None
+            if (meta is None or not _readable(meta['codec'])
+                    or (max_age is not None and time.time() - entry['stored_at'] > max_age)):
+                self.misses += 1
+                return None
+            path = self._object_path(entry['digest'], meta['codec'])
+            try:
+                data = path.read_bytes()
+                os.utime(path)  # marcar como usado para o LRU
+            except FileNotFoundError:
+                # Objeto apagado à mão (ou por uma versão sem lock) depois do índice
+                self.misses += 1
+                return None
+            self.hits += 1
+        return _decompress(data, meta['codec'])
+
+    def put(self, url, payload):
+        """Guardar `payload` para `url`; o conteúdo só é gravado se o digest ainda não existir"""
+        digest = hashlib.sha256(payload).hexdigest()
+        with self._file_lock():
+            index = self._read_index()
+            records = []
+            meta = index['objects'].get(digest)
+            path = self._object_path(digest, meta['codec']) if meta else None
+            if path is None or not _readable(meta['codec']) or not path.exists():
+                data, codec = _compress(payload)
+                path = self._object_path(digest, codec)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+                tmp.write_bytes(data)
+                tmp.replace(path)
+                records.append({'object': digest, 'size': len(data), 'codec': codec})
+            else:
+                os.utime(path)
+            records.append({'url': url, 'digest': digest, 'stored_at': time.time()})
+            self._append(records)
+            self._evict()
+        return digest
+
+    def _evict(self):
+        """Acima de max_bytes, remover os objetos usados há mais tempo até EVICT_TO × max_bytes"""
+        if self._bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO
+        objects = self._index['objects']
+
+        def last_used(digest):
+            try:
+                return self._object_path(digest, objects[digest]['codec']).stat().st_mtime
+            except FileNotFoundError:
+                return 0
+
+        total = self._bytes
+        evicted = []
+        for digest in sorted(objects, key=last_used):
+            if total <= target:
+                break
+            meta = objects[digest]
+            self._object_path(digest, meta['codec']).unlink(missing_ok=True)
+            total -= meta['size']
+            evicted.append(digest)
+        self._append([{'evict': evicted}])
+
+    def stats(self):
+        """Resumo para logs: URLs, objetos distintos, bytes em disco, hits e misses"""
+        with self._file_lock(shared=True):
+            index = self._read_index()
+            return {
+                'urls': len(index['urls']),
+                'objects': len(index['objects']),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# ============================================================================
+# LEITORES
+# ============================================================================
+
+def _max_age_seconds(max_age):
+    """max_age do soccerdata (dias ou timedelta) em segundos"""
+    if max_age is None:
+        return None
+    if isinstance(max_age, timedelta):
+        return max_age.total_seconds()
+    return max_age * 86400
+
+
+def cached_reader_factory(cache, reader_factory=None):
+    """
+    Fábrica de leitores para fetch.py que serve as páginas a partir de `cache`
+
+    Num miss usa o `get` original do soccerdata (cache antiga em disco ou download,
+    já com o rate limit) e guarda o resultado; o soccerdata deixa de gravar as
+    páginas descomprimidas. Com no_cache a página é descarregada de novo uma vez
+    por fábrica: as páginas partilhadas pelas unidades (lista de ligas, temporadas
+    de cada liga) não voltam a ser pedidas a cada leitor.
+    """
+    if reader_factory is None:
+        from fetch import default_reader_factory as reader_factory
+    downloaded = set()  # URLs já descarregados (frescos) por leitores desta fábrica
+    lock = threading.Lock()
+
+    def factory(unit, **kwargs):
+        reader = reader_factory(unit, **kwargs)
+        original_get = reader.get
+        reader.no_store = True
+
+        def get(url, filepath=None, max_age=None, no_cache=False, var=None):
+            if var is not None:
+                return original_get(url, filepath, max_age=max_age, no_cache=no_cache, var=var)
+            with lock:
+                fresh = url in downloaded
+            if fresh or not (no_cache or reader.no_cache):
+                payload = cache.get(url, _max_age_seconds(max_age))
+                if payload is not None:
+                    return io.BytesIO(payload)
+            with original_get(url, filepath, max_age=max_age, no_cache=no_cache) as data:
+                payload = data.read()
+            cache.put(url, payload)
+            with lock:
+                downloaded.add(url)
+            return io.BytesIO(payload)
+
+        reader.get = get
+        return reader
+
+    return factory
@@ -0,0 +1,292 @@
+"""
+Pipeline partilhado: mapeamento de colunas + agregação por jogador
+Usado por app.py, generate_data.py e streamlit_app.py (um único caminho em Polars lazy)
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+LEAGUES = [
+    'ENG-Premier League',
+    'ESP-La Liga',
+    'FRA-Ligue 1',
+    'GER-Bundesliga',
+    'ITA-Serie A'
+]
+SEASONS = ['1718', '1819', '1920', '2021', '2122', '2223', '2324', '2425']
+
+MAPPED_COLUMNS = ['position', 'matches', 'minutes', 'assists', 'xAG']
+# Índices conhecidos no output "standard" do soccerdata: posição, jogos, minutos, assists, xAG
+FALLBACK_INDICES = [1, 4, 6, 9, 18]
+# Ano de nascimento ('Born'): com o nome, identifica o jogador (player_identity.py)
+FALLBACK_BORN_INDEX = 3
+
+# Stat types extra juntados à tabela larga (além do "standard")
+EXTRA_STAT_TYPES = ['shooting', 'playing_time', 'misc']
+# Colunas de identificação repetidas em todos os stat types
+IDENTITY_COLUMNS = {'nation', 'pos', 'age', 'born'}
+
+# Posições do FBref como bits (coluna position_bits, UInt8): 'DF,MF' → DF | MF
+POSITION_BITS = {'GK': 1, 'DF': 2, 'MF': 4, 'FW': 8}
+POSITION_LABELS = {'GK': 'Guarda-redes', 'DF': 'Defesa', 'MF': 'Médio', 'FW': 'Avançado'}
+
+# Critérios de qualificação de um jogador
+MIN_MINUTES = 450  # Pelo menos 5 jogos de 90 min
+MIN_XAG = 0  # Garantir que tem dados de xAG
+
+# Percentis calculados depois da agregação: métrica × âmbito (liga, posição, todos)
+PERCENTILE_METRICS = ['assists', 'xAG', 'assists_minus_xag', 'assists_minus_xag_90']
+PERCENTILE_SCOPES = {'league': 'Liga', 'position': 'Posição', 'all': 'Geral'}
+
+
+def map_columns(all_columns):
+    """
+    Procurar as colunas necessárias por padrões nos nomes
+
+    Devolve {nome: índice}; pode estar incompleto se o FBref mudar a estrutura.
+    """
+    column_mapping = {}
+
+    for idx, col in enumerate(all_columns):
+        col_lower = str(col).lower()
+
+        # Posição
+        if ('pos' in col_lower and 'position' not in column_mapping and
+                'composed' not in col_lower and 'deposit' not in col_lower):
+            column_mapping['position'] = idx
+
+        # Matches/Jogos (MP = Matches Played)
+        elif ('mp' == col_lower or 'matches' in col_lower) and 'matches' not in column_mapping:
+            column_mapping['matches'] = idx
+
+        # Minutos (Min)
+        elif ('min' in col_lower and 'minutes' not in column_mapping and
+              'per' not in col_lower and '90' not in col_lower):
+            column_mapping['minutes'] = idx
+
+        # Assists (Ast)
+        elif ((col_lower == 'ast' or 'assist' in col_lower) and
+              'assists' not in column_mapping and 'xag' not in col_lower):
+            column_mapping['assists'] = idx
+
+        # xAG (Expected Assisted Goals)
+        elif 'xag' in col_lower and 'xAG' not in column_mapping:
+            column_mapping['xAG'] = idx
+
+        # Ano de nascimento (Born)
+        elif 'born' in col_lower and 'born' not in column_mapping:
+            column_mapping['born'] = idx
+
+    return column_mapping
+
+
+def select_columns(player_season_stats):
+    """
+    Extrair position, matches, minutes, assists, xAG e born do output do soccerdata
+
+    Usa os índices fixos como fallback quando o mapeamento por nome está incompleto.
+    Mantém o index (league, season, team, player).
+    """
+    column_mapping = map_columns(player_season_stats.columns.tolist())
+
+    if not set(MAPPED_COLUMNS) <= set(column_mapping):
+        selected_indices = FALLBACK_INDICES
+        born_index = FALLBACK_BORN_INDEX
+    else:
+        selected_indices = [column_mapping[name] for name in MAPPED_COLUMNS]
+        born_index = column_mapping.get('born')
+
+    df = player_season_stats.iloc[:, selected_indices].copy()
+    df.columns = MAPPED_COLUMNS
+    if born_index is not None and born_index < player_season_stats.shape[1]:
+        df['born'] = pd.to_numeric(player_season_stats.iloc[:, born_index], errors='coerce')
+    else:
+        df['born'] = np.nan
+    return df
+
+
+def _slug(text):
+    text = str(text).lower().replace('%', 'pct').replace('+', 'p')
+    return re.sub(r'[^0-9a-z]+', '_', text).strip('_')
+
+
+def flatten_columns(df, stat_type):
+    """
+    Resolver o MultiIndex de colunas de um stat type em nomes simples
+
+    ('Standard', 'SoT%') em "shooting" → 'shooting_standard_sotpct'.
+    As colunas de identificação (nation, pos, age, born) são descartadas.
+    """
+    keep = []
+    names = []
+    for idx, col in enumerate(df.columns):
+        parts = col if isinstance(col, tuple) else (col,)
+        parts = [p for p in parts if p and not str(p).lower().startswith('unnamed')]
+        if not parts or str(parts[-1]).lower() in IDENTITY_COLUMNS:
+            continue
+        keep.append(idx)
+        names.append('_'.join([stat_type] + [_slug(p) for p in parts]))
+
+    flat = df.iloc[:, keep].copy()
+    flat.columns = names
+    # Nomes repetidos dentro do mesmo stat type: ficar com a primeira ocorrência
+    return flat.loc[:, ~flat.columns.duplicated()]
+
+
+def wide_table(tables):
+    """
+    Juntar vários stat types numa só tabela por (league, season, team, player)
+
+    `tables` é {stat_type: output do soccerdata}; o "standard" dá as colunas base
+    (select_columns) e os restantes acrescentam colunas prefixadas pelo stat type.
+    """
+    wide = select_columns(tables['standard'])
+    for stat_type, df in tables.items():
+        if stat_type == 'standard':
+            continue
+        extra = flatten_columns(df, stat_type)
+        extra = extra[~extra.index.duplicated()]
+        wide = wide.join(extra, how='left')
+    return wide
+
+
+def position_bits(position=pl.col("position")):
+    """Expressão Polars: string de posições ('DF,MF') → bitmask de POSITION_BITS (0 sem posição)"""
+    bits = [pl.when(position.str.contains(code, literal=True)).then(bit).otherwise(0)
+            for code, bit in POSITION_BITS.items()]
+    return pl.sum_horizontal(bits).cast(pl.UInt8)
+
+
+def parse_position_bits(positions):
+    """position_bits() para um array de strings (p.ex. o CSV antigo): cada string distinta é lida uma vez"""
+    codes, uniques = pd.factorize(pd.Series(positions, dtype=object))
+    lookup = np.array([sum(bit for code, bit in POSITION_BITS.items() if code in str(position))
+                       for position in uniques] + [0], dtype=np.uint8)
+    return lookup[codes]  # código -1 (nulo) → último elemento (0)
+
+
+def main_position():
+    """
+    Expressão de agregação: posição da linha com mais minutos (empates → menor string)
+
+    Regra explícita em vez de .first(): o motor de streaming não garante a ordem
+    das linhas dentro de cada grupo.
+    """
+    return pl.col("position").sort_by(["minutes", "position"], descending=[True, False]).first()
+
+
+def from_pandas(df):
+    """LazyFrame a partir de um DataFrame pandas com index (league, season, team, player)"""
+    return pl.from_pandas(df, include_index=True).lazy()
+
+
+def aggregate(lf):
+    """
+    Agregar por (league, team, player, born), calcular métricas e filtrar qualificados
+
+    O ano de nascimento separa homónimos na mesma equipa. 'position' fica com a
+    posição da temporada com mais minutos (para mostrar) e 'position_bits' com
+    todas as posições de todas as temporadas (OR dos bits). As linhas saem
+    ordenadas pelas chaves, como no groupby do pandas. Recebe e devolve um
+    LazyFrame: o Polars só lê as colunas usadas (projection pushdown) e o plano
+    completo é otimizado antes de executar.
+    """
+    return (
+        lf
+        .group_by("league", "team", "player", "born")
+        .agg([
+            pl.col("matches").sum().alias("matches"),
+            pl.col("assists").sum().alias("assists"),
+            pl.col("xAG").sum().alias("xAG"),
+            pl.col("minutes").sum().alias("minutes"),
+            main_position().alias("position"),
+            position_bits().bitwise_or().alias("position_bits")
+        ])
+        .with_columns([
+            (pl.col("assists") - pl.col("xAG")).alias("assists_minus_xag"),
+            ((pl.col("assists") - pl.col("xAG")) / pl.col("minutes") * 90).alias("assists_minus_xag_90")
+        ])
+        .filter(
+            (pl.col("minutes") > MIN_MINUTES) &
+            (pl.col("xAG") > MIN_XAG)
+        )
+        .sort("league", "team", "player", "born")
+    )
+
+
+def percentile_column(metric, scope):
+    """Nome da coluna de percentil: 'assists_minus_xag_pct_league', ..._pct_position, ..._pct"""
+    return f'{metric}_pct' if scope == 'all' else f'{metric}_pct_{scope}'
+
+
+PERCENTILE_COLUMNS = [percentile_column(metric, scope)
+                      for metric in PERCENTILE_METRICS for scope in PERCENTILE_SCOPES]
+
+
+def percentile_ranks(lf):
+    """
+    Percentil (0-100] de cada métrica na liga, na posição principal e no total
+
+    Rank médio (empates partilham o percentil) a dividir pelo número de valores
+    do grupo; todas as colunas num só with_columns com janelas .over(), que o
+    Polars calcula em paralelo. A posição principal é a primeira de 'MF,FW'.
+    """
+    groups = {
+        'league': pl.col("league"),
+        'position': pl.col("position").str.split(",").list.first(),
+        'all': None,
+    }
+    columns = []
+    for metric in PERCENTILE_METRICS:
+        for scope, group in groups.items():
+            rank = pl.col(metric).rank("average")
+            count = pl.col(metric).count()
+            if group is not None:
+                rank, count = rank.over(group), count.over(group)
+            columns.append((rank / count * 100).alias(percentile_column(metric, scope)))
+    return lf.with_columns(columns)
+
+
+def add_percentile_ranks(df):
+    """percentile_ranks() sobre um DataFrame pandas (p.ex. CSV antigo ou janela de temporadas)"""
+    return collect(percentile_ranks(pl.from_pandas(df).lazy())).to_pandas()
+
+
+def season_rows(lf):
+    """
+    Uma linha por (league, team, player, born, season) com as contagens somadas
+
+    Base das somas acumuladas da janela de temporadas (season_window.py); as
+    métricas derivadas e a qualificação são calculadas sobre a janela escolhida.
+    """
+    return (
+        lf
+        .group_by("league", "team", "player", "born", "season")
+        .agg([
+            pl.col("matches").sum().alias("matches"),
+            pl.col("assists").sum().alias("assists"),
+            pl.col("xAG").sum().alias("xAG"),
+            pl.col("minutes").sum().alias("minutes"),
+            main_position().alias("position"),
+            position_bits().bitwise_or().alias("position_bits")
+        ])
+        .sort("league", "team", "player", "born", "season")
+    )
+
+
+def collect(lf):
+    """Executar o plano com o motor de streaming do Polars"""
+    return lf.collect(engine="streaming")
+
+
+def build_stats(player_season_stats):
+    """Atalho: output do soccerdata → tabela agregada com percentis (Polars DataFrame)"""
+    return collect(percentile_ranks(aggregate(from_pandas(select_columns(player_season_stats)))))
+
+
+def build_player_seasons(player_season_stats):
+    """Atalho: output do soccerdata → contagens por jogador e temporada (Polars DataFrame)"""
+    return collect(season_rows(from_pandas(select_columns(player_season_stats))))
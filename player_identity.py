@@ -0,0 +1,91 @@
+"""
+Identidade dos jogadores entre clubes e ligas
+O soccerdata não devolve os ids de jogador do FBref, por isso cada jogador é
+identificado por um hash estável de (nome, ano de nascimento). Os hashes são
+resolvidos para chaves inteiras densas, e os totais de carreira saem de uma
+única redução agrupada sobre essas chaves, sem agrupar por strings.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+CAREER_METRICS = ['matches', 'minutes', 'assists', 'xAG']
+
+
+def identity_hashes(players, born):
+    """
+    Hash de 53 bits de (nome, ano de nascimento), igual entre execuções e snapshots
+
+    53 bits: o id é um inteiro exato também em JSON/JavaScript (api.py). Cada
+    par distinto é calculado uma vez; sem ano de nascimento (p.ex. o CSV antigo)
+    a identidade é só o nome.
+    """
+    born = pd.to_numeric(pd.Series(born), errors='coerce').to_numpy(dtype=float)
+    pairs = pd.MultiIndex.from_arrays([
+        pd.Series(players, dtype=object).fillna('').to_numpy(),
+        np.where(np.isfinite(born), born, -1).astype(np.int64),
+    ])
+    codes, uniques = pd.factorize(pairs)
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f'{name}\x1f{year if year >= 0 else ""}'.encode(),
+                                        digest_size=8).digest(), 'big') >> 11
+         for name, year in uniques),
+        dtype=np.int64, count=len(uniques)
+    )
+    return hashes[codes]
+
+
+class PlayerIdentityIndex:
+    """
+    Passagens por clube (league, team, player, born) → chave inteira de cada jogador
+
+    `keys[i]` é a chave da linha i; `ids[k]` é o hash estável da chave k. As
+    linhas ficam ordenadas por chave uma vez (`order`, `starts`), para que reduce()
+    some qualquer matriz de métricas com um só np.add.reduceat.
+    """
+
+    def __init__(self, stints, weight=None):
+        """
+        `stints` tem player, born, league, team, position e position_bits; `weight`
+        (p.ex. minutos totais) escolhe o clube principal de cada jogador (o de maior peso)
+        """
+        hashes = identity_hashes(stints['player'].to_numpy(), stints['born'].to_numpy())
+        self.ids, self.keys = np.unique(hashes, return_inverse=True)
+        weight = np.zeros(len(stints)) if weight is None else np.nan_to_num(np.asarray(weight, float))
+        # Por chave e, dentro de cada chave, por peso crescente: a última linha é o clube principal
+        self.order = np.lexsort((weight, self.keys))
+        sorted_keys = self.keys[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        main = self.order[np.r_[self.starts[1:], len(self.order)] - 1]
+
+        self.players = stints.iloc[main][['league', 'team', 'player', 'born', 'position']]
+        self.players = self.players.reset_index(drop=True)
+        self.players.insert(0, 'player_id', self.ids)
+        # Posições de todos os clubes (OR dos bits)
+        bits = stints['position_bits'].to_numpy(dtype=np.uint8)
+        self.players['position_bits'] = np.bitwise_or.reduceat(bits[self.order], self.starts)
+        # Todos os clubes, do principal para o de menor peso; só os jogadores com
+        # mais de um clube precisam de juntar strings
+        sizes = np.diff(np.r_[self.starts, len(self.order)])
+        teams = stints['team'].to_numpy(dtype=object)[np.lexsort((-weight, self.keys))]
+        joined = teams[self.starts].copy()
+        for key in np.flatnonzero(sizes > 1):
+            start = self.starts[key]
+            joined[key] = ', '.join(dict.fromkeys(teams[start:start + sizes[key]]))
+        self.players['teams'] = joined
+        self.players['clubs'] = sizes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def reduce(self, values):
+        """Somas por jogador de `values` (linhas alinhadas com `stints`, 1 ou 2 dimensões)"""
+        values = np.asarray(values, dtype=float)
+        return np.add.reduceat(values[self.order], self.starts, axis=0)
+
+    def career_totals(self, stints):
+        """{métrica: array alinhado com self.players} com as CAREER_METRICS de `stints` somadas numa só redução"""
+        summed = self.reduce(stints[CAREER_METRICS].to_numpy(dtype=float))
+        return dict(zip(CAREER_METRICS, summed.T))
@@ -0,0 +1,129 @@
+"""
+Motor de rankings do dashboard
+Cada métrica de ranking é ordenada uma vez (ordem crescente e decrescente);
+o top-K de um filtro é uma passagem pela ordem pré-calculada, só até encontrar
+K linhas ativas, e o resultado é memorizado pela assinatura do filtro.
+As outras colunas são ordenadas na primeira vez que são pedidas (tabela paginada).
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+RANKING_METRICS = ['assists_minus_xag', 'assists_minus_xag_90']
+SCAN_CHUNK = 4096
+MEMO_SIZE = 256
+ORDERED_MEMO_SIZE = 16  # resultados completos (uma posição por linha ativa): menos entradas
+
+
+def _sort_orders(values):
+    """argsort estável crescente e decrescente de uma coluna, com valores em falta sempre no fim"""
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        key = values.to_numpy(dtype=float)
+        return np.argsort(key, kind='stable'), np.argsort(-key, kind='stable')
+    codes, _ = pd.factorize(values, sort=True)
+    missing = codes < 0
+    ascending = np.where(missing, codes.max() + 1, codes)
+    descending = np.where(missing, 1, -codes)
+    return np.argsort(ascending, kind='stable'), np.argsort(descending, kind='stable')
+
+
+class RankingEngine:
+    """Permutações ordenadas por métrica sobre uma tabela base fixa, com top-K memorizado"""
+
+    def __init__(self, base, metrics=RANKING_METRICS, memo_size=MEMO_SIZE):
+        self.base = base
+        self.size = len(base)
+        # argsort estável: empates pela ordem das linhas e NaN sempre no fim
+        self.orders = {}
+        for metric in metrics:
+            self.orders[metric, True], self.orders[metric, False] = _sort_orders(base[metric])
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._ordered_memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def order(self, column, ascending=False):
+        """Permutação da base ordenada por `column` (calculada na primeira vez e guardada)"""
+        order = self.orders.get((column, ascending))
+        if order is None:
+            ascending_order, descending_order = _sort_orders(self.base[column])
+            with self._lock:
+                self.orders[column, True] = ascending_order
+                self.orders[column, False] = descending_order
+            order = ascending_order if ascending else descending_order
+        return order
+
+    def _scan(self, order, mask, k):
+        """Primeiras `k` posições de `order` com mask verdadeira, lendo `order` por blocos"""
+        found = []
+        needed = k
+        for start in range(0, len(order), SCAN_CHUNK):
+            block = order[start:start + SCAN_CHUNK]
+            hits = block[mask[block]][:needed]
+            found.append(hits)
+            needed -= len(hits)
+            if needed <= 0:
+                break
+        return np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+
+    def ordered(self, plan, column, ascending=False, extra=None):
+        """
+        Todas as linhas ativas do plano ordenadas por `column`
+
+        Memorizado pela assinatura do filtro: as páginas seguintes da mesma
+        vista são só fatias deste resultado, qualquer que seja a página.
+        """
+        key = (plan.signature, None if extra is None else extra[0], column, ascending)
+        with self._lock:
+            rows = self._ordered_memo.get(key)
+            if rows is not None:
+                self._ordered_memo.move_to_end(key)
+                self.hits += 1
+                return rows
+            self.misses += 1
+
+        mask = plan.mask if extra is None else plan.mask & extra[1]
+        order = self.order(column, ascending)
+        rows = order[mask[order]]
+        with self._lock:
+            self._ordered_memo[key] = rows
+            while len(self._ordered_memo) > ORDERED_MEMO_SIZE:
+                self._ordered_memo.popitem(last=False)
+        return rows
+
+    def page(self, plan, column, ascending, start, stop, extra=None):
+        """Linhas [start, stop) da vista ordenada por `column` e o total de linhas ativas"""
+        rows = self.ordered(plan, column, ascending, extra)
+        return rows[start:stop], len(rows)
+
+    def top(self, plan, metric, k, ascending=False, extra=None):
+        """
+        Posições das `k` melhores linhas do plano de filtros por `metric`
+
+        `extra` é um predicado adicional (chave, máscara) só deste ranking,
+        p.ex. ('xAG>=5', máscara). Pedidos com a mesma assinatura partilham o
+        resultado; um K menor é servido a partir de um K maior já calculado.
+        """
+        key = (plan.signature, None if extra is None else extra[0], metric, ascending)
+        with self._lock:
+            cached = self._memo.get(key)
+            if cached is not None and cached[0] >= k:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return cached[1][:k]
+            self.misses += 1
+
+        mask = plan.mask if extra is None else plan.mask & extra[1]
+        rows = self._scan(self.orders[metric, ascending], mask, k)
+        with self._lock:
+            # Guardar o K pedido: com menos de K linhas já não há mais nenhuma
+            self._memo[key] = (k, rows)
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return rows
@@ -0,0 +1,298 @@
+"""
+Servidor local que reproduz páginas gravadas do FBref
+Permite correr o pipeline (e medi-lo) sem rede, sem browser e sem rate limiting
+"""
+
+import io
+import json
+import threading
+import urllib.request
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+FBREF_HOST = 'https://fbref.com'
+INDEX_FILE = 'index.json'
+
+
+# ============================================================================
+# GRAVAÇÕES
+# ============================================================================
+
+def recording_name(url):
+    """Nome do ficheiro de uma gravação a partir do caminho do URL"""
+    path = urlparse(url).path.strip('/') or 'index'
+    return path.replace('/', '__') + '.html'
+
+
+def read_index(root):
+    path = Path(root) / INDEX_FILE
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def save_recording(root, url, payload, _lock=threading.Lock()):
+    """Gravar a resposta a `url` e registá-la no índice {caminho: ficheiro}"""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    name = recording_name(url)
+    (root / name).write_bytes(payload)
+    with _lock:
+        index = read_index(root)
+        index[urlparse(url).path] = name
+        with open(root / INDEX_FILE, 'w', encoding='utf-8') as fh:
+            json.dump(index, fh, indent=2, sort_keys=True)
+
+
+# ============================================================================
+# SERVIDOR
+# ============================================================================
+
+class _ReplayHandler(SimpleHTTPRequestHandler):
+    """Serve o ficheiro gravado para o caminho pedido; 404 se não houver gravação"""
+
+    def __init__(self, *args, index=None, **kwargs):
+        self.index = index
+        super().__init__(*args, **kwargs)
+
+    def translate_path(self, path):
+        name = self.index.get(urlparse(path).path)
+        if name is None:
+            return str(Path(self.directory) / '__missing__')
+        return str(Path(self.directory) / name)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    """
+    Servidor HTTP local com as páginas de `root`
+
+    Usar como context manager: `with ReplayServer(root) as server: server.base_url`
+    """
+
+    def __init__(self, root, host='127.0.0.1', port=0):
+        self.root = Path(root)
+        handler = partial(_ReplayHandler, directory=str(self.root), index=read_index(self.root))
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# ============================================================================
+# LEITORES
+# ============================================================================
+
+def _replay_class():
+    import soccerdata as sd
+
+    class ReplayFBref(sd.FBref):
+        """sd.FBref que lê do servidor de replay em vez de abrir um browser"""
+
+        base_url = None
+
+        def _init_webdriver(self):
+            return None
+
+        def _download_and_save(self, url, filepath=None, var=None):
+            local_url = url.replace(FBREF_HOST, self.base_url, 1)
+            with urllib.request.urlopen(local_url) as response:
+                return io.BytesIO(response.read())
+
+    return ReplayFBref
+
+
+def replay_reader_factory(base_url):
+    """Fábrica de leitores para fetch.py que usa o servidor de replay em `base_url`"""
+    cls = _replay_class()
+
+    def factory(unit, **kwargs):
+        reader = cls(leagues=unit.league, seasons=unit.season, no_cache=True, no_store=True)
+        reader.base_url = base_url
+        return reader
+
+    return factory
+
+
+def recording_reader_factory(root, reader_factory=None):
+    """Fábrica de leitores que grava em `root` todas as páginas descarregadas do FBref"""
+    if reader_factory is None:
+        from fetch import default_reader_factory as reader_factory
+
+    def factory(unit, **kwargs):
+        reader = reader_factory(unit, **kwargs)
+        download = reader._download_and_save
+
+        def _download_and_save(url, filepath=None, var=None):
+            data = download(url, filepath, var)
+            payload = data.read()
+            save_recording(root, url, payload)
+            return io.BytesIO(payload)
+
+        reader._download_and_save = _download_and_save
+        return reader
+
+    return factory
+
+
+# ============================================================================
+# PÁGINAS SINTÉTICAS
+# ============================================================================
+
+# Cabeçalhos (grupo, coluna, data-stat) das tabelas de jogadores por stat type
+_PLAYER_HEADERS = {
+    'standard': [
+        ('Playing Time', 'MP', 'games'), ('Playing Time', 'Starts', 'games_starts'),
+        ('Playing Time', 'Min', 'minutes'), ('Playing Time', '90s', 'minutes_90s'),
+        ('Performance', 'Gls', 'goals'), ('Performance', 'Ast', 'assists'),
+        ('Performance', 'G+A', 'goals_assists'), ('Performance', 'G-PK', 'goals_pens'),
+        ('Performance', 'PK', 'pens_made'), ('Performance', 'PKatt', 'pens_att'),
+        ('Performance', 'CrdY', 'cards_yellow'), ('Performance', 'CrdR', 'cards_red'),
+        ('Expected', 'xG', 'xg'), ('Expected', 'npxG', 'npxg'), ('Expected', 'xAG', 'xg_assist'),
+        ('Expected', 'npxG+xAG', 'npxg_xg_assist'),
+    ],
+    'shooting': [
+        ('', '90s', 'minutes_90s'), ('Standard', 'Gls', 'goals'), ('Standard', 'Sh', 'shots'),
+        ('Standard', 'SoT', 'shots_on_target'), ('Standard', 'SoT%', 'shots_on_target_pct'),
+        ('Expected', 'xG', 'xg'), ('Expected', 'npxG', 'npxg'),
+    ],
+    'playing_time': [
+        ('Playing Time', 'MP', 'games'), ('Playing Time', 'Min', 'minutes'),
+        ('Starts', 'Starts', 'games_starts'), ('Subs', 'Subs', 'games_subs'),
+        ('Team Success', 'onG', 'on_goals_for'), ('Team Success', 'onGA', 'on_goals_against'),
+    ],
+    'misc': [
+        ('', '90s', 'minutes_90s'), ('Performance', 'CrdY', 'cards_yellow'),
+        ('Performance', 'Fls', 'fouls'), ('Performance', 'Fld', 'fouled'),
+        ('Performance', 'Int', 'interceptions'), ('Performance', 'TklW', 'tackles_won'),
+    ],
+}
+_PAGES = {'standard': 'stats', 'playing_time': 'playingtime', 'keeper': 'keepers'}
+_POSITIONS = ['GK', 'DF', 'MF', 'FW', 'DF,MF', 'MF,FW']
+
+
+def _season_label(season):
+    return f'20{season[:2]}-20{season[2:]}'
+
+
+def _player_table(stat_type, rows):
+    headers = _PLAYER_HEADERS[stat_type]
+    ident = [('Rk', 'ranker'), ('Player', 'player'), ('Nation', 'nationality'), ('Pos', 'position'),
+             ('Squad', 'team'), ('Age', 'age'), ('Born', 'birth_year')]
+    groups = [('', len(ident))]
+    for group, _, _ in headers:
+        if groups[-1][0] == group:
+            groups[-1] = (group, groups[-1][1] + 1)
+        else:
+            groups.append((group, 1))
+    over = ''.join(f'<th colspan="{n}">{g}</th>' for g, n in groups) + '<th></th>'
+    head = ''.join(f'<th data-stat="{s}">{c}</th>' for c, s in ident)
+    head += ''.join(f'<th data-stat="{s}">{c}</th>' for _, c, s in headers) + '<th>Matches</th>'
+    body = ''.join(
+        '<tr>' + ''.join(f'<td>{v}</td>' for v in row) + '<td>Matches</td></tr>' for row in rows
+    )
+    return (f'<table id="stats_{stat_type}"><thead><tr class="over_header">{over}</tr>'
+            f'<tr>{head}</tr></thead><tbody>{body}</tbody></table>')
+
+
+def _player_rows(stat_type, league, season, teams, players_per_team, rng):
+    rows = []
+    rank = 1
+    for t in range(teams):
+        for p in range(players_per_team):
+            player = f'{league[:3]} Player {t}-{p}'
+            mp = int(rng.integers(1, 39))
+            minutes = mp * int(rng.integers(10, 91))
+            xag = round(float(rng.gamma(1.5, 1.5)), 1)
+            ident = [rank, player, 'eng ENG', _POSITIONS[(t + p) % len(_POSITIONS)],
+                     f'{league[:3]} Team {t}', 25, 1999]
+            if stat_type == 'standard':
+                ast = int(rng.poisson(xag))
+                values = [mp, mp, f'{minutes:,}', round(minutes / 90, 1), 1, ast, 1 + ast, 1, 0, 0,
+                          0, 0, 1.0, 1.0, xag, 1.0 + xag]
+            else:
+                values = [round(float(v), 1) for v in rng.random(len(_PLAYER_HEADERS[stat_type])) * 10]
+            rows.append(ident + values)
+            rank += 1
+    return rows
+
+
+def write_synthetic_recordings(root, leagues, seasons, stat_types=('standard',),
+                               teams=20, players_per_team=25, seed=0):
+    """
+    Gerar páginas no formato do FBref para testes e benchmarks offline
+
+    Cobre a lista de competições, o histórico de temporadas de cada liga e as
+    tabelas de jogadores de cada stat type, tal como o soccerdata as lê.
+    """
+    import soccerdata as sd
+
+    unsupported = set(stat_types) - set(_PLAYER_HEADERS)
+    if unsupported:
+        raise ValueError(f"Sem páginas sintéticas para: {sorted(unsupported)}")
+
+    rng = np.random.default_rng(seed)
+    fbref_names = sd.FBref._all_leagues()
+    root = Path(root)
+
+    comps = ''.join(
+        f'<tr><th data-stat="league_name"><a href="/en/comps/{i}/history/{i}-Seasons">'
+        f'{fbref_names[league]}</a></th><td>M</td><td>{_season_label(seasons[0])}</td>'
+        f'<td>{_season_label(seasons[-1])}</td></tr>'
+        for i, league in enumerate(leagues, start=1)
+    )
+    save_recording(root, f'{FBREF_HOST}/en/comps/', (
+        '<html><head><meta charset="utf-8"></head><body><table id="comps_club"><thead><tr><th>Competition Name</th><th>Gender</th>'
+        f'<th>First Season</th><th>Last Season</th></tr></thead><tbody>{comps}</tbody></table>'
+        '</body></html>'
+    ).encode('utf-8'))
+
+    for i, league in enumerate(leagues, start=1):
+        history = ''.join(
+            f'<tr><th data-stat="year_id"><a href="/en/comps/{i}/{_season_label(s)}/'
+            f'{_season_label(s)}-Stats">{_season_label(s)}</a></th>'
+            f'<td>{fbref_names[league]}</td><td>{teams}</td></tr>'
+            for s in seasons
+        )
+        save_recording(root, f'{FBREF_HOST}/en/comps/{i}/history/{i}-Seasons', (
+            '<html><head><meta charset="utf-8"></head><body><table id="seasons"><thead><tr><th>Season</th><th>Competition Name</th>'
+            f'<th># Squads</th></tr></thead><tbody>{history}</tbody></table></body></html>'
+        ).encode('utf-8'))
+
+        for season in seasons:
+            label = _season_label(season)
+            for stat_type in stat_types:
+                table = _player_table(
+                    stat_type, _player_rows(stat_type, league, season, teams, players_per_team, rng)
+                )
+                page = _PAGES.get(stat_type, stat_type)
+                # As tabelas de jogadores por liga vêm dentro de um comentário HTML
+                save_recording(root, f'{FBREF_HOST}/en/comps/{i}/{label}/{page}/{label}-Stats', (
+                    f'<html><head><meta charset="utf-8"></head><body><!-- <div id="div_stats_{stat_type}">{table}</div> -->'
+                    '</body></html>'
+                ).encode('utf-8'))
@@ -0,0 +1,131 @@
+"""
+Índice de pesquisa de jogadores
+Nomes normalizados (casefold, sem acentos) com um índice de n-gramas construído
+uma vez; a pesquisa devolve os jogadores por ordem de relevância (prefixo do nome,
+início de palavra, resto) e tem um modo aproximado para erros de escrita.
+"""
+
+import bisect
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+NGRAM = 3
+FUZZY_THRESHOLD = 0.5  # fração mínima dos trigramas da pesquisa presentes no nome
+
+# Letras que não se decompõem em letra base + acento no NFKD
+_TRANSLITERATE = str.maketrans({
+    'ø': 'o', 'Ø': 'o', 'đ': 'd', 'Đ': 'd', 'ł': 'l', 'Ł': 'l', 'ı': 'i',
+    'æ': 'ae', 'Æ': 'ae', 'œ': 'oe', 'Œ': 'oe', 'þ': 'th', 'Þ': 'th', 'ð': 'd', 'Ð': 'd',
+})
+
+
+def normalize(text):
+    """'Martin Ødegaard' → 'martin odegaard': sem acentos, casefold, espaços simples"""
+    text = unicodedata.normalize('NFKD', str(text).translate(_TRANSLITERATE))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.casefold().split())
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class PlayerSearchIndex:
+    """
+    Índice de n-gramas (n = 1..NGRAM) sobre os nomes distintos de uma coluna
+
+    Pesquisas até NGRAM caracteres são uma única lista de postings; pesquisas
+    maiores intersetam as listas dos seus trigramas e confirmam a substring
+    só nos candidatos.
+    """
+
+    def __init__(self, names):
+        codes, unique = pd.factorize(pd.Series(names), sort=True)
+        self.codes = codes
+        self.names = list(unique)
+        self.normalized = [normalize(name) for name in self.names]
+
+        postings = defaultdict(list)
+        for name_id, name in enumerate(self.normalized):
+            for n in range(1, NGRAM + 1):
+                for gram in _grams(name, n):
+                    postings[gram].append(name_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._empty = np.empty(0, dtype=np.int32)
+
+        # Listas ordenadas para os prefixos: nomes completos e sufixos a partir de cada palavra
+        self._prefixes = sorted((name, i) for i, name in enumerate(self.normalized))
+        self._word_starts = sorted(
+            (name[pos + 1:], i)
+            for i, name in enumerate(self.normalized)
+            for pos, ch in enumerate(name) if ch == ' '
+        )
+
+    def matches(self, query):
+        """Ids (sem ordem de relevância) dos nomes que contêm `query`, sem acentos nem maiúsculas"""
+        query = normalize(query)
+        if not query:
+            return self._empty
+        if len(query) <= NGRAM:
+            return self.postings.get(query, self._empty)
+
+        lists = sorted((self.postings.get(gram, self._empty) for gram in _grams(query, NGRAM)), key=len)
+        candidates = lists[0]
+        for ids in lists[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        return np.array([i for i in candidates.tolist() if query in self.normalized[i]], dtype=np.int32)
+
+    @staticmethod
+    def _prefix_range(entries, query):
+        start = bisect.bisect_left(entries, (query,))
+        end = bisect.bisect_left(entries, (query + '\U0010ffff',))
+        return [name_id for _, name_id in entries[start:end]]
+
+    def search(self, query, limit=None):
+        """
+        Ids dos nomes que contêm `query`, por relevância
+
+        Primeiro os nomes que começam pela pesquisa, depois os que têm uma palavra
+        a começar por ela, depois as restantes ocorrências (cada grupo por ordem
+        alfabética). Os dois primeiros grupos saem de pesquisas binárias.
+        """
+        query = normalize(query)
+        if not query:
+            return self._empty
+        ranked = dict.fromkeys(self._prefix_range(self._prefixes, query))
+        ranked.update(dict.fromkeys(self._prefix_range(self._word_starts, query)))
+        if limit is None or len(ranked) < limit:
+            rest = sorted(set(self.matches(query).tolist()) - ranked.keys(),
+                          key=lambda i: self.normalized[i])
+            ranked.update(dict.fromkeys(rest))
+        ids = np.fromiter(ranked, dtype=np.int32, count=len(ranked))
+        return ids if limit is None else ids[:limit]
+
+    def fuzzy(self, query, threshold=FUZZY_THRESHOLD, limit=20):
+        """Ids dos nomes com mais trigramas em comum com `query` (tolera erros de escrita)"""
+        query = normalize(query)
+        grams = _grams(query, NGRAM)
+        if not grams:
+            return self._empty
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return self._empty
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.names))
+        score = shared / len(grams)
+        ids = np.flatnonzero(score >= threshold)
+        order = np.lexsort((ids, -score[ids]))
+        return ids[order][:limit].astype(np.int32)
+
+    def mask(self, name_ids):
+        """Máscara de linhas (alinhada com a coluna indexada) dos nomes em `name_ids`"""
+        hit = np.zeros(len(self.names) + 1, dtype=bool)
+        hit[name_ids] = True
+        return hit[self.codes]  # código -1 (nome em falta) cai na última posição, sempre falsa
+
+    def display_names(self, name_ids):
+        return [self.names[i] for i in name_ids]
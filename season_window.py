@@ -0,0 +1,132 @@
+"""
+Janela de temporadas a partir de somas acumuladas por jogador
+As contagens de cada jogador são acumuladas ao longo das temporadas uma vez;
+o total de qualquer intervalo [primeira, última] é uma subtração por jogador.
+"""
+
+import numpy as np
+import pandas as pd
+
+from pipeline import MIN_MINUTES, MIN_XAG, PERCENTILE_METRICS, PERCENTILE_COLUMNS, add_percentile_ranks
+from intervals import add_intervals
+from player_identity import PlayerIdentityIndex
+
+PLAYER_KEYS = ['league', 'team', 'player', 'born']
+PREFIX_METRICS = ['matches', 'minutes', 'assists', 'xAG']
+COUNT_METRICS = ['matches', 'minutes', 'assists']
+
+
+def season_label(season):
+    """'1718' → '2017-18'"""
+    return f'20{season[:2]}-{season[2:]}'
+
+
+def derived_metrics(totals):
+    """
+    Acrescentar aos totais ({métrica: array}) assists_minus_xag, assists_minus_xag_90
+    e a máscara 'qualified' (critérios de pipeline.aggregate)
+    """
+    diff = totals['assists'] - totals['xAG']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per90 = diff / totals['minutes'] * 90
+    totals['assists_minus_xag'] = diff
+    totals['assists_minus_xag_90'] = per90
+    totals['qualified'] = (totals['minutes'] > MIN_MINUTES) & (totals['xAG'] > MIN_XAG)
+    return totals
+
+
+def totals_frame(players, totals):
+    """
+    Tabela no formato de load_stats() a partir das linhas `players` e dos totais alinhados
+
+    Devolve (tabela, máscara dos qualificados). Os percentis são calculados só
+    entre os qualificados; os outros ficam NaN. Inclui o intervalo de confiança
+    de assists - xAG (intervals.py).
+    """
+    result = derived_metrics(dict(totals))
+    qualified = result.pop('qualified')
+    df = players.assign(**result)
+    df[COUNT_METRICS] = df[COUNT_METRICS].round().astype('int64')
+
+    ranked = add_percentile_ranks(df.loc[qualified, ['league', 'position', *PERCENTILE_METRICS]])
+    for column in PERCENTILE_COLUMNS:
+        values = np.full(len(df), np.nan)
+        values[qualified] = ranked[column].to_numpy()
+        df[column] = values
+    return add_intervals(df), qualified
+
+
+class SeasonPrefix:
+    """
+    Somas acumuladas de PREFIX_METRICS por jogador (league, team, player, born)
+
+    `cumulative[m, i, s]` é o total da métrica m do jogador i nas temporadas
+    anteriores a `seasons[s]`, por isso a janela [a, b] é
+    cumulative[:, :, b + 1] - cumulative[:, :, a].
+    """
+
+    def __init__(self, rows, seasons=None):
+        rows = rows.sort_values('season', kind='stable')
+        self.seasons = sorted(rows['season'].unique()) if seasons is None else list(seasons)
+
+        keys = pd.MultiIndex.from_frame(rows[PLAYER_KEYS])
+        player_idx, players = pd.factorize(keys, sort=True)
+        season_idx = pd.Index(self.seasons).get_indexer(rows['season'])
+        valid = season_idx >= 0
+
+        per_season = np.zeros((len(PREFIX_METRICS), len(players), len(self.seasons) + 1))
+        for m, metric in enumerate(PREFIX_METRICS):
+            values = pd.to_numeric(rows[metric], errors='coerce').fillna(0).to_numpy(float)
+            np.add.at(per_season[m], (player_idx[valid], season_idx[valid] + 1), values[valid])
+        self.cumulative = np.cumsum(per_season, axis=2)
+        self.cumulative.setflags(write=False)  # partilhado entre sessões do dashboard
+
+        # Posição da primeira temporada do jogador (rows está ordenado por temporada)
+        position = pd.Series(rows['position'].to_numpy()).groupby(player_idx).first()
+        self.players = pd.DataFrame(players.tolist(), columns=PLAYER_KEYS)
+        self.players['position'] = position.reindex(range(len(players))).to_numpy()
+        # Bits de posição de todas as temporadas do jogador (OR)
+        bits = np.zeros(len(players), dtype=np.uint8)
+        np.bitwise_or.at(bits, player_idx, rows['position_bits'].fillna(0).to_numpy(dtype=np.uint8))
+        self.players['position_bits'] = bits
+
+    def __len__(self):
+        return len(self.players)
+
+    def totals(self, first, last):
+        """Totais (matriz métricas × jogadores) de cada jogador entre `first` e `last` (inclusive)"""
+        a = self.seasons.index(first)
+        b = self.seasons.index(last) + 1
+        return self.cumulative[:, :, b] - self.cumulative[:, :, a]
+
+    def window(self, first, last):
+        """
+        Totais e métricas derivadas de cada jogador entre `first` e `last` (inclusive)
+
+        Devolve {coluna: array} alinhado com self.players, mais a máscara 'qualified'.
+        """
+        return derived_metrics(dict(zip(PREFIX_METRICS, self.totals(first, last))))
+
+    def identity_index(self):
+        """Índice de identidade sobre self.players; clube principal = o de mais minutos"""
+        minutes = self.cumulative[PREFIX_METRICS.index('minutes'), :, -1]
+        return PlayerIdentityIndex(self.players, weight=minutes)
+
+    def window_frame(self, first, last, identity=None):
+        """
+        Tabela no formato de load_stats() com todos os jogadores e máscara dos qualificados
+
+        Sem `identity`, uma linha por passagem por clube, alinhada com self.players.
+        Com um PlayerIdentityIndex (identity_index()), uma linha por jogador
+        (identity.players): os totais de todos os clubes e ligas somados numa
+        só redução, e a qualificação aplicada à carreira na janela.
+        """
+        totals = self.totals(first, last)
+        if identity is None:
+            return totals_frame(self.players, dict(zip(PREFIX_METRICS, totals)))
+        return totals_frame(identity.players, dict(zip(PREFIX_METRICS, identity.reduce(totals.T).T)))
+
+    def frame(self, first, last):
+        """Tabela no formato de load_stats() só com os jogadores qualificados na janela"""
+        df, qualified = self.window_frame(first, last)
+        return df[qualified].reset_index(drop=True)
@@ -0,0 +1,117 @@
+"""
+Pesquisa de jogadores parecidos (k vizinhos mais próximos)
+As características de cada jogador (por 90 minutos, fração de minutos jogados,
+posição e, quando existirem, colunas dos stat types extra) são normalizadas
+numa matriz densa; os vizinhos saem de produtos matriciais exatos por blocos.
+"""
+
+import numpy as np
+
+from pipeline import EXTRA_STAT_TYPES, POSITION_BITS
+
+POSITIONS = list(POSITION_BITS)
+POSITION_WEIGHT = 1.0  # peso da posição face a 1 desvio-padrão de uma estatística
+QUERY_BATCH = 256  # pesquisas por bloco em neighbours_batch()
+
+
+def _per90(values, minutes):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values / minutes * 90
+
+
+def feature_matrix(base, fit_mask=None):
+    """
+    Matriz (jogadores × características) em float32 e os nomes das colunas
+
+    Estatísticas normalizadas (z-score com a média e o desvio-padrão das linhas
+    em `fit_mask`, p.ex. os qualificados; em falta → média) e posição como
+    multi-hot ('MF,FW' conta meio MF e meio FW) com peso POSITION_WEIGHT.
+    """
+    minutes = base['minutes'].to_numpy(dtype=float)
+    matches = base['matches'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        minutes_share = np.clip(minutes / (matches * 90), 0, 1)
+    stats = {
+        'assists_90': _per90(base['assists'].to_numpy(dtype=float), minutes),
+        'xAG_90': _per90(base['xAG'].to_numpy(dtype=float), minutes),
+        'minutes_share': minutes_share,
+    }
+    # Colunas dos stat types extra (shooting_*, misc_*, ...) quando a tabela as tiver
+    for column in base.columns:
+        if any(column.startswith(f'{stat_type}_') for stat_type in EXTRA_STAT_TYPES):
+            stats[column] = base[column].to_numpy(dtype=float)
+
+    fit = slice(None) if fit_mask is None else np.asarray(fit_mask, dtype=bool)
+    columns = []
+    for values in stats.values():
+        values = np.where(np.isfinite(values), values, np.nan)
+        sample = values[fit]
+        if np.isnan(sample).all():
+            columns.append(np.zeros(len(values)))
+            continue
+        z = (values - np.nanmean(sample)) / (np.nanstd(sample) or 1.0)
+        columns.append(np.nan_to_num(z))
+
+    # Posições a partir dos bits (position_bits), sem ler as strings
+    bits = base['position_bits'].to_numpy(dtype=np.uint8)
+    listed = [(bits & POSITION_BITS[position]) != 0 for position in POSITIONS]
+    n_listed = np.maximum(np.sum(listed, axis=0), 1)
+    for position_listed in listed:
+        columns.append(position_listed / n_listed * POSITION_WEIGHT)
+
+    names = list(stats) + [f'position_{position}' for position in POSITIONS]
+    return np.column_stack(columns).astype(np.float32), names
+
+
+class SimilarityIndex:
+    """
+    k-NN exato sobre feature_matrix(base): distância euclidiana via
+    |a|² + |b|² - 2·a·b, com um produto matricial por bloco de pesquisas
+    """
+
+    def __init__(self, base, fit_mask=None):
+        self.matrix, self.features = feature_matrix(base, fit_mask)
+        self.norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def neighbours_batch(self, rows, k=10, mask=None):
+        """
+        Para cada linha em `rows`, as `k` linhas mais próximas (sem a própria)
+
+        `mask` limita os candidatos (p.ex. o plano de filtros). Devolve
+        (índices, distâncias), ambos com forma (len(rows), k'), k' ≤ k.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        # Índice e máscara de tabelas diferentes dariam vizinhos de outros jogadores
+        if mask is not None and len(mask) != len(self):
+            raise ValueError(f"Máscara com {len(mask)} linhas para um índice de {len(self)}")
+        candidates = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        k = min(k, len(candidates))
+        result_rows = np.empty((len(rows), k), dtype=np.intp)
+        result_dist = np.empty((len(rows), k), dtype=np.float32)
+        matrix = self.matrix[candidates]
+        norms = self.norms[candidates]
+
+        for start in range(0, len(rows), QUERY_BATCH):
+            batch = rows[start:start + QUERY_BATCH]
+            d2 = self.norms[batch, None] + norms[None, :] - 2 * (self.matrix[batch] @ matrix.T)
+            d2[batch[:, None] == candidates[None, :]] = np.inf  # o próprio jogador não conta
+            if k < len(candidates):
+                top = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(len(candidates)), d2.shape).copy()
+            order = np.take_along_axis(d2, top, axis=1).argsort(axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            result_rows[start:start + len(batch)] = candidates[top]
+            result_dist[start:start + len(batch)] = np.sqrt(np.maximum(
+                np.take_along_axis(d2, top, axis=1), 0))
+        return result_rows, result_dist
+
+    def neighbours(self, row, k=10, mask=None):
+        """As `k` linhas mais parecidas com `row` e as respetivas distâncias"""
+        rows, distances = self.neighbours_batch([row], k + 1, mask)
+        # Sem a própria linha (distância infinita) quando ela está entre os candidatos
+        keep = np.isfinite(distances[0])
+        return rows[0][keep][:k], distances[0][keep][:k]
@@ -0,0 +1,538 @@
+"""
+Armazenamento colunar (Parquet) dos dados do FBref
+Linhas brutas por jogador/temporada particionadas por liga e temporada,
+mais a tabela agregada e as contagens por temporada (particionadas por liga),
+todas com schema explícito
+"""
+
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from pipeline import PERCENTILE_COLUMNS, add_percentile_ranks, parse_position_bits
+
+STORE_DIR = Path('fbref_store')
+RAW_DIR = STORE_DIR / 'raw'
+STATS_DIR = STORE_DIR / 'stats'
+PLAYER_SEASONS_DIR = STORE_DIR / 'player_seasons'
+SNAPSHOT_DIR = STORE_DIR / 'snapshot'  # cópias Arrow IPC para memory-map (geradas ao ler)
+MANIFEST_FILE = '_manifest.json'  # prefixo '_' é ignorado pelo pyarrow.dataset
+# Formato das partições brutas; temporadas gravadas num formato anterior são recolhidas
+# de novo (2: coluna 'born', a identidade do jogador)
+RAW_FORMAT = 2
+LEGACY_CSV = Path('fbref_data.csv')
+SWAP_WAIT = 2.0  # segundos que um leitor espera por uma troca de diretório a meio
+
+# Linhas por jogador e temporada, já com as colunas mapeadas
+RAW_SCHEMA = pa.schema([
+    ('league', pa.string()),
+    ('season', pa.string()),
+    ('team', pa.string()),
+    ('player', pa.string()),
+    ('born', pa.int32()),
+    ('position', pa.string()),
+    ('matches', pa.int32()),
+    ('minutes', pa.int32()),
+    ('assists', pa.int32()),
+    ('xAG', pa.float64()),
+])
+
+# Colunas de outros stat types (tabela larga) são sempre numéricas
+EXTRA_COLUMN_TYPE = pa.float64()
+
+# Tabela agregada usada pelos dashboards
+STATS_SCHEMA = pa.schema([
+    ('league', pa.string()),
+    ('team', pa.string()),
+    ('player', pa.string()),
+    ('born', pa.int32()),
+    ('matches', pa.int32()),
+    ('assists', pa.int32()),
+    ('xAG', pa.float64()),
+    ('minutes', pa.int32()),
+    ('position', pa.string()),
+    ('position_bits', pa.uint8()),  # pipeline.POSITION_BITS de todas as temporadas
+    ('assists_minus_xag', pa.float64()),
+    ('assists_minus_xag_90', pa.float64()),
+    # Percentis por liga / posição / total (pipeline.percentile_ranks)
+    *[(name, pa.float64()) for name in PERCENTILE_COLUMNS],
+])
+
+# Contagens por jogador e temporada usadas pela janela de temporadas do dashboard
+PLAYER_SEASONS_SCHEMA = pa.schema([
+    ('league', pa.string()),
+    ('season', pa.string()),
+    ('team', pa.string()),
+    ('player', pa.string()),
+    ('born', pa.int32()),
+    ('position', pa.string()),
+    ('position_bits', pa.uint8()),
+    ('matches', pa.int32()),
+    ('minutes', pa.int32()),
+    ('assists', pa.int32()),
+    ('xAG', pa.float64()),
+])
+
+# Colunas da tabela agregada calculadas na leitura quando faltam (CSV antigo ou
+# store gravado antes delas)
+DERIVED_STATS_COLUMNS = [*PERCENTILE_COLUMNS, 'position_bits']
+
+RAW_PARTITIONING = ds.partitioning(
+    pa.schema([('league', pa.string()), ('season', pa.string())]), flavor='hive'
+)
+STATS_PARTITIONING = ds.partitioning(pa.schema([('league', pa.string())]), flavor='hive')
+
+
+# ============================================================================
+# TEMPORADAS E MANIFESTO
+# ============================================================================
+
+def season_end(season):
+    """Data de fim de uma temporada no formato '2425' (1 de julho do ano final)"""
+    return datetime(2000 + int(season[-2:]), 7, 1, tzinfo=timezone.utc)
+
+
+def season_is_complete(season, now=None):
+    """Uma temporada está completa depois de 1 de julho do ano final"""
+    now = now or datetime.now(tz=timezone.utc)
+    return now >= season_end(season)
+
+
+def raw_schema(extra_columns=()):
+    """RAW_SCHEMA mais as colunas dos stat types extra"""
+    base = set(RAW_SCHEMA.names)
+    extra = [pa.field(name, EXTRA_COLUMN_TYPE) for name in extra_columns if name not in base]
+    return pa.schema(list(RAW_SCHEMA) + extra)
+
+
+def read_manifest(raw_dir=RAW_DIR):
+    """Ler o manifesto {temporada: {'fetched_at', 'rows', 'stat_types', 'extra_columns', 'format'}}"""
+    path = Path(raw_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def _write_manifest(manifest, raw_dir=RAW_DIR):
+    path = Path(raw_dir) / MANIFEST_FILE
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    tmp.replace(path)
+
+
+def _has_season(season, raw_dir=RAW_DIR):
+    return any(Path(raw_dir).glob(f'league=*/season={season}/*.parquet'))
+
+
+def stored_extra_columns(raw_dir=RAW_DIR):
+    """União das colunas extra gravadas em todas as temporadas (ordem estável)"""
+    columns = {}
+    for entry in read_manifest(raw_dir).values():
+        columns.update(dict.fromkeys(entry.get('extra_columns', [])))
+    return list(columns)
+
+
+def stale_seasons(seasons, raw_dir=RAW_DIR, now=None, stat_types=('standard',)):
+    """
+    Temporadas que precisam de ser recolhidas de novo: sem partição, sem algum
+    dos stat types pedidos, num formato anterior a RAW_FORMAT, ainda em curso,
+    ou recolhidas antes de terminarem
+    """
+    manifest = read_manifest(raw_dir)
+    stale = []
+    for season in seasons:
+        entry = manifest.get(season)
+        if entry is None or not _has_season(season, raw_dir):
+            stale.append(season)
+        elif not set(stat_types) <= set(entry.get('stat_types', ['standard'])):
+            stale.append(season)
+        elif entry.get('format', 1) < RAW_FORMAT:
+            stale.append(season)
+        elif not season_is_complete(season, now):
+            stale.append(season)
+        elif datetime.fromisoformat(entry['fetched_at']) < season_end(season):
+            stale.append(season)
+    return stale
+
+
+def fresh_page_seasons(seasons, raw_dir=RAW_DIR, now=None):
+    """
+    Temporadas cujas páginas em cache podem ser de antes do fim da temporada
+
+    As ainda em curso e as recolhidas enquanto estavam em curso (fetched_at antes
+    de season_end): estas têm de ignorar a cache de páginas e a do soccerdata,
+    senão a nova recolha devolvia outra vez os números de meio da temporada.
+    """
+    manifest = read_manifest(raw_dir)
+    fresh = []
+    for season in seasons:
+        entry = manifest.get(season)
+        if not season_is_complete(season, now):
+            fresh.append(season)
+        elif entry is not None and datetime.fromisoformat(entry['fetched_at']) < season_end(season):
+            fresh.append(season)
+    return fresh
+
+
+# ============================================================================
+# ESCRITA
+# ============================================================================
+
+def _to_table(df, schema):
+    """Converter para Arrow com o schema explícito (sem inferência de tipos)"""
+    df = df.reset_index() if any(name in schema.names for name in df.index.names) else df
+    df = df[schema.names].copy()
+    for field in schema:
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            df[field.name] = pd.to_numeric(df[field.name], errors='coerce')
+        else:
+            df[field.name] = df[field.name].astype('string')
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _write_partitioned(table, base_dir, partitioning, behavior):
+    ds.write_dataset(
+        table,
+        base_dir,
+        format='parquet',
+        partitioning=partitioning,
+        existing_data_behavior=behavior,
+        basename_template='part-{i}.parquet',
+    )
+
+
+def save_season_partitions(rows, seasons, raw_dir=RAW_DIR, stat_types=('standard',)):
+    """
+    Gravar as linhas por jogador/temporada das temporadas indicadas
+
+    `rows` tem index (league, season, team, player), as colunas de RAW_SCHEMA e,
+    numa tabela larga, colunas extra de outros stat types (gravadas como float64).
+    Só as partições (liga, temporada) presentes em `rows` são substituídas.
+    """
+    raw_dir = Path(raw_dir)
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(raw_dir)
+    fetched_at = datetime.now(tz=timezone.utc).isoformat()
+
+    extra_columns = [name for name in rows.columns if name not in RAW_SCHEMA.names]
+    table = _to_table(rows, raw_schema(extra_columns))
+    table = table.filter(pc.is_in(table['season'], pa.array(seasons, pa.string())))
+    if table.num_rows > 0:
+        _write_partitioned(table, raw_dir, RAW_PARTITIONING, 'delete_matching')
+
+    counts = pc.value_counts(table['season']).to_pylist()
+    for item in counts:
+        manifest[item['values']] = {
+            'fetched_at': fetched_at,
+            'rows': item['counts'],
+            'stat_types': list(stat_types),
+            'extra_columns': extra_columns,
+            'format': RAW_FORMAT,
+        }
+    _write_manifest(manifest, raw_dir)
+
+
+def _replace_dataset(table, base_dir, partitioning):
+    base_dir = Path(base_dir)
+    tmp_dir = base_dir.with_name(base_dir.name + '.tmp')
+    old_dir = base_dir.with_name(base_dir.name + '.old')
+    _restore_dataset(base_dir)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    _write_partitioned(table, tmp_dir, partitioning, 'error')
+    # Trocar o diretório inteiro para que leitores nunca vejam uma escrita a meio. Os
+    # dois renames não são atómicos em conjunto: entre eles o diretório não existe e
+    # os leitores esperam por ele em _settled_dir. O antigo é apagado depois da troca.
+    if base_dir.exists():
+        base_dir.replace(old_dir)
+    tmp_dir.replace(base_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _restore_dataset(base_dir):
+    """Repor o diretório posto de lado se uma troca foi interrompida entre os dois renames"""
+    base_dir = Path(base_dir)
+    old_dir = base_dir.with_name(base_dir.name + '.old')
+    if not base_dir.exists() and old_dir.exists():
+        old_dir.replace(base_dir)
+
+
+def _settled_dir(base_dir, wait=None):
+    """
+    Diretório a ler para `base_dir`, à espera de uma troca de _replace_dataset a meio
+
+    Sem `base_dir` mas com o .old, a troca está entre os dois renames: espera até
+    `wait` s (SWAP_WAIT) pelo diretório novo; se não aparecer (troca interrompida),
+    lê o .old, que _replace_dataset repõe na próxima escrita.
+    """
+    base_dir = Path(base_dir)
+    old_dir = base_dir.with_name(base_dir.name + '.old')
+    deadline = time.monotonic() + (SWAP_WAIT if wait is None else wait)
+    while not base_dir.exists() and old_dir.exists():
+        if time.monotonic() >= deadline:
+            return old_dir
+        time.sleep(0.01)
+    return base_dir
+
+
+def save_stats(stats, stats_dir=STATS_DIR):
+    """Substituir a tabela agregada (particionada por liga)"""
+    _replace_dataset(_to_table(stats, STATS_SCHEMA), stats_dir, STATS_PARTITIONING)
+
+
+def save_player_seasons(rows, player_seasons_dir=PLAYER_SEASONS_DIR):
+    """Substituir as contagens por jogador e temporada (particionadas por liga)"""
+    _replace_dataset(_to_table(rows, PLAYER_SEASONS_SCHEMA), player_seasons_dir, STATS_PARTITIONING)
+
+
+# ============================================================================
+# LEITURA
+# ============================================================================
+
+def _read(base_dir, schema, partitioning, columns=None, filters=None):
+    dataset = ds.dataset(_settled_dir(base_dir), format='parquet', schema=schema, partitioning=partitioning)
+    table = dataset.to_table(columns=columns, filter=filters)
+    return table.to_pandas()
+
+
+def _partition_filter(leagues=None, seasons=None):
+    expr = None
+    if leagues is not None:
+        expr = ds.field('league').isin(list(leagues))
+    if seasons is not None:
+        season_expr = ds.field('season').isin(list(seasons))
+        expr = season_expr if expr is None else expr & season_expr
+    return expr
+
+
+def load_season_partitions(seasons=None, leagues=None, columns=None, raw_dir=RAW_DIR):
+    """
+    Ler as linhas por jogador/temporada, só das partições e colunas pedidas
+
+    Colunas extra ausentes numa partição (stat type não recolhido) vêm a nulo.
+    """
+    schema = raw_schema(stored_extra_columns(raw_dir))
+    if not Path(raw_dir).exists():
+        return pd.DataFrame(columns=columns or schema.names)
+    return _read(raw_dir, schema, RAW_PARTITIONING, columns,
+                 _partition_filter(leagues, seasons))
+
+
+def scan_season_partitions(seasons=None, leagues=None, raw_dir=RAW_DIR):
+    """
+    LazyFrame sobre as partições por jogador/temporada
+
+    Os filtros de liga/temporada e a seleção de colunas feitos depois são
+    empurrados para o scan, por isso só as partições e colunas usadas são lidas.
+    """
+    file_schema = raw_schema(stored_extra_columns(raw_dir))
+    file_schema = pa.schema([f for f in file_schema if f.name not in ('league', 'season')])
+    lf = pl.scan_parquet(
+        Path(raw_dir) / '**' / '*.parquet',
+        schema=pl.from_arrow(file_schema.empty_table()).schema,
+        hive_partitioning=True,
+        hive_schema={'league': pl.String, 'season': pl.String},
+        missing_columns='insert',
+    )
+    if leagues is not None:
+        lf = lf.filter(pl.col('league').is_in(list(leagues)))
+    if seasons is not None:
+        lf = lf.filter(pl.col('season').is_in(list(seasons)))
+    return lf
+
+
+def raw_available(raw_dir=RAW_DIR):
+    return any(Path(raw_dir).glob('league=*/season=*/*.parquet'))
+
+
+def stats_available(stats_dir=STATS_DIR):
+    return any(_settled_dir(stats_dir).glob('league=*/*.parquet'))
+
+
+def player_seasons_available(player_seasons_dir=PLAYER_SEASONS_DIR):
+    return any(_settled_dir(player_seasons_dir).glob('league=*/*.parquet'))
+
+
+def load_player_seasons(columns=None, leagues=None, player_seasons_dir=PLAYER_SEASONS_DIR):
+    """Ler as contagens por jogador e temporada; None se ainda não foram geradas"""
+    if not player_seasons_available(player_seasons_dir):
+        return None
+    df = _read(player_seasons_dir, PLAYER_SEASONS_SCHEMA, STATS_PARTITIONING, columns,
+               _partition_filter(leagues))
+    # Gravadas antes da coluna position_bits: lidos uma vez das strings de posição
+    if ('position_bits' in df.columns and 'position' in df.columns and len(df)
+            and df['position_bits'].isna().all()):
+        df['position_bits'] = parse_position_bits(df['position'])
+    return df
+
+
+def load_stats(columns=None, leagues=None, stats_dir=STATS_DIR, legacy_csv=LEGACY_CSV):
+    """
+    Ler a tabela agregada, só das ligas e colunas pedidas
+
+    Se o store ainda não existir, lê o CSV antigo com os tipos do schema (sem
+    'born', que fica a nulo). As colunas de DERIVED_STATS_COLUMNS que faltem
+    (percentis e bits de posição, no CSV ou num store gravado antes delas) são
+    calculadas aqui a partir das linhas lidas.
+    """
+    base_columns = [name for name in STATS_SCHEMA.names if name not in DERIVED_STATS_COLUMNS]
+    wants_derived = columns is None or any(c in DERIVED_STATS_COLUMNS for c in columns)
+
+    if stats_available(stats_dir):
+        df = _read(stats_dir, STATS_SCHEMA, STATS_PARTITIONING, columns,
+                   _partition_filter(leagues))
+        stored = [c for c in DERIVED_STATS_COLUMNS if c in df.columns]
+        if not (stored and len(df) and df[stored].isna().all().any()):
+            return df
+        df = _read(stats_dir, STATS_SCHEMA, STATS_PARTITIONING, base_columns,
+                   _partition_filter(leagues))
+    else:
+        legacy_csv = Path(legacy_csv)
+        if not legacy_csv.exists():
+            return None
+        usecols = base_columns if wants_derived else columns or base_columns
+        if leagues is not None and 'league' not in usecols:
+            usecols = [*usecols, 'league']
+        header = pd.read_csv(legacy_csv, nrows=0).columns
+        missing = [name for name in usecols if name not in header]
+        usecols = [name for name in usecols if name in header]
+        dtypes = {field.name: field.type.to_pandas_dtype() for field in STATS_SCHEMA
+                  if field.name in usecols and not pa.types.is_integer(field.type)}
+        df = pd.read_csv(legacy_csv, usecols=usecols, dtype=dtypes)
+        for name in missing:
+            df[name] = np.nan
+        if leagues is not None:
+            df = df[df['league'].isin(list(leagues))].reset_index(drop=True)
+
+    if wants_derived:
+        df = add_percentile_ranks(df)
+        df['position_bits'] = parse_position_bits(df['position'])
+    return df if columns is None else df[list(columns)]
+
+
+# ============================================================================
+# SNAPSHOTS (ARROW IPC, MEMORY-MAPPED)
+# ============================================================================
+
+def _sources_mtime(sources):
+    """mtime mais recente dos ficheiros de origem (diretórios Parquet ou ficheiros)"""
+    mtimes = []
+    for source in map(_settled_dir, sources):
+        if source.is_dir():
+            mtimes.extend(f.stat().st_mtime for f in source.rglob('*.parquet'))
+        elif source.exists():
+            mtimes.append(source.stat().st_mtime)
+    return max(mtimes, default=None)
+
+
+def dataset_version(stats_dir=STATS_DIR, player_seasons_dir=PLAYER_SEASONS_DIR, legacy_csv=LEGACY_CSV):
+    """Versão dos dados no disco (mtime mais recente das fontes), para chaves de cache; None sem dados"""
+    return _sources_mtime([stats_dir, player_seasons_dir, legacy_csv])
+
+
+def write_snapshot(df, path):
+    """Gravar `df` em Arrow IPC sem compressão e num só bloco, pronto para memory-map"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with pa.OSFile(str(tmp), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+    # Processos com o snapshot antigo mapeado continuam a ler o ficheiro antigo
+    tmp.replace(path)
+
+
+def open_snapshot(path):
+    """
+    DataFrame sobre o snapshot mapeado em memória, sem copiar as colunas
+
+    Strings ficam como arrays Arrow e números sem nulos como arrays numpy só de
+    leitura sobre o mesmo mapeamento; o resto (p.ex. inteiros com nulos) é convertido.
+    """
+    table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+    columns = {}
+    for name in table.column_names:
+        column = table[name]
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            columns[name] = pd.arrays.ArrowStringArray(
+                column, dtype=pd.StringDtype('pyarrow', na_value=np.nan)
+            )
+        elif (column.num_chunks == 1 and column.null_count == 0 and
+              (pa.types.is_integer(column.type) or pa.types.is_floating(column.type))):
+            columns[name] = column.chunk(0).to_numpy(zero_copy_only=True)
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+
+def _snapshot_columns(path):
+    with pa.memory_map(str(path), 'r') as source:
+        return set(pa.ipc.open_file(source).schema.names)
+
+
+def snapshot(name, loader, sources, snapshot_dir=SNAPSHOT_DIR, required=()):
+    """
+    Tabela `name` lida de um snapshot Arrow mapeado em memória
+
+    O snapshot é gerado com loader() quando não existe, é mais antigo que
+    `sources` ou não tem as colunas `required` (gravado por uma versão anterior).
+    Se não puder ser gravado (p.ex. volume só de leitura), devolve a tabela
+    carregada por loader().
+    """
+    path = Path(snapshot_dir) / f'{name}.arrow'
+    sources_mtime = _sources_mtime(sources)
+    if (not path.exists()
+            or (sources_mtime is not None and path.stat().st_mtime < sources_mtime)
+            or not set(required) <= _snapshot_columns(path)):
+        df = loader()
+        if df is None:
+            return None
+        try:
+            write_snapshot(df, path)
+        except OSError:
+            return df
+    return open_snapshot(path)
+
+
+def load_stats_snapshot(stats_dir=STATS_DIR, legacy_csv=LEGACY_CSV, snapshot_dir=SNAPSHOT_DIR):
+    """load_stats() via snapshot mapeado em memória (tabela completa, só de leitura)"""
+    return snapshot('stats', lambda: load_stats(stats_dir=stats_dir, legacy_csv=legacy_csv),
+                    [stats_dir, legacy_csv], snapshot_dir, required=STATS_SCHEMA.names)
+
+
+def load_player_seasons_snapshot(player_seasons_dir=PLAYER_SEASONS_DIR, snapshot_dir=SNAPSHOT_DIR):
+    """load_player_seasons() via snapshot mapeado em memória (só de leitura)"""
+    if not player_seasons_available(player_seasons_dir):
+        return None
+    return snapshot('player_seasons', lambda: load_player_seasons(player_seasons_dir=player_seasons_dir),
+                    [player_seasons_dir], snapshot_dir, required=PLAYER_SEASONS_SCHEMA.names)
+
+
+def load_dataset(stats_dir=STATS_DIR, player_seasons_dir=PLAYER_SEASONS_DIR, legacy_csv=LEGACY_CSV,
+                 snapshot_dir=SNAPSHOT_DIR, attempts=3):
+    """
+    (stats, player_seasons, versão) lidos juntos, para chaves de cache coerentes
+
+    A versão é lida antes e depois dos snapshots; se os dados mudaram entretanto
+    (p.ex. generate_data.py a gravar), as tabelas são lidas de novo, para que a
+    versão devolvida descreva sempre as tabelas devolvidas.
+    """
+    for _ in range(attempts):
+        version = dataset_version(stats_dir, player_seasons_dir, legacy_csv)
+        stats = load_stats_snapshot(stats_dir, legacy_csv, snapshot_dir)
+        rows = load_player_seasons_snapshot(player_seasons_dir, snapshot_dir)
+        if dataset_version(stats_dir, player_seasons_dir, legacy_csv) == version:
+            break
+    return stats, rows, version
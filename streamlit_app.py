@@ -5,11 +5,25 @@ Análise de Assists vs Expected Assists (xAG)
 
 import streamlit as st
 import soccerdata as sd
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import time
 import warnings
-from pathlib import Path
+
+from store import load_dataset
+from pipeline import (LEAGUES, SEASONS, PERCENTILE_COLUMNS, PERCENTILE_SCOPES, POSITION_BITS,
+                      POSITION_LABELS, build_stats, percentile_column)
+from season_window import SeasonPrefix, season_label, totals_frame
+from player_identity import PlayerIdentityIndex
+from bitmap_index import BitmapIndex
+from filter_plan import FilterPlan
+from ranking import RankingEngine
+from search_index import PlayerSearchIndex
+from similarity import SimilarityIndex
+from intervals import CI_COLUMNS, CI_LEVEL, add_intervals
+from export import EXPORT_FORMATS, EXPORT_CHUNK_ROWS, ExportCache, available_formats
+from charts import (FigureCache, xag_assists_scatter, overperformers_bar,
+                    underperformers_bar, league_box, role_box, per90_bar)
 
 # Suprimir warnings
 warnings.filterwarnings('ignore', category=FutureWarning)
@@ -76,33 +90,33 @@ st.markdown("""
 # FUNÇÕES AUXILIARES
 # ============================================================================
 
-@st.cache_data(show_spinner=False, ttl=300)  # ttl=300 segundos = 5 minutos
+# Colunas usadas pelo dashboard (só estas são lidas do store)
+STATS_COLUMNS = [
+    'league', 'team', 'player', 'born', 'position', 'position_bits', 'matches', 'minutes',
+    'assists', 'xAG', 'assists_minus_xag', 'assists_minus_xag_90',
+    *PERCENTILE_COLUMNS
+]
+
+# cache_resource: uma única tabela por processo, partilhada (sem cópias) por todas as
+# sessões; é só de leitura, os filtros trabalham com máscaras sobre ela.
+# Os intervalos de confiança (intervals.py) são calculados aqui, uma vez por snapshot.
+# A versão dos dados vem desta mesma leitura e é a primeira chave de todos os índices
+# e caches derivados: uma versão nunca fica associada a tabelas de outra.
+@st.cache_resource(show_spinner=False, ttl=300)  # ttl=300 segundos = 5 minutos
 def load_data():
-    """Carregar e processar dados do FBref"""
+    """Carregar e processar dados do FBref: (stats, linhas por temporada, versão dos dados)"""
     
-    # PRIORIDADE 1: Tentar carregar do CSV (mais rápido e confiável)
-    csv_file = Path('fbref_data.csv')
-    if csv_file.exists():
-        try:
-            st.info("📂 Carregando dados do arquivo local (fbref_data.csv)...")
-            df = pd.read_csv(csv_file)
+    # PRIORIDADE 1: Snapshots mapeados em memória do store local (fbref_store/ ou fbref_data.csv antigo)
+    try:
+        df, season_rows, version = load_dataset()
+        if df is not None:
             st.success(f"✅ Dados carregados: {len(df):,} jogadores")
-            return df
-        except Exception as e:
-            st.warning(f"⚠️ Erro ao ler CSV local: {e}")
-            st.info("Tentando carregar do FBref...")
-    
-    # PRIORIDADE 2: Carregar do FBref (online)
-    # Configuração completa - Big 5 Leagues
-    LEAGUES = [
-        'ENG-Premier League',
-        'ESP-La Liga',
-        'FRA-Ligue 1',
-        'GER-Bundesliga',
-        'ITA-Serie A'
-    ]
-    SEASONS = ['1718', '1819', '1920', '2021', '2122', '2223', '2324', '2425']
+            return add_intervals(df[STATS_COLUMNS]), season_rows, version
+    except Exception as e:
+        st.warning(f"⚠️ Erro ao ler dados locais: {e}")
+        st.info("Tentando carregar do FBref...")
     
+    # PRIORIDADE 2: Carregar do FBref (online) - Big 5 Leagues
     try:
         # Configurar com no_cache=False para usar cache local
         fbref = sd.FBref(
@@ -116,87 +130,74 @@ def load_data():
         # Validar se não está vazio
         if len(player_season_stats) == 0:
             st.error("❌ Nenhum dado foi carregado do FBref. Verifique a conexão.")
-            return None
+            return None, None, None
     except Exception as e:
         st.error(f"❌ Erro ao carregar dados: {e}")
         st.info("💡 Tente recarregar a página (F5) ou aguarde alguns minutos.")
-        return None
+        return None, None, None
     
-    # Processar colunas (com fallback robusto)
+    # Processar colunas e agregar com o pipeline partilhado; sem store, cada carga é uma versão
     try:
-        all_columns = player_season_stats.columns.tolist()
-        column_mapping = {}
-        
-        for idx, col in enumerate(all_columns):
-            col_str = str(col)
-            col_lower = col_str.lower()
-            
-            # Posição
-            if ('pos' in col_lower and 'position' not in column_mapping and 
-                'composed' not in col_lower and 'deposit' not in col_lower):
-                column_mapping['position'] = idx
-            
-            # Matches/Jogos (MP = Matches Played)
-            elif (('mp' == col_lower or 'matches' in col_lower) and 'matches' not in column_mapping):
-                column_mapping['matches'] = idx
-            
-            # Minutos (Min)
-            elif ('min' in col_lower and 'minute' not in column_mapping and 
-                  'per' not in col_lower and '90' not in col_lower):
-                column_mapping['minutes'] = idx
-            
-            # Assists (Ast)
-            elif ((col_lower == 'ast' or 'assist' in col_lower) and 
-                  'assists' not in column_mapping and 'xag' not in col_lower):
-                column_mapping['assists'] = idx
-            
-            # xAG (Expected Assisted Goals)
-            elif ('xag' in col_lower and 'xAG' not in column_mapping):
-                column_mapping['xAG'] = idx
-        
-        if len(column_mapping) < 5:
-            # Fallback: usar índices conhecidos
-            selected_indices = [1, 4, 6, 9, 18]
-            df = player_season_stats.iloc[:, selected_indices].copy()
-            df.columns = ['position', 'matches', 'minutes', 'assists', 'xAG']
-        else:
-            selected_indices = [
-                column_mapping['position'],
-                column_mapping['matches'],
-                column_mapping['minutes'],
-                column_mapping['assists'],
-                column_mapping['xAG']
-            ]
-            df = player_season_stats.iloc[:, selected_indices].copy()
-            df.columns = ['position', 'matches', 'minutes', 'assists', 'xAG']
-        
-        # Resetar index para ter acesso a league, team, player
-        df = df.reset_index()
-        
-        # Agregar dados usando pandas
-        stats = df.groupby(['league', 'team', 'player']).agg({
-            'matches': 'sum',
-            'assists': 'sum',
-            'xAG': 'sum',
-            'minutes': 'sum',
-            'position': 'first'
-        }).reset_index()
-        
-        # Calcular métricas derivadas
-        stats['assists_minus_xag'] = stats['assists'] - stats['xAG']
-        stats['assists_minus_xag_90'] = (stats['assists'] - stats['xAG']) / stats['minutes'] * 90
-        
-        # Filtrar
-        stats = stats[
-            (stats['minutes'] > 450) &
-            (stats['xAG'] > 0)
-        ]
-        
-        return stats
-        
+        return add_intervals(build_stats(player_season_stats).to_pandas()), None, ('fbref', time.time())
     except Exception as e:
         st.error(f"Erro ao processar dados: {e}")
+        return None, None, None
+
+# Os loaders seguintes recebem as tabelas de load_data() em argumentos com '_' (fora
+# da chave do Streamlit) e ficam em cache por `data_version`, sem ttl próprio.
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_season_prefix(data_version, _season_rows):
+    """Somas acumuladas por temporada; None sem dados por temporada (p.ex. só o CSV antigo)"""
+    if _season_rows is None or len(_season_rows) == 0:
         return None
+    return SeasonPrefix(_season_rows)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_identity_index(data_version, source, _data):
+    """Identidade (nome + ano de nascimento → chave inteira): `_data` é o SeasonPrefix ('seasons') ou stats"""
+    if source == 'seasons':
+        return _data.identity_index()
+    return PlayerIdentityIndex(_data, weight=_data['minutes'].to_numpy())
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_career_data(data_version, _stats):
+    """Tabela de carreira sem dados por temporada: as linhas de `_stats` somadas por jogador"""
+    identity = load_identity_index(data_version, 'stats', _stats)
+    df, qualified = totals_frame(identity.players, identity.career_totals(_stats))
+    return df[qualified].reset_index(drop=True)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_bitmap_index(data_version, source, view, _base):
+    """Índice bitmap (liga, equipa) da tabela base: 'seasons' (janela de temporadas) ou 'stats'"""
+    return BitmapIndex(_base)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_search_index(data_version, source, view, _base):
+    """Índice de pesquisa dos nomes da tabela base (mesmas linhas que o índice bitmap)"""
+    return PlayerSearchIndex(_base['player'].to_numpy())
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def load_window_frame(data_version, first_season, last_season, view, _prefix, _identity=None):
+    """Tabela da janela de temporadas (totais, percentis, IC) e máscara dos qualificados, por janela"""
+    df, qualified = _prefix.window_frame(first_season, last_season, _identity)
+    qualified.setflags(write=False)  # partilhada entre sessões
+    return df, qualified
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def load_ranking_engine(data_version, source, first_season, last_season, view, _base):
+    """Ordens por métrica da tabela base (uma por janela de temporadas), partilhadas entre sessões"""
+    return RankingEngine(_base)
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def load_similarity_index(data_version, source, first_season, last_season, view, _base, _fit_mask=None):
+    """Índice k-NN da tabela base; com a versão na chave, as linhas são sempre as de `_base`"""
+    return SimilarityIndex(_base, fit_mask=_fit_mask)
+
+@st.cache_resource(show_spinner=False)
+def load_figure_cache():
+    """Cache LRU de figuras serializadas, partilhada por todas as sessões"""
+    return FigureCache()
 
 def format_dataframe(df_pd, columns_to_show):
     """Formatar DataFrame para exibição"""
@@ -208,10 +209,30 @@ def format_dataframe(df_pd, columns_to_show):
     
     return df_display
 
-@st.cache_data
-def convert_df_to_csv(df):
-    """Converter DataFrame para CSV para download"""
-    return df.to_csv(index=False).encode('utf-8')
+# Vistas da tabela base: passagens por clube ou carreira (todos os clubes e ligas)
+VIEWS = {'club': 'Por clube', 'career': 'Carreira'}
+
+# Colunas das tabelas de rankings e dos ficheiros exportados, com os nomes em português
+DISPLAY_COLUMNS = {
+    'player': 'Jogador', 'team': 'Equipa', 'clubs': 'Clubes', 'teams': 'Todos os Clubes',
+    'league': 'Liga', 'position': 'Posição',
+    'matches': 'Jogos', 'assists': 'Assists', 'xAG': 'xAG',
+    'assists_minus_xag': 'Diff', 'assists_minus_xag_low': 'Diff IC-',
+    'assists_minus_xag_high': 'Diff IC+', 'assists_minus_xag_90': 'Diff/90',
+    'assists_minus_xag_pct_league': 'Pct Liga', 'assists_minus_xag_pct_position': 'Pct Posição',
+    'assists_minus_xag_pct': 'Pct Geral'
+}
+
+def display_table(df):
+    """Arredondar e renomear colunas para português (tabela ou bloco exportado)"""
+    numeric_cols = df.select_dtypes(include=['float64', 'float32']).columns
+    df[numeric_cols] = df[numeric_cols].round(2)
+    return df.rename(columns=DISPLAY_COLUMNS)
+
+@st.cache_resource(show_spinner=False)
+def load_export_cache():
+    """Ficheiros exportados (CSV/Parquet/XLSX) por filtro, partilhados por todas as sessões"""
+    return ExportCache()
 
 # ============================================================================
 # INTERFACE PRINCIPAL
@@ -224,16 +245,16 @@ st.markdown("---")
 
 # Carregar dados
 with st.spinner("🔄 A carregar dados do FBref... (pode demorar alguns minutos)"):
-    stats = load_data()
+    stats, season_rows, data_version = load_data()
 
 if stats is None or len(stats) == 0:
     st.error("❌ Não foi possível carregar os dados. Verifique a conexão e tente novamente.")
     st.info("💡 Tente recarregar a página (F5) ou limpar o cache.")
     st.stop()
 
-# Usar dados diretamente (já é pandas)
+# Tabela base imutável: os filtros só produzem máscaras sobre ela
 try:
-    stats_pd = stats.copy()
+    stats_pd = stats
     
     # Validar se tem dados
     if len(stats_pd) == 0:
@@ -250,8 +271,55 @@ except Exception as e:
 
 st.sidebar.header("🔍 Filtros")
 
+# Vista: uma linha por passagem por clube, ou por jogador com os totais de todos os
+# clubes e ligas (identidade por nome + ano de nascimento, player_identity.py)
+view = st.sidebar.radio(
+    "Vista:",
+    options=list(VIEWS),
+    format_func=VIEWS.get,
+    horizontal=True
+)
+
+# Janela de temporadas: totais de cada jogador a partir das somas acumuladas.
+# A tabela base tem sempre as mesmas linhas (as do índice bitmap); a qualificação
+# na janela é uma máscara, não um novo DataFrame.
+season_prefix = load_season_prefix(data_version, season_rows)
+if season_prefix is not None and len(season_prefix.seasons) > 1:
+    first_season, last_season = st.sidebar.select_slider(
+        "Temporadas:",
+        options=season_prefix.seasons,
+        value=(season_prefix.seasons[0], season_prefix.seasons[-1]),
+        format_func=season_label
+    )
+    source = 'seasons'
+    identity = load_identity_index(data_version, source, season_prefix) if view == 'career' else None
+    players = season_prefix.players if identity is None else identity.players
+    stats_pd, base_mask = load_window_frame(data_version, first_season, last_season, view,
+                                            season_prefix, identity)
+    bitmap_index = load_bitmap_index(data_version, source, view, players)
+    search_index = load_search_index(data_version, source, view, players)
+    plan = FilterPlan(stats_pd, base_mask, key=('seasons', first_season, last_season, view))
+    ranking = load_ranking_engine(data_version, source, first_season, last_season, view, stats_pd)
+    
+    if not base_mask.any():
+        st.warning("⚠️ Nenhum jogador qualificado nas temporadas selecionadas.")
+        st.stop()
+else:
+    source = 'stats'
+    first_season = last_season = None
+    if view == 'career':
+        stats_pd = load_career_data(data_version, stats)
+    base_mask = np.ones(len(stats_pd), dtype=bool)
+    bitmap_index = load_bitmap_index(data_version, source, view, stats_pd)
+    search_index = load_search_index(data_version, source, view, stats_pd)
+    plan = FilterPlan(stats_pd, base_mask, key=('stats', view))
+    ranking = load_ranking_engine(data_version, source, None, None, view, stats_pd)
+
+# Colunas das tabelas: as de DISPLAY_COLUMNS que a vista tem (clubes só na carreira)
+table_columns = [column for column in DISPLAY_COLUMNS if column in stats_pd.columns]
+
 # Filtro de Liga
-all_leagues = sorted(stats_pd['league'].unique().tolist()) if 'league' in stats_pd.columns else []
+all_leagues = bitmap_index['league'].present(base_mask)
 
 if len(all_leagues) == 0:
     st.error("❌ Nenhuma liga encontrada nos dados.")
@@ -263,19 +331,16 @@ selected_leagues = st.sidebar.multiselect(
     default=all_leagues
 )
 
-# Filtrar dados por liga
-if selected_leagues:
-    stats_filtered = stats_pd[stats_pd['league'].isin(selected_leagues)].copy()
-else:
-    stats_filtered = stats_pd.copy()
+# Filtrar dados por liga (OR dos bitmaps das ligas escolhidas)
+plan.where(('league', tuple(selected_leagues)), bitmap_index.mask({'league': selected_leagues}))
 
 # Validar se tem dados após filtro
-if len(stats_filtered) == 0:
+if len(plan) == 0:
     st.warning("⚠️ Nenhum dado disponível com os filtros selecionados.")
     st.stop()
 
 # Filtro de Equipa
-all_teams = sorted(stats_filtered['team'].unique().tolist()) if 'team' in stats_filtered.columns else []
+all_teams = bitmap_index['team'].present(plan.mask)
 selected_teams = st.sidebar.multiselect(
     "Equipa:",
     options=all_teams,
@@ -283,25 +348,48 @@ selected_teams = st.sidebar.multiselect(
 )
 
 if selected_teams:
-    stats_filtered = stats_filtered[stats_filtered['team'].isin(selected_teams)].copy()
+    plan.where(('team', tuple(selected_teams)), bitmap_index.mask({'team': selected_teams}))
+
+# Filtro de Posição: teste bit a bit sobre position_bits (qualquer das posições escolhidas)
+selected_positions = st.sidebar.multiselect(
+    "Posição:",
+    options=list(POSITION_BITS),
+    format_func=lambda code: f"{POSITION_LABELS[code]} ({code})",
+    default=[]
+)
+
+if selected_positions:
+    wanted_bits = sum(POSITION_BITS[code] for code in selected_positions)
+    plan.where(('position', wanted_bits), (stats_pd['position_bits'].to_numpy() & wanted_bits) != 0)
 
 # Filtro de Jogador (search box)
 player_search = st.sidebar.text_input("🔎 Procurar Jogador:", "")
 
-if player_search and 'player' in stats_filtered.columns:
-    stats_filtered = stats_filtered[
-        stats_filtered['player'].str.contains(player_search, case=False, na=False)
-    ].copy()
+if player_search and 'player' in stats_pd.columns:
+    # Pesquisa no índice: sem acentos nem maiúsculas ("odegaard" encontra "Ødegaard")
+    name_ids = search_index.matches(player_search)
+    if len(name_ids) == 0:
+        name_ids = search_index.fuzzy(player_search)
+        if len(name_ids) > 0:
+            st.sidebar.caption(
+                "Sem resultados exatos; nomes parecidos: "
+                + ", ".join(search_index.display_names(name_ids[:5]))
+            )
+    elif len(name_ids) > 1:
+        st.sidebar.caption(
+            "Sugestões: " + ", ".join(search_index.display_names(search_index.search(player_search, limit=5)))
+        )
+    plan.where(('search', player_search), search_index.mask(name_ids))
 
 # Filtros numéricos
 st.sidebar.markdown("---")
 st.sidebar.subheader("⚙️ Filtros Avançados")
 
 # Calcular max values com fallback para evitar NaN
-max_matches = stats_pd['matches'].max() if 'matches' in stats_pd.columns else 100
+max_matches = np.max(stats_pd['matches'].to_numpy(), where=base_mask, initial=0) if 'matches' in stats_pd.columns else 100
 max_matches = int(max_matches) if pd.notna(max_matches) and max_matches > 0 else 100
 
-max_xag_val = stats_pd['xAG'].max() if 'xAG' in stats_pd.columns else 50.0
+max_xag_val = np.nanmax(stats_pd['xAG'].to_numpy(), where=base_mask, initial=0.0) if 'xAG' in stats_pd.columns else 50.0
 max_xag_val = float(max_xag_val) if pd.notna(max_xag_val) and max_xag_val > 0 else 50.0
 
 min_matches = st.sidebar.slider(
@@ -319,18 +407,70 @@ min_xag = st.sidebar.slider(
     step=0.5
 )
 
+# Percentil de Assists - xAG na liga, na posição principal ou entre todos
+# (pré-calculado no store / na janela de temporadas)
+percentile_scope = st.sidebar.selectbox(
+    "Percentil Assists - xAG (comparar com):",
+    options=list(PERCENTILE_SCOPES),
+    format_func=PERCENTILE_SCOPES.get
+)
+
+min_percentile = st.sidebar.slider(
+    "Percentil mínimo:",
+    min_value=0,
+    max_value=100,
+    value=0,
+    step=5
+)
+
+# Overperformer significativo: limite inferior do intervalo de Assists - xAG acima de 0
+only_significant = st.sidebar.checkbox(
+    f"Só overperformers significativos (IC {CI_LEVEL:.0%})",
+    value=False,
+    help="Assists acima do xAG mesmo no limite inferior do intervalo de confiança (Poisson)"
+)
+
 # Aplicar filtros numéricos com validação
-if 'matches' in stats_filtered.columns and 'xAG' in stats_filtered.columns:
-    stats_filtered = stats_filtered[
-        (stats_filtered['matches'] >= min_matches) &
-        (stats_filtered['xAG'] >= min_xag)
-    ].copy()
+if 'matches' in stats_pd.columns and 'xAG' in stats_pd.columns:
+    plan.where(('matches', min_matches), stats_pd['matches'].to_numpy() >= min_matches)
+    plan.where(('xAG', min_xag), stats_pd['xAG'].to_numpy() >= min_xag)
+
+if min_percentile > 0:
+    percentile_col = percentile_column('assists_minus_xag', percentile_scope)
+    plan.where(('percentile', percentile_col, min_percentile),
+               stats_pd[percentile_col].to_numpy() >= min_percentile)
+
+if only_significant:
+    plan.where(('significant', CI_LEVEL), stats_pd[CI_COLUMNS[0]].to_numpy() > 0)
+
+# Jogador de referência para a tab "Parecidos" (procurado no índice de nomes)
+st.sidebar.markdown("---")
+st.sidebar.subheader("👥 Jogadores Parecidos")
+
+similar_search = st.sidebar.text_input("Jogador de referência:", "")
+similar_row = None
+if similar_search:
+    # Linhas qualificadas com os nomes encontrados, pela ordem de relevância da pesquisa
+    name_ids = search_index.search(similar_search, limit=20)
+    candidate_rows = np.flatnonzero(search_index.mask(name_ids) & base_mask)
+    relevance = np.empty(len(search_index.names) + 1, dtype=np.intp)
+    relevance[name_ids] = np.arange(len(name_ids))
+    candidate_rows = candidate_rows[np.argsort(relevance[search_index.codes[candidate_rows]], kind='stable')]
+    if len(candidate_rows) == 0:
+        st.sidebar.caption("Nenhum jogador encontrado.")
+    else:
+        similar_row = st.sidebar.selectbox(
+            "Escolher jogador:",
+            options=candidate_rows.tolist(),
+            format_func=lambda row: (f"{stats_pd['player'].iat[row]} — "
+                                     f"{stats_pd['team'].iat[row]} ({stats_pd['league'].iat[row]})")
+        )
 
 st.sidebar.markdown("---")
-st.sidebar.info(f"📊 **{len(stats_filtered):,}** jogadores no filtro atual")
+st.sidebar.info(f"📊 **{len(plan):,}** jogadores no filtro atual")
 
 # Validar se ainda tem dados
-if len(stats_filtered) == 0:
+if len(plan) == 0:
     st.warning("⚠️ Nenhum jogador encontrado com os filtros aplicados. Tente ajustar os filtros.")
     st.stop()
 
@@ -345,23 +485,23 @@ col1, col2, col3, col4 = st.columns(4)
 with col1:
     st.metric(
         label="Total Jogadores",
-        value=f"{len(stats_filtered):,}"
+        value=f"{len(plan):,}"
     )
 
 with col2:
     st.metric(
         label="Total Assists",
-        value=f"{stats_filtered['assists'].sum():,.0f}"
+        value=f"{plan.values('assists').sum():,.0f}"
     )
 
 with col3:
     st.metric(
         label="Total xAG",
-        value=f"{stats_filtered['xAG'].sum():,.2f}"
+        value=f"{plan.values('xAG').sum():,.2f}"
     )
 
 with col4:
-    avg_diff = stats_filtered['assists_minus_xag'].mean()
+    avg_diff = np.nanmean(plan.values('assists_minus_xag'))
     st.metric(
         label="Média Assists - xAG",
         value=f"{avg_diff:.2f}",
@@ -374,317 +514,178 @@ st.markdown("---")
 # TABS PRINCIPAIS
 # ============================================================================
 
-tab1, tab2, tab3, tab4 = st.tabs([
+# Rankings por 90 minutos só com jogadores com pelo menos 5 xAG
+min_xag_5 = ('xAG>=5', stats_pd['xAG'].to_numpy() >= 5)
+
+# Cada tab é um fragment que só corre quando está aberta: mudar de tab ou de
+# filtro calcula e serializa apenas as tabelas/figuras visíveis
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
     "🔺 Overperformers",
     "🔻 Subperformers",
     "⚡ Per 90 Minutes",
-    "📈 Gráficos"
-])
+    "📈 Gráficos",
+    "📋 Tabela Completa",
+    "👥 Parecidos"
+], key='tab', on_change='rerun')
 
 # ============================================================================
-# TAB 1: OVERPERFORMERS
+# TABS 1-3: RANKINGS TOP 100
 # ============================================================================
 
-with tab1:
-    st.subheader("🔺 TOP 100 Overperformers (Assists acima do esperado)")
+@st.fragment
+def ranking_tab(plan, title, metric, ascending, extra, name, empty_message):
+    """Tabela TOP 100 de um ranking; os downloads só são gerados quando são pedidos"""
+    st.subheader(title)
     
-    top100_over = (
-        stats_filtered
-        .sort_values('assists_minus_xag', ascending=False)
-        .head(100)
-    )
+    top100 = ranking.top(plan, metric, 100, ascending=ascending, extra=extra)
     
-    if len(top100_over) > 0:
-        # Selecionar colunas para exibição
-        display_cols = [
-            'player', 'team', 'league', 'position',
-            'matches', 'assists', 'xAG', 'assists_minus_xag', 'assists_minus_xag_90'
-        ]
-        
-        df_display = top100_over[display_cols].copy()
-        
-        # Arredondar
-        numeric_cols = df_display.select_dtypes(include=['float64', 'float32']).columns
-        df_display[numeric_cols] = df_display[numeric_cols].round(2)
-        
-        # Renomear colunas para português
-        df_display.columns = [
-            'Jogador', 'Equipa', 'Liga', 'Posição',
-            'Jogos', 'Assists', 'xAG', 'Diff', 'Diff/90'
-        ]
+    if len(top100) > 0:
+        df_display = display_table(plan.frame(table_columns, top100))
         
         st.dataframe(
             df_display,
-            use_container_width=True,
+            width='stretch',
             height=600
         )
         
-        # Botão de download
-        csv = convert_df_to_csv(df_display)
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name="top100_overperformers.csv",
-            mime="text/csv"
+        # Downloads: top 100 ou todos os jogadores do filtro, pela mesma ordem.
+        # O ficheiro é escrito por blocos no clique e reutilizado para o mesmo filtro.
+        export_cache = load_export_cache()
+        selection = (metric, ascending, None if extra is None else extra[0])
+        n_all = len(plan) if extra is None else int(np.count_nonzero(plan.mask & extra[1]))
+        
+        fmt = st.radio(
+            "Formato:",
+            available_formats(),
+            format_func=lambda f: EXPORT_FORMATS[f][0],
+            horizontal=True,
+            key=f'{name}_format'
         )
-    else:
-        st.warning("Nenhum jogador encontrado com os filtros atuais.")
-
-# ============================================================================
-# TAB 2: SUBPERFORMERS
-# ============================================================================
-
-with tab2:
-    st.subheader("🔻 TOP 100 Subperformers (Assists abaixo do esperado)")
-    
-    top100_sub = (
-        stats_filtered
-        .sort_values('assists_minus_xag', ascending=True)
-        .head(100)
-    )
-    
-    if len(top100_sub) > 0:
-        display_cols = [
-            'player', 'team', 'league', 'position',
-            'matches', 'assists', 'xAG', 'assists_minus_xag', 'assists_minus_xag_90'
-        ]
-        
-        df_display = top100_sub[display_cols].copy()
-        numeric_cols = df_display.select_dtypes(include=['float64', 'float32']).columns
-        df_display[numeric_cols] = df_display[numeric_cols].round(2)
         
-        df_display.columns = [
-            'Jogador', 'Equipa', 'Liga', 'Posição',
-            'Jogos', 'Assists', 'xAG', 'Diff', 'Diff/90'
-        ]
-        
-        st.dataframe(
-            df_display,
-            use_container_width=True,
-            height=600
-        )
+        def download(label, file_stem, rows):
+            key = (data_version, plan.signature, selection, file_stem)
+            st.download_button(
+                label=label,
+                data=lambda: export_cache.payload(
+                    key, fmt,
+                    lambda: map(display_table, plan.frames(table_columns, rows(), EXPORT_CHUNK_ROWS))
+                ),
+                file_name=f"{file_stem}{EXPORT_FORMATS[fmt][1]}",
+                mime=EXPORT_FORMATS[fmt][2],
+                on_click='ignore',
+                key=f'{file_stem}_download'
+            )
         
-        csv = convert_df_to_csv(df_display)
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name="top100_subperformers.csv",
-            mime="text/csv"
-        )
+        col1, col2 = st.columns(2)
+        with col1:
+            download("📥 Download Top 100", f"top100_{name}", lambda: top100)
+        with col2:
+            download(f"📥 Download todos ({n_all:,} jogadores)", f"{name}_todos",
+                     lambda: ranking.ordered(plan, metric, ascending=ascending, extra=extra))
     else:
-        st.warning("Nenhum jogador encontrado com os filtros atuais.")
+        st.warning(empty_message)
 
-# ============================================================================
-# TAB 3: PER 90 MINUTES
-# ============================================================================
 
-with tab3:
-    st.subheader("⚡ TOP 100 Por 90 Minutos (mínimo 5 xAG)")
-    
-    top100_p90 = (
-        stats_filtered[stats_filtered['xAG'] >= 5]
-        .sort_values('assists_minus_xag_90', ascending=False)
-        .head(100)
-    )
-    
-    if len(top100_p90) > 0:
-        display_cols = [
-            'player', 'team', 'league', 'position',
-            'matches', 'assists', 'xAG', 'assists_minus_xag', 'assists_minus_xag_90'
-        ]
-        
-        df_display = top100_p90[display_cols].copy()
-        numeric_cols = df_display.select_dtypes(include=['float64', 'float32']).columns
-        df_display[numeric_cols] = df_display[numeric_cols].round(2)
-        
-        df_display.columns = [
-            'Jogador', 'Equipa', 'Liga', 'Posição',
-            'Jogos', 'Assists', 'xAG', 'Diff', 'Diff/90'
-        ]
-        
-        st.dataframe(
-            df_display,
-            use_container_width=True,
-            height=600
+if tab1.open:
+    with tab1:
+        ranking_tab(
+            plan, "🔺 TOP 100 Overperformers (Assists acima do esperado)",
+            'assists_minus_xag', False, None, "overperformers",
+            "Nenhum jogador encontrado com os filtros atuais."
         )
-        
-        csv = convert_df_to_csv(df_display)
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name="top100_per90.csv",
-            mime="text/csv"
+
+if tab2.open:
+    with tab2:
+        ranking_tab(
+            plan, "🔻 TOP 100 Subperformers (Assists abaixo do esperado)",
+            'assists_minus_xag', True, None, "subperformers",
+            "Nenhum jogador encontrado com os filtros atuais."
+        )
+
+if tab3.open:
+    with tab3:
+        ranking_tab(
+            plan, "⚡ TOP 100 Por 90 Minutos (mínimo 5 xAG)",
+            'assists_minus_xag_90', False, min_xag_5, "per90",
+            "Nenhum jogador encontrado com os filtros atuais (mínimo 5 xAG)."
         )
-    else:
-        st.warning("Nenhum jogador encontrado com os filtros atuais (mínimo 5 xAG).")
 
 # ============================================================================
 # TAB 4: GRÁFICOS
 # ============================================================================
 
-with tab4:
+@st.fragment
+def charts_tab(plan):
+    """As figuras Plotly sobre as linhas do plano de filtros"""
     st.subheader("📈 Visualizações Interativas")
     
-    if len(stats_filtered) > 0:
+    if len(plan) > 0:
+        # Figuras já vistas (nesta ou noutra sessão) vêm da cache, sem as construir de novo
+        figure_cache = load_figure_cache()
+        
+        def cached(figure_id, build):
+            return figure_cache.figure((data_version, figure_id, plan.signature), build)
         
         # ---- GRÁFICO 1: Scatter xAG vs Assists (Plotly) ----
         st.markdown("### 🎯 Scatter: xAG vs Assists")
         st.markdown("*Passe o rato sobre os pontos para ver detalhes*")
         
-        # Criar DataFrame com informações completas para hover
-        scatter_df = stats_filtered[['player', 'team', 'league', 'xAG', 'assists', 'assists_minus_xag']].copy()
-        
-        fig1 = px.scatter(
-            scatter_df,
-            x='xAG',
-            y='assists',
-            hover_data={
-                'player': True,
-                'team': True,
-                'league': True,
-                'xAG': ':.2f',
-                'assists': ':.0f',
-                'assists_minus_xag': ':.2f'
-            },
-            labels={
-                'xAG': 'Expected Assisted Goals (xAG)',
-                'assists': 'Assists',
-                'assists_minus_xag': 'Diferença'
-            },
-            title='Assists vs Expected Assists (xAG)',
-            color='assists_minus_xag',
-            color_continuous_scale='RdYlGn',
-            color_continuous_midpoint=0
-        )
+        # Acima de alguns milhares de linhas: WebGL e depois bins 2D + outliers
+        fig1 = cached('scatter', lambda: xag_assists_scatter(plan))
         
-        # Adicionar linha de referência (assists = xAG)
-        max_val = max(scatter_df['xAG'].max(), scatter_df['assists'].max())
-        fig1.add_trace(go.Scatter(
-            x=[0, max_val],
-            y=[0, max_val],
-            mode='lines',
-            name='Assists = xAG',
-            line=dict(color='red', width=2, dash='dash'),
-            showlegend=True
-        ))
-        
-        fig1.update_layout(
-            height=600,
-            hovermode='closest',
-            template='plotly_white'
-        )
-        
-        st.plotly_chart(fig1, use_container_width=True)
+        st.plotly_chart(fig1, width='stretch')
         
         st.markdown("---")
         
         # ---- GRÁFICO 2: Bar Chart Top 30 Overperformers (Plotly) ----
         st.markdown("### 🔺 Top 30 Overperformers")
-        st.markdown("*Clique nas barras para interagir*")
-        
-        top30_over = stats_filtered.sort_values('assists_minus_xag', ascending=False).head(30)
-        
-        fig2 = go.Figure()
-        
-        fig2.add_trace(go.Bar(
-            y=top30_over['player'],
-            x=top30_over['assists_minus_xag'],
-            orientation='h',
-            marker=dict(
-                color=top30_over['assists_minus_xag'],
-                colorscale='Greens',
-                showscale=True,
-                colorbar=dict(title="Diff")
-            ),
-            text=top30_over['assists_minus_xag'].round(2),
-            textposition='outside',
-            hovertemplate='<b>%{y}</b><br>' +
-                         'Assists - xAG: %{x:.2f}<br>' +
-                         'Team: %{customdata[0]}<br>' +
-                         'League: %{customdata[1]}<br>' +
-                         '<extra></extra>',
-            customdata=top30_over[['team', 'league']].values
-        ))
+        st.markdown(f"*Clique nas barras para interagir; as linhas mostram o intervalo de confiança a {CI_LEVEL:.0%}*")
         
-        fig2.update_layout(
-            title='TOP 30 Overperformers: Assists acima do Esperado',
-            xaxis_title='Assists - xAG',
-            yaxis_title='',
-            height=900,
-            template='plotly_white',
-            yaxis={'categoryorder': 'total ascending'}
-        )
+        fig2 = cached('top30_over', lambda: overperformers_bar(
+            plan.frame(['player', 'team', 'league', 'assists_minus_xag', *CI_COLUMNS],
+                       ranking.top(plan, 'assists_minus_xag', 30))
+        ))
         
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(fig2, width='stretch')
         
         st.markdown("---")
         
         # ---- GRÁFICO 3: Bar Chart Top 30 Subperformers (Plotly) ----
         st.markdown("### 🔻 Top 30 Subperformers")
-        st.markdown("*Clique nas barras para interagir*")
-        
-        top30_sub = stats_filtered.sort_values('assists_minus_xag', ascending=True).head(30)
-        
-        fig3 = go.Figure()
-        
-        fig3.add_trace(go.Bar(
-            y=top30_sub['player'],
-            x=top30_sub['assists_minus_xag'],
-            orientation='h',
-            marker=dict(
-                color=top30_sub['assists_minus_xag'],
-                colorscale='Reds',
-                showscale=True,
-                colorbar=dict(title="Diff"),
-                reversescale=True
-            ),
-            text=top30_sub['assists_minus_xag'].round(2),
-            textposition='outside',
-            hovertemplate='<b>%{y}</b><br>' +
-                         'Assists - xAG: %{x:.2f}<br>' +
-                         'Team: %{customdata[0]}<br>' +
-                         'League: %{customdata[1]}<br>' +
-                         '<extra></extra>',
-            customdata=top30_sub[['team', 'league']].values
-        ))
+        st.markdown(f"*Clique nas barras para interagir; as linhas mostram o intervalo de confiança a {CI_LEVEL:.0%}*")
         
-        fig3.update_layout(
-            title='TOP 30 Subperformers: Assists abaixo do Esperado',
-            xaxis_title='Assists - xAG',
-            yaxis_title='',
-            height=900,
-            template='plotly_white',
-            yaxis={'categoryorder': 'total descending'}
-        )
+        fig3 = cached('top30_sub', lambda: underperformers_bar(
+            plan.frame(['player', 'team', 'league', 'assists_minus_xag', *CI_COLUMNS],
+                       ranking.top(plan, 'assists_minus_xag', 30, ascending=True))
+        ))
         
-        st.plotly_chart(fig3, use_container_width=True)
+        st.plotly_chart(fig3, width='stretch')
         
         st.markdown("---")
         
-        # ---- GRÁFICO 4: Distribuição por Liga (Boxplot) ----
-        st.markdown("### 📊 Distribuição por Liga")
-        st.markdown("*Compare a performance entre diferentes ligas*")
-        
-        fig4 = px.box(
-            stats_filtered,
-            x='league',
-            y='assists_minus_xag',
-            color='league',
-            title='Distribuição de Assists - xAG por Liga',
-            labels={
-                'league': 'Liga',
-                'assists_minus_xag': 'Assists - xAG'
-            },
-            hover_data=['player', 'team']
-        )
+        # ---- GRÁFICO 4: Distribuição por Liga ou por Posição (Boxplot) ----
+        st.markdown("### 📊 Distribuição por Liga / Posição")
+        st.markdown("*Compare a performance entre diferentes ligas ou posições*")
         
-        fig4.update_layout(
-            height=600,
-            template='plotly_white',
-            showlegend=False
+        box_group = st.radio(
+            "Agrupar por:",
+            ['league', 'position'],
+            format_func={'league': 'Liga', 'position': 'Posição'}.get,
+            horizontal=True,
+            key='box_group'
         )
         
-        st.plotly_chart(fig4, use_container_width=True)
+        if box_group == 'position':
+            # Grupos pelos bits de posição (um jogador 'DF,MF' conta nas duas posições)
+            fig4 = cached('role_box', lambda: role_box(
+                plan.frame(['position_bits', 'assists_minus_xag', 'player', 'team'])
+            ))
+        else:
+            fig4 = cached('league_box', lambda: league_box(
+                plan.frame(['league', 'assists_minus_xag', 'player', 'team'])
+            ))
+        
+        st.plotly_chart(fig4, width='stretch')
         
         st.markdown("---")
         
@@ -692,51 +693,117 @@ with tab4:
         st.markdown("### ⚡ Top 20 por 90 Minutos")
         st.markdown("*Performance normalizada (mínimo 5 xAG)*")
         
-        top20_p90 = (
-            stats_filtered[stats_filtered['xAG'] >= 5]
-            .sort_values('assists_minus_xag_90', ascending=False)
-            .head(20)
-        )
+        top20_p90 = ranking.top(plan, 'assists_minus_xag_90', 20, extra=min_xag_5)
         
         if len(top20_p90) > 0:
-            fig5 = go.Figure()
-            
-            fig5.add_trace(go.Bar(
-                y=top20_p90['player'],
-                x=top20_p90['assists_minus_xag_90'],
-                orientation='h',
-                marker=dict(
-                    color=top20_p90['assists_minus_xag_90'],
-                    colorscale='Viridis',
-                    showscale=True,
-                    colorbar=dict(title="Diff/90")
-                ),
-                text=top20_p90['assists_minus_xag_90'].round(3),
-                textposition='outside',
-                hovertemplate='<b>%{y}</b><br>' +
-                             'Diff per 90: %{x:.3f}<br>' +
-                             'Team: %{customdata[0]}<br>' +
-                             'Minutes: %{customdata[1]:.0f}<br>' +
-                             '<extra></extra>',
-                customdata=top20_p90[['team', 'minutes']].values
+            fig5 = cached('top20_p90', lambda: per90_bar(
+                plan.frame(['player', 'team', 'minutes', 'assists_minus_xag_90'], top20_p90)
             ))
             
-            fig5.update_layout(
-                title='TOP 20 Assists - xAG por 90 Minutos',
-                xaxis_title='(Assists - xAG) / 90 min',
-                yaxis_title='',
-                height=600,
-                template='plotly_white',
-                yaxis={'categoryorder': 'total ascending'}
-            )
-            
-            st.plotly_chart(fig5, use_container_width=True)
+            st.plotly_chart(fig5, width='stretch')
         else:
             st.info("Nenhum jogador com mínimo 5 xAG nos dados filtrados.")
         
+        cache_stats = figure_cache.stats()
+        st.caption(
+            f"🗂️ Cache de figuras: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses, "
+            f"{cache_stats['entries']} figuras ({cache_stats['bytes'] / 1024**2:.1f} MB)"
+        )
+        
     else:
         st.warning("Nenhum dado disponível para gerar gráficos.")
 
+
+if tab4.open:
+    with tab4:
+        charts_tab(plan)
+
+# ============================================================================
+# TAB 5: TABELA COMPLETA
+# ============================================================================
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+@st.fragment
+def full_table_tab(plan):
+    """Todos os jogadores do filtro, uma página de cada vez, ordenáveis por qualquer coluna"""
+    st.subheader("📋 Todos os Jogadores do Filtro")
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_column = st.selectbox(
+            "Ordenar por:",
+            table_columns,
+            index=table_columns.index('assists_minus_xag'),
+            format_func=DISPLAY_COLUMNS.get,
+            key='table_sort'
+        )
+    with col2:
+        page_size = st.selectbox("Linhas por página:", PAGE_SIZES, index=1, key='table_page_size')
+    with col3:
+        ascending = st.toggle("Ordem crescente", value=False, key='table_ascending')
+    
+    # A vista ordenada (ordem pré-calculada da coluna ∩ filtro) é memorizada pelo
+    # motor de rankings; cada página é só uma fatia dela
+    total = len(ranking.ordered(plan, sort_column, ascending))
+    n_pages = max(1, -(-total // page_size))
+    if st.session_state.get('table_page', 1) > n_pages:
+        st.session_state['table_page'] = n_pages
+    page = st.number_input(f"Página (de {n_pages:,}):", min_value=1, max_value=n_pages, value=1,
+                           step=1, key='table_page')
+    
+    start = (page - 1) * page_size
+    rows, total = ranking.page(plan, sort_column, ascending, start, start + page_size)
+    
+    df_page = display_table(plan.frame(table_columns, rows))
+    df_page.index = np.arange(start + 1, start + len(rows) + 1)
+    
+    st.dataframe(
+        df_page,
+        width='stretch',
+        height=600
+    )
+    st.caption(f"Jogadores {start + 1:,}–{start + len(rows):,} de {total:,}")
+
+
+if tab5.open:
+    with tab5:
+        full_table_tab(plan)
+
+# ============================================================================
+# TAB 6: JOGADORES PARECIDOS
+# ============================================================================
+
+@st.fragment
+def similar_tab(plan, row):
+    """Os k jogadores do filtro atual mais parecidos com o jogador de referência"""
+    st.subheader("👥 Jogadores Parecidos")
+    
+    if row is None:
+        st.info("Escolha um jogador de referência na barra lateral (👥 Jogadores Parecidos).")
+        return
+    
+    fit_mask = base_mask if source == 'seasons' else None
+    index = load_similarity_index(data_version, source, first_season, last_season, view, stats_pd, fit_mask)
+    
+    k = st.slider("Número de jogadores:", min_value=5, max_value=50, value=10, step=5, key='similar_k')
+    rows, distances = index.neighbours(row, k, mask=plan.mask)
+    
+    reference = display_table(plan.frame(table_columns, [row]))
+    st.markdown("**Jogador de referência**")
+    st.dataframe(reference, width='stretch', hide_index=True)
+    
+    st.markdown(f"**Mais parecidos** (entre os {len(plan):,} jogadores do filtro atual; "
+                "assists e xAG por 90, fração de minutos e posição)")
+    df_similar = display_table(plan.frame(table_columns, rows))
+    df_similar.insert(0, 'Distância', distances.round(2))
+    st.dataframe(df_similar, width='stretch', hide_index=True, height=600)
+
+
+if tab6.open:
+    with tab6:
+        similar_tab(plan, similar_row)
+
 # ============================================================================
 # FOOTER
 # ============================================================================
@@ -1,13 +1,16 @@
 """
 Dashboard Interativo - FBref Assists Analysis
-Versão com dados pré-carregados (CSV)
+Versão com dados pré-carregados (store Parquet / CSV)
 """
 
+from functools import partial
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from pathlib import Path
+
+from store import load_stats_snapshot
 
 # Configuração da página
 st.set_page_config(
@@ -44,23 +47,26 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+STATS_COLUMNS = [
+    'league', 'team', 'player', 'position', 'matches', 'minutes',
+    'assists', 'xAG', 'assists_minus_xag', 'assists_minus_xag_90'
+]
+
+@st.cache_resource  # uma tabela só de leitura por processo, partilhada entre sessões
 def load_data():
-    """Carregar dados do CSV pré-processado"""
+    """Carregar dados pré-processados (snapshot mapeado em memória do store Parquet, ou CSV antigo)"""
     try:
-        csv_file = Path('fbref_data.csv')
-        if not csv_file.exists():
-            st.error("❌ Arquivo fbref_data.csv não encontrado!")
-            st.info("💡 Execute: `python generate_data.py` localmente e faça upload do CSV gerado")
+        df = load_stats_snapshot()
+        if df is None:
+            st.error("❌ Dados não encontrados (fbref_store/ ou fbref_data.csv)!")
+            st.info("💡 Execute: `python generate_data.py` localmente e faça upload do store gerado")
             return None
         
-        df = pd.read_csv(csv_file)
-        return df
+        return df[STATS_COLUMNS]
     except Exception as e:
         st.error(f"❌ Erro ao carregar dados: {e}")
         return None
 
-@st.cache_data
 def convert_df_to_csv(df):
     return df.to_csv(index=False).encode('utf-8')
 
@@ -153,10 +159,11 @@ with tab1:
         numeric_cols = df_display.select_dtypes(include=['float64', 'float32']).columns
         df_display[numeric_cols] = df_display[numeric_cols].round(2)
         
-        st.dataframe(df_display, use_container_width=True, height=600)
+        st.dataframe(df_display, width='stretch', height=600)
         
-        csv = convert_df_to_csv(df_display)
-        st.download_button("📥 Download CSV", csv, "top100_overperformers.csv", "text/csv")
+        # CSV gerado só no clique
+        st.download_button("📥 Download CSV", partial(convert_df_to_csv, df_display), "top100_overperformers.csv",
+                           "text/csv", on_click='ignore')
 
 with tab2:
     st.subheader("🔻 TOP 100 Subperformers")
@@ -170,10 +177,11 @@ with tab2:
         numeric_cols = df_display.select_dtypes(include=['float64', 'float32']).columns
         df_display[numeric_cols] = df_display[numeric_cols].round(2)
         
-        st.dataframe(df_display, use_container_width=True, height=600)
+        st.dataframe(df_display, width='stretch', height=600)
         
-        csv = convert_df_to_csv(df_display)
-        st.download_button("📥 Download CSV", csv, "top100_subperformers.csv", "text/csv")
+        # CSV gerado só no clique
+        st.download_button("📥 Download CSV", partial(convert_df_to_csv, df_display), "top100_subperformers.csv",
+                           "text/csv", on_click='ignore')
 
 with tab3:
     st.subheader("⚡ TOP 100 Por 90 Minutos")
@@ -187,10 +195,11 @@ with tab3:
         numeric_cols = df_display.select_dtypes(include=['float64', 'float32']).columns
         df_display[numeric_cols] = df_display[numeric_cols].round(2)
         
-        st.dataframe(df_display, use_container_width=True, height=600)
+        st.dataframe(df_display, width='stretch', height=600)
         
-        csv = convert_df_to_csv(df_display)
-        st.download_button("📥 Download CSV", csv, "top100_per90.csv", "text/csv")
+        # CSV gerado só no clique
+        st.download_button("📥 Download CSV", partial(convert_df_to_csv, df_display), "top100_per90.csv",
+                           "text/csv", on_click='ignore')
 
 with tab4:
     st.subheader("📈 Visualizações")
@@ -211,7 +220,7 @@ with tab4:
         fig1.add_trace(go.Scatter(x=[0, max_val], y=[0, max_val], mode='lines', 
                                   line=dict(color='red', dash='dash'), name='y=x'))
         
-        st.plotly_chart(fig1, use_container_width=True)
+        st.plotly_chart(fig1, width='stretch')
         
         st.markdown("---")
         
@@ -225,7 +234,7 @@ with tab4:
             text=top30['assists_minus_xag'].round(2), textposition='outside'
         ))
         fig2.update_layout(title='TOP 30 Overperformers', height=900, yaxis={'categoryorder': 'total ascending'})
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(fig2, width='stretch')
         
         st.markdown("---")
         
@@ -233,7 +242,7 @@ with tab4:
         st.markdown("### 📊 Distribuição por Liga")
         fig3 = px.box(stats_filtered, x='league', y='assists_minus_xag', color='league',
                       title='Distribuição por Liga', height=600)
-        st.plotly_chart(fig3, use_container_width=True)
+        st.plotly_chart(fig3, width='stretch')
 
 st.markdown("---")
 st.markdown("""
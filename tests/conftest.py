@@ -0,0 +1,6 @@
+"""Os testes importam os módulos da raiz do repositório (python -m pytest a partir da raiz)"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
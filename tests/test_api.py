@@ -0,0 +1,105 @@
+import gzip
+import http.client
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import api
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    root = tmp_path_factory.mktemp('api')
+    rng = np.random.default_rng(3)
+    n = 60
+    df = pd.DataFrame({
+        'league': rng.choice(['ENG-Premier League', 'ESP-La Liga'], n),
+        'team': rng.choice(['a', 'b', 'c'], n),
+        'player': [f'Player {i}' for i in range(n)],
+        'position': rng.choice(['FW', 'MF', 'DF,MF'], n),
+        'matches': rng.integers(5, 38, n),
+        'assists': rng.integers(0, 15, n),
+        'xAG': rng.random(n) * 10,
+        'minutes': rng.integers(500, 3000, n),
+    })
+    df['assists_minus_xag'] = df['assists'] - df['xAG']
+    df['assists_minus_xag_90'] = df['assists_minus_xag'] / df['minutes'] * 90
+    df.to_csv(root / 'fbref_data.csv', index=False)
+
+    mp = pytest.MonkeyPatch()
+    mp.chdir(root)  # o store e o CSV antigo são relativos ao diretório atual
+    httpd = api.make_server('127.0.0.1', 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+    mp.undo()
+
+
+@pytest.fixture
+def get(server):
+    conn = http.client.HTTPConnection(*server)
+
+    def request(path, **headers):
+        conn.request('GET', path, headers={k.replace('_', '-'): v for k, v in headers.items()})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+
+    yield request
+    conn.close()
+
+
+def test_top_and_etag(get):
+    status, headers, body = get('/api/top?k=5')
+    assert status == 200
+    players = json.loads(body)['players']
+    assert len(players) == 5
+    values = [p['assists_minus_xag'] for p in players]
+    assert values == sorted(values, reverse=True)
+
+    etag = headers['ETag']
+    status, headers, body = get('/api/top?k=5', If_None_Match=etag)
+    assert (status, body, headers['ETag']) == (304, b'', etag)
+
+
+@pytest.mark.parametrize('path,expected', [
+    ('/api/top?k=abc', 400),
+    ('/api/top?min_xag=nan', 400),
+    ('/api/players?min_matches=inf', 400),
+    ('/api/top?metric=nope', 400),
+    ('/api/players/999999', 404),
+    ('/nope', 404),
+])
+def test_errors_are_not_masked_by_etag(get, path, expected):
+    etag = get('/api/top?k=1')[1]['ETag']
+    assert get(path)[0] == expected
+    assert get(path, If_None_Match=etag)[0] == expected
+
+
+def test_player_and_list(get):
+    listed = json.loads(get('/api/players?sort=assists&order=asc&limit=3')[2])['players']
+    assert [p['assists'] for p in listed] == sorted(p['assists'] for p in listed)
+    status, _, body = get(f"/api/players/{listed[0]['player_id']}")
+    assert status == 200
+    record = json.loads(body)
+    assert record['meta']['player_id'] == listed[0]['player_id']
+    assert record['career']['player'] == listed[0]['player']
+
+
+@pytest.mark.parametrize('accept,gzipped', [
+    ('gzip', True),
+    ('gzip;q=0', False),
+    ('identity', False),
+    ('*;q=0.5', True),
+    ('gzip;q=0, *', False),
+])
+def test_gzip_negotiation(get, accept, gzipped):
+    status, headers, body = get('/api/top?k=50', Accept_Encoding=accept)
+    assert status == 200
+    assert (headers.get('Content-Encoding') == 'gzip') == gzipped
+    players = json.loads(gzip.decompress(body) if gzipped else body)['players']
+    assert len(players) == 50
@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from fetch import (BIG5_COMBINED, EmptyUnitError, FetchUnit, TokenBucket, build_units,
+                   fetch_player_season_stats, fetch_unit, league_fallback)
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.hosts = []
+
+    def wait(self, host):
+        self.hosts.append(host)
+
+
+class FailingDriver:
+    def get(self, url):
+        raise RuntimeError('timeout')
+
+    def quit(self):
+        pass
+
+
+class SeleniumLikeReader:
+    """Como o sd.FBref: 5 tentativas por download, com um browser novo depois de cada falha"""
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.rate_limit = 7
+        self._driver = self._init_webdriver()
+
+    def _init_webdriver(self):
+        return FailingDriver()
+
+    def _download_and_save(self, url, filepath=None, var=None):
+        for _ in range(5):
+            try:
+                return self._driver.get(url)
+            except Exception:
+                self._driver = self._init_webdriver()
+        raise ConnectionError(f'Could not download {url}.')
+
+    def read_player_season_stats(self, stat_type):
+        return self._download_and_save('https://fbref.com/en/comps/')
+
+
+class FrameReader:
+    """Leitor sem browser (como o de replay): Big 5 vazia, ligas com uma linha"""
+
+    _driver = None
+
+    def __init__(self, unit):
+        self.unit = unit
+
+    def _download_and_save(self, url, filepath=None, var=None):
+        if self.unit.league == BIG5_COMBINED:
+            return pd.DataFrame()
+        index = pd.MultiIndex.from_tuples([(self.unit.league, self.unit.season, 't', 'p')],
+                                          names=['league', 'season', 'team', 'player'])
+        return pd.DataFrame({'assists': [1]}, index=index)
+
+    def read_player_season_stats(self, stat_type):
+        return self._download_and_save('http://127.0.0.1/stats')
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(rate=0.5, burst=1)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.01)
+    assert bucket.reserve() == pytest.approx(4.0, abs=0.01)
+
+
+def test_every_reader_attempt_takes_a_token():
+    limiter = CountingLimiter()
+    with pytest.raises(ConnectionError):
+        fetch_unit(FetchUnit('ENG-Premier League', '2425'), SeleniumLikeReader, limiter)
+    assert limiter.hosts == ['fbref.com'] * 5
+
+
+def test_empty_unit_falls_back_to_leagues():
+    units = build_units([BIG5_COMBINED], ['2425'])
+    with pytest.raises(EmptyUnitError):
+        fetch_unit(units[0], FrameReader)
+    tables, errors = fetch_player_season_stats(
+        units, limiter=CountingLimiter(), reader_factory=FrameReader,
+        fallback=league_fallback(['ENG-Premier League', 'ESP-La Liga'])
+    )
+    assert errors == {}
+    assert sorted(tables['standard'].index.get_level_values('league')) == ['ENG-Premier League', 'ESP-La Liga']
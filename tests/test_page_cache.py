@@ -0,0 +1,97 @@
+import os
+import zlib
+
+import pytest
+
+import page_cache
+from page_cache import PageCache
+
+
+def payload(i, size=4000):
+    # Aleatório para não comprimir: cada objeto ocupa ~size bytes em disco
+    return i.to_bytes(4, 'big') + os.urandom(size)
+
+
+def touch(cache, url, when):
+    entry = cache._read_index()['urls'][url]
+    meta = cache._index['objects'][entry['digest']]
+    path = cache._object_path(entry['digest'], meta['codec'])
+    os.utime(path, (when, when))
+
+
+def test_roundtrip_and_dedup(tmp_path):
+    cache = PageCache(tmp_path)
+    data = b'<html>' * 1000
+    assert cache.get('a') is None
+    assert cache.put('a', data) == cache.put('b', data)
+    assert cache.get('a') == data and cache.get('b') == data
+    assert cache.stats() == {'urls': 2, 'objects': 1, 'bytes': cache._bytes, 'hits': 2, 'misses': 1}
+
+
+def test_max_age(tmp_path, monkeypatch):
+    cache = PageCache(tmp_path)
+    cache.put('a', b'x')
+    assert cache.get('a', max_age=60) == b'x'
+    monkeypatch.setattr(page_cache.time, 'time', lambda: 10**12)
+    assert cache.get('a', max_age=60) is None
+    assert cache.get('a') == b'x'
+
+
+def test_lru_eviction(tmp_path):
+    cache = PageCache(tmp_path, max_bytes=10_000)
+    cache.put('old', payload(0))
+    cache.put('used', payload(1))
+    touch(cache, 'old', 1_000)
+    touch(cache, 'used', 2_000)
+    cache.put('new', payload(2))  # ~12 KB > 10 KB: desce até 9 KB, o menos usado sai primeiro
+    assert cache.get('old') is None
+    assert cache.get('used') is not None and cache.get('new') is not None
+    assert cache._bytes <= 10_000 * page_cache.EVICT_TO
+    assert not list((tmp_path / 'objects').rglob('*.tmp'))
+    assert len(list((tmp_path / 'objects').rglob('*.*'))) == 2
+
+
+def test_journal_seen_by_other_instances(tmp_path):
+    writer, reader = PageCache(tmp_path), PageCache(tmp_path)
+    writer.put('a', b'1')
+    assert reader.get('a') == b'1'
+    writer.put('b', b'2')
+    assert reader.get('b') == b'2'  # só as linhas novas do journal
+    assert not (tmp_path / page_cache.INDEX_FILE).exists()
+    assert PageCache(tmp_path).stats()['urls'] == 2
+
+
+def test_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, 'COMPACT_EVERY', 5)
+    writer, reader = PageCache(tmp_path), PageCache(tmp_path)
+    reader.put('first', b'0')
+    for i in range(6):
+        writer.put(f'url{i}', f'page{i}'.encode())
+    assert (tmp_path / page_cache.INDEX_FILE).exists()
+    assert not (tmp_path / page_cache.JOURNAL_FILE.format(0)).exists()
+    # O leitor tinha lido o journal antigo: volta a ler o snapshot e o journal novo
+    assert reader.get('url5') == b'page5' and reader.get('first') == b'0'
+    fresh = PageCache(tmp_path)
+    assert fresh.stats()['urls'] == 7 and fresh._bytes == writer._bytes
+
+
+def test_zlib_fallback_and_zstd_objects(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, 'zstandard', None)
+    cache = PageCache(tmp_path)
+    cache.put('a', b'page' * 100)
+    digest = cache._index['urls']['a']['digest']
+    stored = cache._object_path(digest, 'zlib').read_bytes()
+    assert zlib.decompress(stored) == b'page' * 100
+    # Objeto zstd de outro processo sem o pacote instalado: miss, e um put volta a gravá-lo
+    cache._append([{'object': digest, 'size': 10, 'codec': 'zst'}])
+    assert cache.get('a') is None
+    cache.put('a', b'page' * 100)
+    assert cache.get('a') == b'page' * 100
+
+
+def test_zstd_roundtrip(tmp_path):
+    pytest.importorskip('zstandard')
+    cache = PageCache(tmp_path)
+    cache.put('a', b'page' * 100)
+    assert cache._index['objects'][cache._index['urls']['a']['digest']]['codec'] == 'zst'
+    assert PageCache(tmp_path).get('a') == b'page' * 100
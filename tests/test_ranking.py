@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ranking
+from filter_plan import FilterPlan
+from ranking import RankingEngine
+
+
+@pytest.fixture(scope='module')
+def base():
+    rng = np.random.default_rng(11)
+    n = 10_000  # mais do que um bloco de SCAN_CHUNK
+    df = pd.DataFrame({
+        'assists_minus_xag': rng.normal(0, 3, n).round(1),  # com empates
+        'assists_minus_xag_90': rng.normal(0, 0.2, n),
+        'league': rng.choice(['ENG', 'ESP', 'ITA'], n),
+        'player': pd.Series(rng.choice(['Ana', 'Bruno', 'Carla', None], n), dtype='string'),
+        'xAG': rng.random(n) * 10,
+    })
+    df.loc[::97, 'assists_minus_xag_90'] = np.nan
+    return df
+
+
+def expected(df, mask, column, ascending):
+    ordered = df[mask].sort_values(column, ascending=ascending, kind='stable', na_position='last')
+    return df.index.get_indexer(ordered.index)
+
+
+def plan(df, league=None):
+    result = FilterPlan(df)
+    if league is not None:
+        result.where(('league', league), (df['league'] == league).to_numpy())
+    return result
+
+
+@pytest.mark.parametrize('metric', ranking.RANKING_METRICS)
+@pytest.mark.parametrize('ascending', [False, True])
+@pytest.mark.parametrize('league', [None, 'ITA'])
+def test_top_matches_sort_values(base, metric, ascending, league):
+    engine = RankingEngine(base)
+    p = plan(base, league)
+    for k in (1, 10, 2000, len(base) + 1):
+        np.testing.assert_array_equal(engine.top(p, metric, k, ascending),
+                                      expected(base, p.mask, metric, ascending)[:k])
+
+
+def test_top_extra_predicate_and_memo(base):
+    engine = RankingEngine(base)
+    p = plan(base, 'ESP')
+    extra = ('xAG>=5', (base['xAG'] >= 5).to_numpy())
+    top = engine.top(p, 'assists_minus_xag', 50, extra=extra)
+    np.testing.assert_array_equal(top, expected(base, p.mask & extra[1], 'assists_minus_xag', False)[:50])
+    # Um K menor com a mesma assinatura sai do resultado memorizado
+    misses = engine.misses
+    np.testing.assert_array_equal(engine.top(p, 'assists_minus_xag', 20, extra=extra), top[:20])
+    assert engine.misses == misses
+    # Sem o predicado extra é outro resultado
+    assert not np.array_equal(engine.top(p, 'assists_minus_xag', 50), top)
+
+
+@pytest.mark.parametrize('column', ['xAG', 'player', 'assists_minus_xag_90'])
+@pytest.mark.parametrize('ascending', [False, True])
+def test_page_matches_sort_values(base, column, ascending):
+    engine = RankingEngine(base)
+    p = plan(base, 'ENG')
+    order = expected(base, p.mask, column, ascending)
+    for start in (0, 100, len(order) - 10):
+        rows, total = engine.page(p, column, ascending, start, start + 50)
+        assert total == len(order)
+        np.testing.assert_array_equal(rows, order[start:start + 50])
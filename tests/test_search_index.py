@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from search_index import PlayerSearchIndex, normalize
+
+NAMES = ['Martin Ødegaard', 'Bruno Fernandes', 'Son Heung-min', 'Jadon Sancho', 'Bukayo Saka',
+         'Sergio Busquets', 'Ousmane Dembélé', 'Mason Mount', 'Bruno Guimarães', 'Łukasz Fabiański']
+
+
+def names(index, ids):
+    return index.display_names(ids)
+
+
+def test_normalize():
+    assert normalize('  Martin  Ødegaard ') == 'martin odegaard'
+    assert normalize('Łukasz Fabiański') == 'lukasz fabianski'
+    assert normalize('DEMBÉLÉ') == 'dembele'
+
+
+def test_search_matches_substring_scan():
+    index = PlayerSearchIndex(NAMES)
+    for query in ['s', 'on', 'bru', 'SAN', 'odegaard', 'ousmane dem', 'mbele', 'zzz', '']:
+        expected = {name for name in NAMES if normalize(query) in normalize(name)} if query else set()
+        assert set(names(index, index.matches(query))) == expected, query
+        assert set(names(index, index.search(query))) == expected, query
+
+
+def test_search_relevance_order():
+    index = PlayerSearchIndex(NAMES)
+    # Nome a começar pela pesquisa, depois início de palavra, depois o resto (cada grupo alfabético)
+    assert names(index, index.search('son')) == ['Son Heung-min', 'Mason Mount']
+    assert names(index, index.search('b')) == [
+        'Bruno Fernandes', 'Bruno Guimarães', 'Bukayo Saka', 'Sergio Busquets',
+        'Łukasz Fabiański', 'Ousmane Dembélé',  # 'lukasz' < 'ousmane' sem acentos
+    ]
+    assert names(index, index.search('b', limit=2)) == ['Bruno Fernandes', 'Bruno Guimarães']
+
+
+def test_fuzzy_tolerates_typos():
+    index = PlayerSearchIndex(NAMES)
+    assert names(index, index.fuzzy('odegard'))[0] == 'Martin Ødegaard'
+    assert names(index, index.fuzzy('bruno fernandez'))[0] == 'Bruno Fernandes'
+    assert len(index.fuzzy('xq')) == 0
+    assert len(index.fuzzy('qqqqqq')) == 0
+
+
+def test_mask_aligned_with_rows():
+    column = pd.Series(['Mason Mount', None, 'Bukayo Saka', 'Mason Mount'])
+    index = PlayerSearchIndex(column)
+    np.testing.assert_array_equal(index.mask(index.search('mount')), [True, False, False, True])
+    np.testing.assert_array_equal(index.mask(index.search('zzz')), [False] * 4)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import MIN_MINUTES, MIN_XAG
+from season_window import PLAYER_KEYS, PREFIX_METRICS, SeasonPrefix
+
+SEASONS = ['2122', '2223', '2324', '2425']
+
+
+@pytest.fixture(scope='module')
+def rows():
+    rng = np.random.default_rng(7)
+    n = 400
+    df = pd.DataFrame({
+        'league': rng.choice(['ENG-Premier League', 'ESP-La Liga'], n),
+        'team': rng.choice(['a', 'b', 'c'], n),
+        'player': rng.choice([f'p{i}' for i in range(40)], n),
+        'born': rng.choice([1995, 2000], n),
+        'season': rng.choice(SEASONS, n),
+        'position': rng.choice(['FW', 'MF', 'DF,MF'], n),
+        'position_bits': rng.integers(1, 8, n).astype('uint8'),
+        'matches': rng.integers(0, 38, n),
+        'minutes': rng.integers(0, 3000, n),
+        'assists': rng.integers(0, 15, n),
+        'xAG': rng.random(n) * 10,
+    })
+    df.loc[::17, 'xAG'] = np.nan  # nulos contam como 0
+    return df
+
+
+@pytest.mark.parametrize('first,last', [('2122', '2425'), ('2223', '2324'), ('2425', '2425')])
+def test_totals_match_groupby(rows, first, last):
+    prefix = SeasonPrefix(rows)
+    window = rows[(rows['season'] >= first) & (rows['season'] <= last)]
+    expected = (window.groupby(PLAYER_KEYS)[PREFIX_METRICS].sum()
+                .reindex(pd.MultiIndex.from_frame(prefix.players[PLAYER_KEYS]), fill_value=0))
+    np.testing.assert_allclose(prefix.totals(first, last), expected.to_numpy().T)
+
+
+def test_window_qualification_and_frame(rows):
+    prefix = SeasonPrefix(rows)
+    window = prefix.window('2223', '2425')
+    totals = dict(zip(PREFIX_METRICS, prefix.totals('2223', '2425')))
+    np.testing.assert_array_equal(window['qualified'], (totals['minutes'] > MIN_MINUTES) & (totals['xAG'] > MIN_XAG))
+    frame = prefix.frame('2223', '2425')
+    assert len(frame) == window['qualified'].sum()
+    assert (frame['assists_minus_xag'] == frame['assists'] - frame['xAG']).all()
+
+
+def test_seasons_outside_the_list_are_ignored(rows):
+    prefix = SeasonPrefix(rows, seasons=SEASONS[1:])
+    assert prefix.seasons == SEASONS[1:]
+    window = rows[rows['season'] != SEASONS[0]]
+    expected = window.groupby(PLAYER_KEYS)['assists'].sum().reindex(
+        pd.MultiIndex.from_frame(prefix.players[PLAYER_KEYS]), fill_value=0)
+    np.testing.assert_allclose(prefix.totals(SEASONS[1], SEASONS[-1])[PREFIX_METRICS.index('assists')],
+                               expected.to_numpy())
@@ -0,0 +1,95 @@
+import threading
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+import store
+from store import (RAW_FORMAT, _write_manifest, dataset_version, fresh_page_seasons, load_stats,
+                   save_stats, stale_seasons, stats_available)
+
+NOW = datetime(2025, 10, 1, tzinfo=timezone.utc)  # 2425 terminou, 2526 em curso
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    def make(manifest):
+        for season in manifest:
+            partition = tmp_path / 'league=ENG-Premier League' / f'season={season}'
+            partition.mkdir(parents=True, exist_ok=True)
+            (partition / 'part-0.parquet').touch()
+        _write_manifest(manifest, tmp_path)
+        return tmp_path
+    return make
+
+
+def entry(fetched_at, stat_types=('standard',), fmt=RAW_FORMAT):
+    return {'fetched_at': fetched_at.isoformat(), 'rows': 1, 'stat_types': list(stat_types),
+            'extra_columns': [], 'format': fmt}
+
+
+def test_stale_seasons(raw_dir):
+    after = datetime(2025, 8, 1, tzinfo=timezone.utc)
+    root = raw_dir({
+        '2122': entry(after),                                   # completa e recolhida depois do fim
+        '2223': entry(after, fmt=RAW_FORMAT - 1),               # formato antigo
+        '2324': entry(after, stat_types=()),                    # sem o stat type pedido
+        '2425': entry(datetime(2025, 3, 1, tzinfo=timezone.utc)),  # recolhida em curso
+        '2526': entry(after),                                   # em curso
+    })
+    seasons = ['2021', '2122', '2223', '2324', '2425', '2526']
+    assert stale_seasons(seasons, root, now=NOW) == ['2021', '2223', '2324', '2425', '2526']
+
+
+def test_fresh_page_seasons_fetched_live_now_complete(raw_dir):
+    # Recolhida a meio da temporada, que entretanto terminou: stale e sem cache de páginas
+    root = raw_dir({'2425': entry(datetime(2025, 3, 1, tzinfo=timezone.utc))})
+    assert stale_seasons(['2425'], root, now=NOW) == ['2425']
+    assert fresh_page_seasons(['2425'], root, now=NOW) == ['2425']
+
+
+def test_fresh_page_seasons(raw_dir):
+    root = raw_dir({'2324': entry(datetime(2024, 8, 1, tzinfo=timezone.utc))})
+    # Completa e recolhida depois do fim, ou nunca recolhida: a cache serve
+    assert fresh_page_seasons(['2122', '2324'], root, now=NOW) == []
+    # Em curso: sempre sem cache
+    assert fresh_page_seasons(['2526'], root, now=NOW) == ['2526']
+
+
+def stats_frame(n=3):
+    """Tabela agregada completa de `n` jogadores (percentis e bits calculados por load_stats)"""
+    diff = [i - 1.5 for i in range(n)]
+    df = pd.DataFrame({
+        'league': ['ENG-Premier League'] * n, 'team': ['t'] * n, 'player': [f'p{i}' for i in range(n)],
+        'position': ['MF'] * n, 'matches': [10] * n, 'assists': list(range(n)), 'xAG': [1.5] * n,
+        'minutes': [900] * n, 'assists_minus_xag': diff, 'assists_minus_xag_90': [d / 10 for d in diff],
+    })
+    return store.add_percentile_ranks(df).assign(born=2000, position_bits=2)
+
+
+def test_readers_wait_for_dataset_swap(tmp_path):
+    stats_dir = tmp_path / 'stats'
+    save_stats(stats_frame(), stats_dir)
+    old_dir = stats_dir.with_name('stats.old')
+    stats_dir.replace(old_dir)  # entre os dois renames de _replace_dataset
+    swap = threading.Timer(0.2, lambda: old_dir.replace(stats_dir))
+    swap.start()
+    try:
+        assert stats_available(stats_dir)
+        assert stats_dir.exists()
+        assert len(load_stats(stats_dir=stats_dir, legacy_csv=tmp_path / 'none.csv')) == 3
+    finally:
+        swap.join()
+
+
+def test_readers_fall_back_to_interrupted_swap(tmp_path, monkeypatch):
+    stats_dir = tmp_path / 'stats'
+    save_stats(stats_frame(), stats_dir)
+    stats_dir.replace(stats_dir.with_name('stats.old'))
+    monkeypatch.setattr(store, 'SWAP_WAIT', 0.05)
+    assert len(load_stats(stats_dir=stats_dir, legacy_csv=tmp_path / 'none.csv')) == 3
+    assert dataset_version(stats_dir, tmp_path / 'ps', tmp_path / 'none.csv') is not None
+    # A próxima escrita repõe o diretório e faz a troca normalmente
+    save_stats(stats_frame(5), stats_dir)
+    assert not stats_dir.with_name('stats.old').exists()
+    assert len(load_stats(stats_dir=stats_dir, legacy_csv=tmp_path / 'none.csv')) == 5
@@ -14,7 +14,7 @@ REM Ativar ambiente virtual
 call venv\Scripts\activate.bat
 
 REM Executar script de geração de dados
-python generate_data.py
+python generate_data.py %*
 
 if %ERRORLEVEL% EQU 0 (
     echo.
@@ -14,7 +14,7 @@ else
 fi
 
 # Executar script de geração de dados
-python generate_data.py
+python generate_data.py "$@"
 
 if [ $? -eq 0 ]; then
     echo ""